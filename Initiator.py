@@ -35,7 +35,7 @@ class Initiator:
     # initialize the identity, the dataset, the model, the initial model weights,
     #   and the learning strategy on the actors as specified by the configuration
     async def initializeActor(self, addr, actor_idx, num_actors, model_config_serialized,
-        optimizer_config_serialized, init_weights_serialized):
+        optimizer_config_serialized, init_weights_fields):
         self.logger.debug(f'Connecting to {addr}')
         async with grpc.aio.insecure_channel(addr) as channel:
             stub = Initialization_pb2_grpc.InitializeStub(channel)
@@ -58,7 +58,7 @@ class Initiator:
                 model_config=model_config_serialized, optimizer_config=optimizer_config_serialized))
 
             await stub.InitModelParameters(ModelUpdate_pb2.ModelParameters(
-                sparse=False, parameters=init_weights_serialized))
+                **init_weights_fields))
 
             await stub.InitStrategy(Initialization_pb2.Strategy(
                 num_fed_epochs=self.config["num_fed_epochs"],
@@ -116,13 +116,13 @@ class Initiator:
             model, optimizer)
 
         init_weights = HeterogeneousDenseArray(model.get_weights())
-        init_weights_serialized = SerializationUtils.serializeParameters(init_weights)
+        init_weights_fields = SerializationUtils.serializeParametersFields(init_weights)
 
         tasks = []
         num_actors = len(addresses)
         for actor_idx, addr in enumerate(addresses):
             tasks.append(asyncio.create_task(self.initializeActor(addr, actor_idx, num_actors,
-                model_config_serialized, optimizer_config_serialized, init_weights_serialized)))
+                model_config_serialized, optimizer_config_serialized, init_weights_fields)))
             neighbor_identities = NetworkUtils.getNeighborIdentities(addr, addresses, adj_mat)
             assert (not self.config["learning_type"] in
                         [LearningType.DFLv1, LearningType.DFLv4, LearningType.DFLv5, LearningType.DFLv6] or
@@ -0,0 +1,203 @@
+from Actor import Actor
+from model.LearningStrategy import LearningStrategy, LearningType
+from model.MixingMatrixConsensus import MixingMatrixConsensus
+from model.SerializationUtils import SerializationUtils
+from network.InMemoryModelUpdateService import InMemoryModelUpdateService
+from network.NetworkUtils import NetworkServiceType, NetworkUtils
+from tffdataset.DatasetUtils import getDataset, getDatasetElementSpec
+from tffdataset.DirectDataset import DirectDataset
+from tffdataset.FedDataset import FedDataset
+from tffmodel.KerasModel import KerasModel
+from tffmodel.ModelBuilderUtils import getFedOptimizers
+from tffmodel.types.HeterogeneousDenseArray import HeterogeneousDenseArray
+from utils.PerformanceLogger import PerformanceLogger
+
+import copy
+import logging
+import numpy as np
+import tensorflow as tf
+import threading
+import time
+
+# port of the first simulated actor (the actors are named like in the address files in resources/)
+SIMULATION_BASE_PORT = 50505
+
+# run all actors of the DFL system in a single process, such that they share the TensorFlow
+#   runtime and the loaded dataset, and exchange references to the parameters in memory
+# NOTE: the actors are initialized directly (i.e., without initialization service) and each actor
+#   performs its training phase in a separate thread
+class Simulator:
+    def __init__(self, config):
+        self.config = config
+        self.config["networkservice_type"] = NetworkServiceType.IN_MEMORY
+        self.logger = logging.getLogger("Simulator")
+        self.logger.setLevel(config["log_level"])
+
+    # set the seed of all libraries used
+    # NOTE: the random generators are shared by all actors of the simulation
+    def setSeed(self):
+        tf.keras.utils.set_random_seed(self.config["seed"])
+
+    # load the dataset once and construct the federated dataset of all actors
+    def loadFedDataset(self):
+        dataset = getDataset(self.config)
+        dataset.load(seed=self.config["seed"])
+        fed_dataset = FedDataset(self.config)
+        fed_dataset.construct(dataset, seed=self.config["seed"])
+        fed_dataset.batch()
+        return dataset, fed_dataset
+
+    # initialize the actors like the initiator does, but with direct calls
+    def initialize(self, addresses, adj_mat):
+        num_actors = len(addresses)
+        dataset, fed_dataset = self.loadFedDataset()
+
+        model = KerasModel.createKerasModelElementSpec(
+            getDatasetElementSpec(self.config), self.config)
+        _, optimizer = getFedOptimizers(self.config)
+        model_config_serialized, optimizer_config_serialized = SerializationUtils.serializeModel(
+            model, optimizer)
+        init_weights = HeterogeneousDenseArray(model.get_weights())
+
+        actors = list()
+        for actor_idx, addr in enumerate(addresses):
+            actor_config = copy.deepcopy(self.config)
+            actor_config["port"] = SIMULATION_BASE_PORT + actor_idx
+            actor = Actor(actor_config)
+
+            actor.initializeIdentity(addr, actor_idx, num_actors,
+                self.config["seed"]+actor_idx) # assign an individual seed to each actor
+
+            actor.initializeDataset(self.config["dataset_id"].value,
+                self.config["partitioning_scheme"].value, actor_idx,
+                self.config["seed"], self.config["partitioning_alpha"],
+                dataset=DirectDataset(dataset.batch_size, dataset.element_spec,
+                    fed_dataset.train[actor_idx], fed_dataset.val[actor_idx],
+                    fed_dataset.test[actor_idx], actor_config))
+
+            actor.initializeModel(model_config_serialized, optimizer_config_serialized)
+            actor.initializeModelParameters(init_weights)
+
+            actor.initializeStrategy(
+                self.config["num_fed_epochs"], self.config["num_local_epochs"],
+                self.config["learning_type"].value, self.config.get("lr"), self.config.get("lr_global"),
+                self.config["sync_strategy"].value, self.config["sync_strat_percentage"],
+                self.config["sync_strat_amount"], self.config["sync_strat_timeout"],
+                self.config["sync_strat_allowempty"],
+                self.config["compression_type"].value, self.config["compression_k"],
+                self.config["compression_percentage"], self.config["compression_precision"],
+                self.config["pdp_strategy"].value, self.config["pdp_k"])
+
+            neighbor_identities = NetworkUtils.getNeighborIdentities(addr, addresses, adj_mat)
+            # NOTE: the mixing simulation of DFLv1 is the weighted averaging over the neighborhood,
+            #   which does not require a fully connected actor network
+            assert (not self.config["learning_type"] in
+                        [LearningType.DFLv1, LearningType.DFLv4, LearningType.DFLv5, LearningType.DFLv6] or
+                    len(neighbor_identities)+1 == num_actors or
+                    (self.config["simulation_mixing_flag"] and self.config["learning_type"] == LearningType.DFLv1)
+                ), "DFLv1 requires a fully connected actor network."
+            actor.registerNeighbors({naddr: int(nidx) for nidx, naddr in neighbor_identities.items()})
+
+            actors.append(actor)
+        self.logger.debug(f'Initialized {num_actors} actors.')
+        return actors
+
+    # perform the training phase of all actors concurrently and block until all actors have finished
+    #   or one of them has failed
+    def train(self, actors):
+        finished = threading.Event()
+        lock = threading.Lock()
+        num_running = [len(actors)]
+        errors = list()
+        def trainActor(actor):
+            try:
+                actor.train()
+            except Exception as err:
+                self.logger.exception(f'Actor {actor.config["address"]} failed.')
+                errors.append(err)
+                finished.set()
+            finally:
+                with lock:
+                    num_running[0] -= 1
+                    if(num_running[0] == 0):
+                        finished.set()
+
+        # NOTE: daemon threads, such that the remaining actors do not block the exit after a failure
+        threads = [threading.Thread(target=trainActor, args=(actor,),
+            name=f'Actor-{actor.config["actor_idx"]}', daemon=True) for actor in actors]
+        for thread in threads:
+            thread.start()
+        finished.wait()
+        if(errors):
+            raise RuntimeError('The simulation failed.') from errors[0]
+
+    # perform the training phase of all actors in lockstep, where the aggregation step of all actors
+    #   is one product of the mixing matrix and the stacked parameters (DFLv1, DFLv2, and DFLv8)
+    # NOTE: the model updates are not communicated, hence, compression and partial device
+    #   participation are not applied, and the models are only evaluated locally after fitting
+    # NOTE: the strategies are constructed without network (i.e., without channel pool and
+    #   evaluation models), since the actors neither communicate nor evaluate for their neighbors
+    def trainMixing(self, actors, adj_mat):
+        strategies = [LearningStrategy.getStrategy(actor.config, actor.keras_model, actor.dataset,
+                network_flag=False)
+            for actor in actors]
+        match self.config["learning_type"]:
+            case LearningType.DFLv1 | LearningType.DFLv8:
+                # NOTE: DFLv8 averages each partition at its owner, which equals the averaging of
+                #   the full models only if every actor is a neighbor of all other actors
+                if(self.config["learning_type"] == LearningType.DFLv8 and not np.all(
+                    MixingMatrixConsensus.getNeighborhood(adj_mat) | np.eye(len(actors), dtype=bool))):
+                    raise RuntimeError('The mixing simulation of DFLv8 requires a fully connected actor network.')
+                aggregation_weights = [strategy.dataset.train.cardinality().numpy() for strategy in strategies]
+                mixing_matrix = MixingMatrixConsensus.getAveragingMatrix(adj_mat, aggregation_weights)
+            case LearningType.DFLv2:
+                mixing_matrix = MixingMatrixConsensus.getConsensusMatrix(adj_mat)
+            case _:
+                raise NotImplementedError
+
+        for epoch in range(int(self.config["num_fed_epochs"])):
+            self.logger.debug(f'Federated epoch #{epoch}')
+            for strategy in strategies:
+                train_metrics = strategy.fitLocal()
+                if(strategy.config['log_performance_flag'] and train_metrics):
+                    strategy.logTrainMetrics(train_metrics)
+                if(strategy.isEvaluationRound(epoch)):
+                    strategy.evaluateLocalRound(epoch)
+
+            current_weights = [strategy.keras_model.getWeights() for strategy in strategies]
+            if(self.config["learning_type"] == LearningType.DFLv2):
+                stacked_weights = MixingMatrixConsensus.mix(mixing_matrix,
+                    MixingMatrixConsensus.stackParameters(current_weights))
+            else: # average the model deltas
+                stacked_previous_weights = MixingMatrixConsensus.stackParameters(
+                    [strategy.previous_weights for strategy in strategies])
+                stacked_weights = stacked_previous_weights + MixingMatrixConsensus.mix(mixing_matrix,
+                    MixingMatrixConsensus.stackParameters(current_weights) - stacked_previous_weights)
+            new_weights = MixingMatrixConsensus.unstackParameters(stacked_weights, current_weights[0])
+            for strategy, weights in zip(strategies, new_weights):
+                strategy.keras_model.setWeights(weights)
+
+        for strategy in strategies:
+            strategy.model_update_market.close()
+            if(strategy.config['log_performance_flag']):
+                PerformanceLogger.write(strategy.config["log_dir"])
+
+    # run the simulation on the topology specified by the adjacency matrix
+    def simulate(self):
+        actor_adjacency = np.fromfile(self.config["adj_file"], dtype=int, sep=" ")
+        self.config["num_workers"] = int(np.sqrt(actor_adjacency.size))
+        actor_adjacency = np.reshape(actor_adjacency,
+            shape=(self.config["num_workers"], self.config["num_workers"]))
+        actor_addresses = [f'localhost:{SIMULATION_BASE_PORT + actor_idx}'
+            for actor_idx in range(self.config["num_workers"])]
+
+        start_time = time.perf_counter()
+        InMemoryModelUpdateService.clearServices()
+        actors = self.initialize(actor_addresses, actor_adjacency)
+        self.setSeed()
+        if(self.config["simulation_mixing_flag"]):
+            self.trainMixing(actors, actor_adjacency)
+        else:
+            self.train(actors)
+        self.logger.info(f'Simulation of {self.config["num_workers"]} actors completed in '
+            + f'{time.perf_counter() - start_time:.1f} seconds.')
@@ -1,5 +1,6 @@
 from Actor import Actor
 from Initiator import Initiator
+from Simulator import Simulator
 from utils.ConfigurationUtils import ConfigurationUtils
 
 from enum import Enum
@@ -10,10 +11,12 @@ import sys
 class ExecType(Enum):
     INITIATOR = 1,
     ACTOR = 2
+    SIMULATOR = 3
 
 def printHelp(program_name):
     print("Initiator usage:", program_name, "--initiate", "[--addr_file=<PATH>]", "[--adj_file=<PATH>]")
     print("Actor usage:", program_name, "--act", "--port=<PORT>")
+    print("Simulation usage:", program_name, "--simulate", "[--adj_file=<PATH>]")
 
 def main(argv):
 
@@ -28,8 +31,8 @@ def main(argv):
     logger.setLevel(config["log_level"])
 
     try:
-        opts, args = getopt.getopt(argv[1:], "hiap:c:",
-            ["help", "initiate", "act", "port=", "config=", "addr_file=", "adj_file=",
+        opts, args = getopt.getopt(argv[1:], "hiasp:c:",
+            ["help", "initiate", "act", "simulate", "port=", "config=", "addr_file=", "adj_file=",
                 *ConfigurationUtils.CLI_OPTIONS])
     except getopt.GetoptError:
         print("Wrong usage.")
@@ -47,6 +50,8 @@ def main(argv):
             exec_type = ExecType.INITIATOR
         elif opt in ("-a", "--act"):
             exec_type = ExecType.ACTOR
+        elif opt in ("-s", "--simulate"):
+            exec_type = ExecType.SIMULATOR
         else:
             config = ConfigurationUtils.parseCLIOption(config, opt, arg)
 
@@ -66,6 +71,11 @@ def main(argv):
             actor = Actor(config)
             actor.run()
             sys.exit()
+        case ExecType.SIMULATOR:
+            logger.info("Starting Simulator")
+            simulator = Simulator(config)
+            simulator.simulate()
+            sys.exit()
         case _:
             print("Wrong usage.")
             printHelp(argv[0])
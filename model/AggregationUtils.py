@@ -1,11 +1,29 @@
+from model.FlatParameterArray import FlatParameterArray
+
 import copy
 import numpy as np
 
 class AggregationUtils:
     # average all model parameters weighted by the specified averaging weights
+    # NOTE: dense parameters are stacked into one contiguous matrix and averaged with a single
+    #   matrix-vector product in their own dtype
     @classmethod
     def averageModelParameters(self_class, model_parameters, averaging_weights=None):
-        result = np.average(model_parameters, weights=averaging_weights)
+        if(any([parameters.is_sparse for parameters in model_parameters])):
+            return np.average(model_parameters, weights=averaging_weights)
+        result = FlatParameterArray.weightedAverage(model_parameters, averaging_weights)
+        return result.toHeterogeneous()
+
+    # finalize the weighted average of our own parameters and the running sum of the received
+    #   model updates (i.e., the weighted sum and the sum of aggregation weights)
+    @classmethod
+    def finalizeRunningAverage(self_class, own_parameters, own_weight, accumulation=None):
+        weighted_sum = own_parameters * own_weight
+        total_weight = own_weight
+        if(accumulation):
+            weighted_sum += accumulation["weighted_sum"]
+            total_weight += accumulation["aggregation_weight"]
+        result = weighted_sum * (1 / total_weight)
         return result
 
     # consensus-based federated averaging method from https://doi.org/10.1109/JIOT.2020.2964162
@@ -15,9 +33,11 @@ class AggregationUtils:
     # {Servers;Data models;Computational modeling;Artificial neural networks;Optimization;
     # Convergence;Internet of Things;5G and beyond networks;distributed signal processing;
     # federated learning;internet of Things},
+    # NOTE: the current model weights are not modified, such that all neighbor terms refer to the
+    #   weights before the consensus step (see consensusbasedFedAvgInPlace for dense parameters)
     @classmethod
     def consensusbasedFedAvg(self_class, current_model_weights, received_model_weights, eps_t, alph_t):
-        result = current_model_weights
+        result = copy.deepcopy(current_model_weights)
         for addr, mu in received_model_weights.items():
             result += (mu - current_model_weights) * eps_t * alph_t[addr]
         return result
@@ -30,10 +50,12 @@ class AggregationUtils:
     # {Servers;Data models;Computational modeling;Artificial neural networks;Optimization;
     # Convergence;Internet of Things;5G and beyond networks;distributed signal processing;
     # federated learning;internet of Things},
+    # NOTE: the current model weights are not modified (see consensusbasedFedAvgWithGradExchangeInPlace
+    #   for dense parameters)
     @classmethod
     def consensusbasedFedAvgWithGradExchange(self_class, current_model_weights,
         received_model_updates, eps_t, alph_t, mu_t, beta_t):
-        model_parameters = current_model_weights
+        model_parameters = copy.deepcopy(current_model_weights)
         adjusted_model_parameters = copy.deepcopy(model_parameters)
         for addr, (mp, pg) in received_model_updates.items():
             mp_update_term = (mp - current_model_weights) * eps_t * alph_t[addr]
@@ -64,3 +86,85 @@ class AggregationUtils:
         model_update_term *= tau_eff * lr_global
         result = current_model_weights - model_update_term
         return result
+
+    # ===== In-place aggregation =====
+    # NOTE: the in-place variants write the result into the specified output buffer (FlatParameterArray),
+    #   use the scratch buffer for the intermediate terms, and neither allocate nor deep-copy parameters,
+    #   such that the buffers can be reused across rounds; only dense parameters are supported and the
+    #   inputs are never modified (except for the current model weights if they are the output buffer)
+
+    # whether all parameters are dense (i.e., supported by the in-place variants)
+    @classmethod
+    def isDense(self_class, parameters_list):
+        return not any([parameters.is_sparse for parameters in parameters_list])
+
+    # out = factor * x (x may be the output buffer)
+    @classmethod
+    def scaleInPlace(self_class, out, x, factor):
+        for out_layer, x_layer in zip(out.get(), x.get()):
+            np.multiply(x_layer, out_layer.dtype.type(factor), out=out_layer)
+        return out
+
+    # out += factor * x (the scratch buffer is not required for a factor of one)
+    @classmethod
+    def addScaledInPlace(self_class, out, x, factor, scratch=None):
+        if(factor == 1):
+            for out_layer, x_layer in zip(out.get(), x.get()):
+                np.add(out_layer, x_layer, out=out_layer)
+            return out
+        for out_layer, x_layer, scratch_layer in zip(out.get(), x.get(), scratch.get()):
+            np.multiply(x_layer, out_layer.dtype.type(factor), out=scratch_layer)
+            np.add(out_layer, scratch_layer, out=out_layer)
+        return out
+
+    # weighted average of the model parameters written into the output buffer
+    @classmethod
+    def averageModelParametersInPlace(self_class, model_parameters, averaging_weights, out):
+        return FlatParameterArray.weightedAverage(model_parameters, averaging_weights, out=out)
+
+    # consensus-based federated averaging (see consensusbasedFedAvg) written into the output buffer
+    # NOTE: all neighbor terms refer to the current model weights before the consensus step, i.e.,
+    #   out = (1 - eps_t * sum_j alph_t[j]) * w + sum_j eps_t * alph_t[j] * mu_j
+    @classmethod
+    def consensusbasedFedAvgInPlace(self_class, current_model_weights, received_model_weights,
+        eps_t, alph_t, out, scratch):
+        coefficients = self_class.getConsensusCoefficients(received_model_weights.keys(), eps_t, alph_t)
+        return self_class.linearCombinationInPlace(
+            [current_model_weights, *received_model_weights.values()], coefficients, out, scratch)
+
+    # coefficients of the current model weights and the received model weights (in the specified
+    #   order of the addresses) in the consensus step
+    @classmethod
+    def getConsensusCoefficients(self_class, addresses, eps_t, alph_t):
+        return [1 - eps_t * sum([alph_t[addr] for addr in addresses]),
+            *[eps_t * alph_t[addr] for addr in addresses]]
+
+    # out = sum_k coefficients[k] * parameters_list[k] (accumulated in the order of the list)
+    @classmethod
+    def linearCombinationInPlace(self_class, parameters_list, coefficients, out, scratch):
+        self_class.scaleInPlace(out, parameters_list[0], coefficients[0])
+        for parameters, coefficient in zip(parameters_list[1:], coefficients[1:]):
+            self_class.addScaledInPlace(out, parameters, coefficient, scratch)
+        return out
+
+    # consensus-based federated averaging w/ gradient exchange (see consensusbasedFedAvgWithGradExchange)
+    #   written into the output buffers of the model parameters and the adjusted model parameters
+    @classmethod
+    def consensusbasedFedAvgWithGradExchangeInPlace(self_class, current_model_weights,
+        received_model_updates, eps_t, alph_t, mu_t, beta_t, out_model, out_adjusted, scratch):
+        self_class.consensusbasedFedAvgInPlace(current_model_weights,
+            {addr: mp for addr, (mp, _) in received_model_updates.items()}, eps_t, alph_t, out_model, scratch)
+        self_class.scaleInPlace(out_adjusted, out_model, 1)
+        for addr, (_, pg) in received_model_updates.items():
+            self_class.addScaledInPlace(out_adjusted, pg, -mu_t * beta_t[addr], scratch)
+        return out_model, out_adjusted
+
+    # normalized averaging method FedNova (see fedNova) written into the output buffer
+    @classmethod
+    def fedNovaInPlace(self_class, current_model_weights, model_gradients, aggregation_weights,
+        tau_eff, lr_global, a_values, out, scratch):
+        aw_sum = np.sum(aggregation_weights)
+        self_class.scaleInPlace(out, current_model_weights, 1)
+        for mg, aw, av in zip(model_gradients, aggregation_weights, a_values):
+            self_class.addScaledInPlace(out, mg, -(av / abs(av)) * (aw / aw_sum) * tau_eff * lr_global, scratch)
+        return out
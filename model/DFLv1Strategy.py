@@ -4,15 +4,19 @@ from model.SerializationUtils import SerializationUtils
 from network.NetworkUtils import NetworkUtils
 from tffmodel.KerasModel import KerasModel
 
-import asyncio
 import logging
 
 # FedAvg
 class DFLv1Strategy(IDFLStrategy):
-    def __init__(self, config, keras_model, dataset):
-        super().__init__(config, keras_model, dataset)
+    accumulation_flag = True # the aggregation consumes the accumulated model deltas (see aggregate)
+
+    def __init__(self, config, keras_model, dataset, network_flag=True):
+        super().__init__(config, keras_model, dataset, network_flag)
         self.logger = logging.getLogger("model/DFLv1Strategy")
         self.logger.setLevel(config["log_level"])
+        if(self.config["market_accumulate_flag"] and self.accumulation_flag):
+            # fold the received model deltas into a running sum as they arrive
+            self.model_update_market.enableAccumulation("weights")
 
     def startServer(self):
         # callback for receiving a model update from an actor
@@ -21,8 +25,7 @@ class DFLv1Strategy(IDFLStrategy):
 
         # callback for getting an evaluation request form an actor
         def evaluateModelCallback(request):
-            weights = SerializationUtils.deserializeParameters(
-                request.parameters, sparse=request.sparse)
+            weights = SerializationUtils.deserializeParametersMessage(request)
             eval_metrics = self.evaluateWeights(weights)
             return eval_metrics
 
@@ -36,6 +39,7 @@ class DFLv1Strategy(IDFLStrategy):
 
         callbacks = {"TransferModelUpdate": transferModelUpdateCallback,
             "EvaluateModel": evaluateModelCallback,
+            "EvaluateModelVersion": self.evaluateModelVersion,
             "AllowTermination": allowTerminationCallback}
 
         self.model_update_service = NetworkUtils.getModelUpdateService(self.config)
@@ -52,22 +56,34 @@ class DFLv1Strategy(IDFLStrategy):
         current_weights = self.keras_model.getWeights()
         model_delta = current_weights - self.previous_weights
 
-        asyncio.run(self.broadcastParametersToNeighbors(weights=model_delta,
+        self.channel_pool.run(self.broadcastParametersToNeighbors(weights=model_delta,
             aggregation_weight=self.dataset.train.cardinality().numpy()))
 
     def aggregate(self):
         current_model_delta = self.keras_model.getWeights() - self.previous_weights
-        received_model_updates_vals = self.model_update_market.get().values()
-        model_deltas = [rmu["weights"] for rmu in received_model_updates_vals]
-        aggregation_weights = [rmu["aggregation_weight"] for rmu in received_model_updates_vals]
-        model_deltas = [current_model_delta, *model_deltas]
-        aggregation_weights = [self.dataset.train.cardinality().numpy(), *aggregation_weights]
-        avg_model_deltas = AggregationUtils.averageModelParameters(model_deltas, aggregation_weights)
-        new_weights = self.previous_weights + avg_model_deltas
+        if(self.model_update_market.isAccumulating()):
+            avg_model_deltas = AggregationUtils.finalizeRunningAverage(current_model_delta,
+                self.dataset.train.cardinality().numpy(), self.model_update_market.getAccumulated())
+            self.keras_model.setWeights(self.previous_weights + avg_model_deltas)
+            return
+        model_updates = {**self.model_update_market.get(), self.config["address"]: {
+            "weights": current_model_delta, "aggregation_weight": self.dataset.train.cardinality().numpy()}}
+        # NOTE: canonical aggregation order (by address), such that all actors which aggregate the same
+        #   model updates obtain the identical model (see resolveModelVersion)
+        model_updates_vals = [model_updates[addr] for addr in sorted(model_updates.keys())]
+        model_deltas = [mu["weights"] for mu in model_updates_vals]
+        aggregation_weights = [mu["aggregation_weight"] for mu in model_updates_vals]
+        if(AggregationUtils.isDense(model_deltas)):
+            new_weights = AggregationUtils.averageModelParametersInPlace(model_deltas, aggregation_weights,
+                out=self.getAggregationBuffer("weights", self.previous_weights))
+            new_weights = AggregationUtils.addScaledInPlace(new_weights, self.previous_weights, 1).toHeterogeneous()
+        else:
+            avg_model_deltas = AggregationUtils.averageModelParameters(model_deltas, aggregation_weights)
+            new_weights = self.previous_weights + avg_model_deltas
         self.keras_model.setWeights(new_weights)
 
     # notify the neighbors about the completion and wait until this actor can terminate safely
     def stop(self):
         self.registerTerminationPermission(self.config["address"])
-        asyncio.run(self.signalTerminationPermission())
+        self.channel_pool.run(self.signalTerminationPermission())
         self.model_update_service.waitForTermination()
@@ -4,15 +4,16 @@ from model.SerializationUtils import SerializationUtils
 from network.NetworkUtils import NetworkUtils
 from tffmodel.KerasModel import KerasModel
 
-import asyncio
 import logging
 
 # Consensus-based Federated Averaging
 class DFLv2Strategy(IDFLStrategy):
-    def __init__(self, config, keras_model, dataset):
-        super().__init__(config, keras_model, dataset)
+    def __init__(self, config, keras_model, dataset, network_flag=True):
+        super().__init__(config, keras_model, dataset, network_flag)
         self.logger = logging.getLogger("model/DFLv2Strategy")
         self.logger.setLevel(config["log_level"])
+        if(self.error_feedback.isEnabled()):
+            raise RuntimeError('Error feedback requires model deltas or gradients, but DFLv2 exchanges full model weights.')
 
     def startServer(self):
         # callback for receiving a model update from an actor
@@ -21,8 +22,7 @@ class DFLv2Strategy(IDFLStrategy):
 
         # callback for getting an evaluation request form an actor
         def evaluateModelCallback(request):
-            weights = SerializationUtils.deserializeParameters(
-                request.parameters, sparse=request.sparse)
+            weights = SerializationUtils.deserializeParametersMessage(request)
             eval_metrics = self.evaluateWeights(weights)
             return eval_metrics
 
@@ -36,6 +36,7 @@ class DFLv2Strategy(IDFLStrategy):
 
         callbacks = {"TransferModelUpdate": transferModelUpdateCallback,
             "EvaluateModel": evaluateModelCallback,
+            "EvaluateModelVersion": self.evaluateModelVersion,
             "AllowTermination": allowTerminationCallback}
 
         self.model_update_service = NetworkUtils.getModelUpdateService(self.config)
@@ -49,7 +50,7 @@ class DFLv2Strategy(IDFLStrategy):
 
     def broadcast(self):
         weights = self.keras_model.getWeights()
-        asyncio.run(self.broadcastParametersToNeighbors(weights=weights))
+        self.channel_pool.run(self.broadcastParametersToNeighbors(weights=weights, full_weights_flag=True))
 
     def aggregate(self):
         # TODO: set the hyperparameters eps_t and alph_t (i.e., consensus step-size and mixing weights)
@@ -57,13 +58,25 @@ class DFLv2Strategy(IDFLStrategy):
         alph_t = dict([(actor_addr, 1) for actor_addr in self.config["neighbors"]])
         current_weights = self.keras_model.getWeights()
         received_model_updates = self.model_update_market.get()
-        received_model_weights = {key: val["weights"] for key, val in received_model_updates.items()}
-        new_weights = AggregationUtils.consensusbasedFedAvg(
-            current_weights, received_model_weights, eps_t, alph_t)
+        # NOTE: canonical aggregation order (by address), such that the neighbors which hold the same
+        #   model updates can derive our new weights exactly (see resolveModelVersion)
+        received_model_weights = {key: received_model_updates[key]["weights"]
+            for key in sorted(received_model_updates.keys())}
+        self.registerRoundModels({self.config["address"]: current_weights, **received_model_weights})
+        if(AggregationUtils.isDense(received_model_weights.values())):
+            new_weights = AggregationUtils.consensusbasedFedAvgInPlace(
+                current_weights, received_model_weights, eps_t, alph_t,
+                out=self.getAggregationBuffer("weights", current_weights),
+                scratch=self.getAggregationBuffer("scratch", current_weights)).toHeterogeneous()
+            self.model_recipe = ([self.config["address"], *received_model_weights.keys()],
+                AggregationUtils.getConsensusCoefficients(received_model_weights.keys(), eps_t, alph_t))
+        else:
+            new_weights = AggregationUtils.consensusbasedFedAvg(
+                current_weights, received_model_weights, eps_t, alph_t)
         self.keras_model.setWeights(new_weights)
 
     # notify the neighbors about the completion and wait until this actor can terminate safely
     def stop(self):
         self.registerTerminationPermission(self.config["address"])
-        asyncio.run(self.signalTerminationPermission())
+        self.channel_pool.run(self.signalTerminationPermission())
         self.model_update_service.waitForTermination()
@@ -1,40 +1,119 @@
 from model.AggregationUtils import AggregationUtils
+from model.FlatParameterArray import FlatParameterArray
 from model.IDFLStrategy import IDFLStrategy
 from model.SerializationUtils import SerializationUtils
 from network.NetworkUtils import NetworkUtils
-from tffmodel.types.HeterogeneousDenseArray import HeterogeneousDenseArray
 
-import asyncio
 import logging
+import numpy as np
+import tensorflow as tf
 
 # MEWMA to predict the next gradients based on currently computed gradients and
 #   previously predicted gradients
+# NOTE: the predictions are updated in place, unless they are shared with the neighbors (i.e., the
+#   model update service passes references), where the new predictions are written to new buffers
 class MultivariateExponentiallyWeightedMovingAverage:
     def __init__(self, neighbors, shape_gradient, a_ma):
         self.a_ma = a_ma
-        self.predictions = dict(
-            [(addr, HeterogeneousDenseArray.getZero(shape_gradient)) for addr in neighbors])
+        self.predictions = dict()
+        for addr in neighbors:
+            self.predictions[addr] = FlatParameterArray.emptyLike(shape_gradient)
+            self.predictions[addr].getFlattened().fill(0)
+        self.scratch = FlatParameterArray.emptyLike(shape_gradient)
 
     def get(self):
-        return self.predictions
-
-    def predict(self, computed_gradients):
-        pred_grad = lambda cg, pp: (cg * self.a_ma) + (pp * (1-self.a_ma))
-        new_predictions = dict(
-            [(addr, pred_grad(cg, self.predictions[addr])) for addr, cg in computed_gradients.items()])
-        self.predictions = new_predictions
-        return new_predictions
+        return {addr: prediction.toHeterogeneous() for addr, prediction in self.predictions.items()}
+
+    def predict(self, computed_gradients, shared_flag=False):
+        for addr, cg in computed_gradients.items():
+            previous_prediction = self.predictions[addr]
+            prediction = FlatParameterArray.emptyLike(previous_prediction) if shared_flag else previous_prediction
+            AggregationUtils.scaleInPlace(prediction, previous_prediction, 1 - self.a_ma)
+            AggregationUtils.addScaledInPlace(prediction, cg, self.a_ma, self.scratch)
+            self.predictions[addr] = prediction
+        return self.get()
+
+# compute the gradients of the local loss at the model weights of all neighbors in a single pass
+#   over the local training data, i.e., all weight sets are evaluated on each batch
+# NOTE: the weights are passed to a stateless call of the own model instead of being assigned to
+#   the variables of a model clone, hence, the model is not cloned and its weights are not modified
+# NOTE: the non-trainable variables which are no weights of the model (e.g., the seed generator state
+#   of dropout layers) are taken from the model, advanced with each batch, and shared by all weight
+#   sets, such that all weight sets see the same random numbers per batch; the advanced state is
+#   written back to the model
+# NOTE: the loss includes the losses of the model (e.g., the regularization losses) like the training
+class NeighborGradients:
+    def __init__(self, keras_model):
+        self.model = keras_model.getModel()
+        self.loss = tf.keras.losses.get(self.model.loss)
+        weight_indices = {id(variable): idx for idx, variable in enumerate(self.model.weights)}
+        self.trainable_indices = [weight_indices[id(variable)] for variable in self.model.trainable_variables]
+        # index of each non-trainable variable in the weights (None for the model state)
+        self.non_trainable_indices = [weight_indices.get(id(variable))
+            for variable in self.model.non_trainable_variables]
+
+    # gradients of the batch loss w.r.t. the trainable variables for each weight set and the
+    #   non-trainable variables after the call with the first weight set
+    @tf.function(reduce_retracing=True)
+    def computeBatchGradients(self, x, y, trainable_weights_list, non_trainable_weights_list):
+        batch_gradients = list()
+        updated_non_trainable_weights = None
+        for trainable_weights, non_trainable_weights in zip(trainable_weights_list, non_trainable_weights_list):
+            with tf.GradientTape() as tape:
+                tape.watch(trainable_weights)
+                y_pred, non_trainable_values, losses = self.model.stateless_call(trainable_weights,
+                    non_trainable_weights, x, training=True, return_losses=True)
+                loss = tf.reduce_mean(self.loss(y, y_pred))
+                if(losses):
+                    loss += tf.add_n(losses)
+            batch_gradients.append(tape.gradient(loss, trainable_weights))
+            if(updated_non_trainable_weights is None):
+                updated_non_trainable_weights = non_trainable_values
+        return batch_gradients, updated_non_trainable_weights
+
+    # compute the mean batch gradient for each of the weights and write it into the output buffers
+    # NOTE: the gradient of the non-trainable weights is zero
+    def compute(self, dataset, weights_list, outs):
+        trainable_weights_list = [[tf.convert_to_tensor(weights.get()[idx]) for idx in self.trainable_indices]
+            for weights in weights_list]
+        non_trainable_weights_list = [[None if idx is None else tf.convert_to_tensor(weights.get()[idx])
+            for idx in self.non_trainable_indices] for weights in weights_list]
+        model_state = [tf.convert_to_tensor(variable) if idx is None else None
+            for idx, variable in zip(self.non_trainable_indices, self.model.non_trainable_variables)]
+        for out in outs:
+            out.getFlattened().fill(0)
+
+        num_batches = 0
+        for x, y in dataset.train:
+            batch_gradients, updated_non_trainable_weights = self.computeBatchGradients(
+                x, y, trainable_weights_list, [[state if weight is None else weight
+                    for weight, state in zip(non_trainable_weights, model_state)]
+                    for non_trainable_weights in non_trainable_weights_list])
+            model_state = [value if idx is None else None
+                for idx, value in zip(self.non_trainable_indices, updated_non_trainable_weights)]
+            for out, gradients in zip(outs, batch_gradients):
+                out_layers = out.get()
+                for idx, gradient in zip(self.trainable_indices, gradients):
+                    np.add(out_layers[idx], gradient, out=out_layers[idx])
+            num_batches += 1
+        for idx, variable, state in zip(self.non_trainable_indices, self.model.non_trainable_variables, model_state):
+            if(idx is None):
+                variable.assign(state)
+        for out in outs:
+            AggregationUtils.scaleInPlace(out, out, 1 / max(num_batches, 1))
+        return outs
 
 # Consensus-based Federated Averaging w/ Gradient Exchange
 class DFLv3Strategy(IDFLStrategy):
-    def __init__(self, config, keras_model, dataset):
-        super().__init__(config, keras_model, dataset)
+    def __init__(self, config, keras_model, dataset, network_flag=True):
+        super().__init__(config, keras_model, dataset, network_flag)
         self.model_parameters = keras_model.getWeights()
         # shape_gradient = keras_model.computeGradient(dataset, num_local_epochs=1)
         shape_gradient = self.model_parameters # gradient and weights have the same shape, only used to determine shape
         # TODO: set the hyperparameter a_ma (i.e., moving average magnitude)
         self.mewma = MultivariateExponentiallyWeightedMovingAverage(
             neighbors=config["neighbors"], shape_gradient=shape_gradient, a_ma=0.99)
+        self.neighbor_gradients = NeighborGradients(keras_model)
         self.logger = logging.getLogger("model/DFLv3Strategy")
         self.logger.setLevel(config["log_level"])
 
@@ -45,8 +124,7 @@ class DFLv3Strategy(IDFLStrategy):
 
         # callback for getting an evaluation request form an actor
         def evaluateModelCallback(request):
-            weights = SerializationUtils.deserializeParameters(
-                request.parameters, sparse=request.sparse)
+            weights = SerializationUtils.deserializeParametersMessage(request)
             eval_metrics = self.evaluateWeights(weights)
             return eval_metrics
 
@@ -60,6 +138,7 @@ class DFLv3Strategy(IDFLStrategy):
 
         callbacks = {"TransferModelUpdate": transferModelUpdateCallback,
             "EvaluateModel": evaluateModelCallback,
+            "EvaluateModelVersion": self.evaluateModelVersion,
             "AllowTermination": allowTerminationCallback}
 
         self.model_update_service = NetworkUtils.getModelUpdateService(self.config)
@@ -72,17 +151,16 @@ class DFLv3Strategy(IDFLStrategy):
         return train_metrics
 
     def broadcast(self):
-        asyncio.run(self.broadcastWeightsAndGradientsToNeighbors(
+        self.channel_pool.run(self.broadcastWeightsAndGradientsToNeighbors(
             self.model_parameters, self.mewma.get()))
 
+    # NOTE: computing only one gradient per neighbor (i.e., one local epoch)
     def computeGradients(self, received_model_updates):
-        comp_grad_model = self.keras_model.clone()
-        computed_gradients = dict()
-        for addr, (mp, _) in received_model_updates.items():
-            comp_grad_model.setWeights(mp)
-            # NOTE: computing only one gradient per neighbor
-            computed_gradients[addr] = comp_grad_model.computeGradient(self.dataset, num_local_epochs=1)
-        return computed_gradients
+        addresses = list(received_model_updates.keys())
+        outs = [self.getAggregationBuffer(f'gradient_{addr}', self.model_parameters) for addr in addresses]
+        self.neighbor_gradients.compute(self.dataset,
+            [mp for mp, _ in received_model_updates.values()], outs)
+        return dict(zip(addresses, outs))
 
     def aggregate(self):
         # TODO: set the hyperparameters eps_t, alph_t, mu_t, and beta_t (i.e., consensus step-size and mixing weights)
@@ -96,13 +174,24 @@ class DFLv3Strategy(IDFLStrategy):
         received_model_updates_tuples = {key: (val["weights"], val["gradient"]) for key, val in received_model_updates.items()}
 
         computed_gradients = self.computeGradients(received_model_updates_tuples)
-        self.model_parameters, adjusted_model_parameters = AggregationUtils.consensusbasedFedAvgWithGradExchange(
-            current_weights, received_model_updates_tuples, eps_t, alph_t, mu_t, beta_t)
-        self.mewma.predict(computed_gradients)
+        if(AggregationUtils.isDense([parameters for update in received_model_updates_tuples.values()
+            for parameters in update])):
+            # NOTE: the model parameters are broadcast in the next round
+            model_parameters, adjusted_model_parameters = AggregationUtils.consensusbasedFedAvgWithGradExchangeInPlace(
+                current_weights, received_model_updates_tuples, eps_t, alph_t, mu_t, beta_t,
+                out_model=self.getAggregationBuffer("model_parameters", current_weights, broadcast_flag=True),
+                out_adjusted=self.getAggregationBuffer("adjusted_model_parameters", current_weights),
+                scratch=self.getAggregationBuffer("scratch", current_weights))
+            self.model_parameters = model_parameters.toHeterogeneous()
+            adjusted_model_parameters = adjusted_model_parameters.toHeterogeneous()
+        else:
+            self.model_parameters, adjusted_model_parameters = AggregationUtils.consensusbasedFedAvgWithGradExchange(
+                current_weights, received_model_updates_tuples, eps_t, alph_t, mu_t, beta_t)
+        self.mewma.predict(computed_gradients, shared_flag=self.model_update_service.passesReferences())
         self.keras_model.setWeights(adjusted_model_parameters)
 
     # notify the neighbors about the completion and wait until this actor can terminate safely
     def stop(self):
         self.registerTerminationPermission(self.config["address"])
-        asyncio.run(self.signalTerminationPermission())
+        self.channel_pool.run(self.signalTerminationPermission())
         self.model_update_service.waitForTermination()
@@ -22,8 +22,8 @@ class FedProxRegularizer(tf.keras.regularizers.Regularizer):
 
 # FedProx
 class DFLv4Strategy(DFLv1Strategy):
-    def __init__(self, config, keras_model, dataset):
-        super().__init__(config, keras_model, dataset)
+    def __init__(self, config, keras_model, dataset, network_flag=True):
+        super().__init__(config, keras_model, dataset, network_flag)
         self.logger = logging.getLogger("model/DFLv4Strategy")
         self.logger.setLevel(config["log_level"])
 
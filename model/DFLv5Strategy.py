@@ -3,14 +3,13 @@ from model.IDFLStrategy import IDFLStrategy
 from model.SerializationUtils import SerializationUtils
 from network.NetworkUtils import NetworkUtils
 
-import asyncio
 import logging
 import numpy as np
 
 # FedNova
 class DFLv5Strategy(IDFLStrategy):
-    def __init__(self, config, keras_model, dataset):
-        super().__init__(config, keras_model, dataset)
+    def __init__(self, config, keras_model, dataset, network_flag=True):
+        super().__init__(config, keras_model, dataset, network_flag)
         self.logger = logging.getLogger("model/DFLv5Strategy")
         self.logger.setLevel(config["log_level"])
 
@@ -21,8 +20,7 @@ class DFLv5Strategy(IDFLStrategy):
 
         # callback for getting an evaluation request form an actor
         def evaluateModelCallback(request):
-            weights = SerializationUtils.deserializeParameters(
-                request.parameters, sparse=request.sparse)
+            weights = SerializationUtils.deserializeParametersMessage(request)
             eval_metrics = self.evaluateWeights(weights)
             return eval_metrics
 
@@ -36,6 +34,7 @@ class DFLv5Strategy(IDFLStrategy):
 
         callbacks = {"TransferModelUpdate": transferModelUpdateCallback,
             "EvaluateModel": evaluateModelCallback,
+            "EvaluateModelVersion": self.evaluateModelVersion,
             "AllowTermination": allowTerminationCallback}
 
         self.model_update_service = NetworkUtils.getModelUpdateService(self.config)
@@ -50,7 +49,7 @@ class DFLv5Strategy(IDFLStrategy):
         return train_metrics
 
     def broadcast(self):
-        asyncio.run(self.broadcastParametersToNeighbors(gradient=self.computed_gradient,
+        self.channel_pool.run(self.broadcastParametersToNeighbors(gradient=self.computed_gradient,
             aggregation_weight=self.dataset.train.cardinality().numpy()))
 
     def aggregate(self):
@@ -64,12 +63,18 @@ class DFLv5Strategy(IDFLStrategy):
         a_values = np.ones(len(model_gradients))
         tau_eff = 1
 
-        new_weights = AggregationUtils.fedNova(self.previous_weights, model_gradients,
-            aggregation_weights, tau_eff, self.config["lr_global"], a_values)
+        if(AggregationUtils.isDense(model_gradients)):
+            new_weights = AggregationUtils.fedNovaInPlace(self.previous_weights, model_gradients,
+                aggregation_weights, tau_eff, self.config["lr_global"], a_values,
+                out=self.getAggregationBuffer("weights", self.previous_weights),
+                scratch=self.getAggregationBuffer("scratch", self.previous_weights)).toHeterogeneous()
+        else:
+            new_weights = AggregationUtils.fedNova(self.previous_weights, model_gradients,
+                aggregation_weights, tau_eff, self.config["lr_global"], a_values)
         self.keras_model.setWeights(new_weights)
 
     # notify the neighbors about the completion and wait until this actor can terminate safely
     def stop(self):
         self.registerTerminationPermission(self.config["address"])
-        asyncio.run(self.signalTerminationPermission())
+        self.channel_pool.run(self.signalTerminationPermission())
         self.model_update_service.waitForTermination()
@@ -4,15 +4,17 @@ from model.SerializationUtils import SerializationUtils
 from network.NetworkUtils import NetworkUtils
 from tffmodel.KerasModel import KerasModel
 
-import asyncio
 import logging
 
 # FedAvg using gradients
 class DFLv6Strategy(IDFLStrategy):
-    def __init__(self, config, keras_model, dataset):
-        super().__init__(config, keras_model, dataset)
+    def __init__(self, config, keras_model, dataset, network_flag=True):
+        super().__init__(config, keras_model, dataset, network_flag)
         self.logger = logging.getLogger("model/DFLv6Strategy")
         self.logger.setLevel(config["log_level"])
+        if(self.config["market_accumulate_flag"]):
+            # fold the received gradients into a running sum as they arrive
+            self.model_update_market.enableAccumulation("gradient")
 
     def startServer(self):
         # callback for receiving a model update from an actor
@@ -21,8 +23,7 @@ class DFLv6Strategy(IDFLStrategy):
 
         # callback for getting an evaluation request form an actor
         def evaluateModelCallback(request):
-            weights = SerializationUtils.deserializeParameters(
-                request.parameters, sparse=request.sparse)
+            weights = SerializationUtils.deserializeParametersMessage(request)
             eval_metrics = self.evaluateWeights(weights)
             return eval_metrics
 
@@ -36,6 +37,7 @@ class DFLv6Strategy(IDFLStrategy):
 
         callbacks = {"TransferModelUpdate": transferModelUpdateCallback,
             "EvaluateModel": evaluateModelCallback,
+            "EvaluateModelVersion": self.evaluateModelVersion,
             "AllowTermination": allowTerminationCallback}
 
         self.model_update_service = NetworkUtils.getModelUpdateService(self.config)
@@ -51,21 +53,32 @@ class DFLv6Strategy(IDFLStrategy):
         return train_metrics
 
     def broadcast(self):
-        asyncio.run(self.broadcastParametersToNeighbors(gradient=self.computed_gradient,
+        self.channel_pool.run(self.broadcastParametersToNeighbors(gradient=self.computed_gradient,
             aggregation_weight=self.dataset.train.cardinality().numpy()))
 
     def aggregate(self):
+        if(self.model_update_market.isAccumulating()):
+            avg_model_gradient = AggregationUtils.finalizeRunningAverage(self.computed_gradient,
+                self.dataset.train.cardinality().numpy(), self.model_update_market.getAccumulated())
+            self.keras_model.setWeights(self.previous_weights - (avg_model_gradient * self.config["lr_global"]))
+            return
         received_model_update_vals = self.model_update_market.get().values()
         model_gradients = [rmu["gradient"] for rmu in received_model_update_vals]
         aggregation_weights = [rmu["aggregation_weight"] for rmu in received_model_update_vals]
         model_gradients = [self.computed_gradient, *model_gradients]
         aggregation_weights = [self.dataset.train.cardinality().numpy(), *aggregation_weights]
-        avg_model_gradient = AggregationUtils.averageModelParameters(model_gradients, aggregation_weights)
-        new_weights = self.previous_weights - (avg_model_gradient * self.config["lr_global"])
+        if(AggregationUtils.isDense(model_gradients)):
+            new_weights = AggregationUtils.averageModelParametersInPlace(model_gradients, aggregation_weights,
+                out=self.getAggregationBuffer("weights", self.previous_weights))
+            AggregationUtils.scaleInPlace(new_weights, new_weights, -self.config["lr_global"])
+            new_weights = AggregationUtils.addScaledInPlace(new_weights, self.previous_weights, 1).toHeterogeneous()
+        else:
+            avg_model_gradient = AggregationUtils.averageModelParameters(model_gradients, aggregation_weights)
+            new_weights = self.previous_weights - (avg_model_gradient * self.config["lr_global"])
         self.keras_model.setWeights(new_weights)
 
     # notify the neighbors about the completion and wait until this actor can terminate safely
     def stop(self):
         self.registerTerminationPermission(self.config["address"])
-        asyncio.run(self.signalTerminationPermission())
+        self.channel_pool.run(self.signalTerminationPermission())
         self.model_update_service.waitForTermination()
@@ -5,13 +5,12 @@ from network.Compression import Compression
 from network.NetworkUtils import NetworkUtils
 from tffmodel.KerasModel import KerasModel
 
-import asyncio
 import logging
 
 # FedAvg w/ Gradient Compression
 class DFLv7Strategy(IDFLStrategy):
-    def __init__(self, config, keras_model, dataset):
-        super().__init__(config, keras_model, dataset)
+    def __init__(self, config, keras_model, dataset, network_flag=True):
+        super().__init__(config, keras_model, dataset, network_flag)
         self.logger = logging.getLogger("model/DFLv7Strategy")
         self.logger.setLevel(config["log_level"])
 
@@ -22,8 +21,7 @@ class DFLv7Strategy(IDFLStrategy):
 
         # callback for getting an evaluation request form an actor
         def evaluateModelCallback(request):
-            weights = SerializationUtils.deserializeParameters(
-                request.parameters, sparse=request.sparse)
+            weights = SerializationUtils.deserializeParametersMessage(request)
             eval_metrics = self.evaluateWeights(weights)
             return eval_metrics
 
@@ -37,6 +35,7 @@ class DFLv7Strategy(IDFLStrategy):
 
         callbacks = {"TransferModelUpdate": transferModelUpdateCallback,
             "EvaluateModel": evaluateModelCallback,
+            "EvaluateModelVersion": self.evaluateModelVersion,
             "AllowTermination": allowTerminationCallback}
 
         self.model_update_service = NetworkUtils.getModelUpdateService(self.config)
@@ -53,7 +52,7 @@ class DFLv7Strategy(IDFLStrategy):
         return train_metrics
 
     def broadcast(self):
-        asyncio.run(self.broadcastParametersToNeighbors(gradient=self.computed_gradient,
+        self.channel_pool.run(self.broadcastParametersToNeighbors(gradient=self.computed_gradient,
             aggregation_weight=self.dataset.train.cardinality().numpy()))
 
     def aggregate(self):
@@ -63,12 +62,18 @@ class DFLv7Strategy(IDFLStrategy):
         model_gradients = [Compression.compressDecompress(
             self.computed_gradient, self.config), *model_gradients]
         aggregation_weights = [self.dataset.train.cardinality().numpy(), *aggregation_weights]
-        avg_model_gradient = AggregationUtils.averageModelParameters(model_gradients, aggregation_weights)
-        new_weights = self.previous_weights - (avg_model_gradient * self.config["lr_global"])
+        if(AggregationUtils.isDense(model_gradients)):
+            new_weights = AggregationUtils.averageModelParametersInPlace(model_gradients, aggregation_weights,
+                out=self.getAggregationBuffer("weights", self.previous_weights))
+            AggregationUtils.scaleInPlace(new_weights, new_weights, -self.config["lr_global"])
+            new_weights = AggregationUtils.addScaledInPlace(new_weights, self.previous_weights, 1).toHeterogeneous()
+        else:
+            avg_model_gradient = AggregationUtils.averageModelParameters(model_gradients, aggregation_weights)
+            new_weights = self.previous_weights - (avg_model_gradient * self.config["lr_global"])
         self.keras_model.setWeights(new_weights)
 
     # notify the neighbors about the completion and wait until this actor can terminate safely
     def stop(self):
         self.registerTerminationPermission(self.config["address"])
-        asyncio.run(self.signalTerminationPermission())
+        self.channel_pool.run(self.signalTerminationPermission())
         self.model_update_service.waitForTermination()
@@ -6,14 +6,15 @@ from network.NetworkUtils import NetworkUtils
 from tffmodel.KerasModel import KerasModel
 from utils.PartitioningUtils import PartitioningUtils
 
-import asyncio
 import logging
 
 GLOBAL_PARTITION_FLAG = -1
 
 class DFLv8Strategy(DFLv1Strategy):
-    def __init__(self, config, keras_model, dataset):
-        super().__init__(config, keras_model, dataset)
+    accumulation_flag = False # the partitions are aggregated from the queued model updates
+
+    def __init__(self, config, keras_model, dataset, network_flag=True):
+        super().__init__(config, keras_model, dataset, network_flag)
         self.global_weight_partition = PartitioningUtils.getParameterPartition(
             keras_model.getWeights(), config["actor_idx"], self.config)
         self.model_partition_market = ModelUpdateMarket(self.config)
@@ -30,8 +31,7 @@ class DFLv8Strategy(DFLv1Strategy):
 
         # callback for getting an evaluation request form an actor
         def evaluateModelCallback(request):
-            weights = SerializationUtils.deserializeParameters(
-                request.parameters, sparse=request.sparse)
+            weights = SerializationUtils.deserializeParametersMessage(request)
             eval_metrics = self.evaluateWeights(weights)
             return eval_metrics
 
@@ -45,6 +45,7 @@ class DFLv8Strategy(DFLv1Strategy):
 
         callbacks = {"TransferModelUpdate": transferModelUpdateCallback,
             "EvaluateModel": evaluateModelCallback,
+            "EvaluateModelVersion": self.evaluateModelVersion,
             "AllowTermination": allowTerminationCallback}
 
         self.model_update_service = NetworkUtils.getModelUpdateService(self.config)
@@ -56,7 +57,7 @@ class DFLv8Strategy(DFLv1Strategy):
 
         model_delta_partitioned = PartitioningUtils.partitionModelParameters(model_delta, self.config)
 
-        asyncio.run(self.broadcastWeightPartitions(model_delta_partitioned,
+        self.channel_pool.run(self.broadcastWeightPartitions(model_delta_partitioned,
             self.dataset.train.cardinality().numpy()))
 
     def aggregateWeightPartitions(self):
@@ -72,8 +73,8 @@ class DFLv8Strategy(DFLv1Strategy):
         self.global_weight_partition = self.global_weight_partition + avg_model_deltas
 
     def broadcastGlobalWeightPartition(self):
-        asyncio.run(self.broadcastParametersToNeighbors(weights=self.global_weight_partition,
-            aggregation_weight=GLOBAL_PARTITION_FLAG))
+        self.channel_pool.run(self.broadcastParametersToNeighbors(weights=self.global_weight_partition,
+            aggregation_weight=GLOBAL_PARTITION_FLAG, full_weights_flag=True))
 
     def setLocalWeights(self):
         actor_idx_lookup_dict = dict(zip(self.config["neighbors"], self.config["neighbor_idx"]))
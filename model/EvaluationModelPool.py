@@ -0,0 +1,64 @@
+from tffmodel.KerasModel import KerasModel
+
+from contextlib import contextmanager
+import logging
+import threading
+
+# bounded pool of evaluation models for the evaluation requests of the neighbors
+# NOTE: the models are built on demand (at most eval_pool_size) and kept for all subsequent requests,
+#   such that their compiled evaluation functions are reused; surplus requests are queued until a
+#   model is released
+# NOTE: while the actor trains its local model, at most eval_pool_size_training evaluations are
+#   admitted (0 defers all evaluations until the local training has finished)
+class EvaluationModelPool:
+    def __init__(self, keras_model, config):
+        self.keras_model = keras_model
+        self.config = config
+        self.logger = logging.getLogger("model/EvaluationModelPool")
+        self.logger.setLevel(config["log_level"])
+        self.idle_models = list()
+        self.num_models = 0
+        self.num_active = 0
+        self.training_flag = False
+        self.condition = threading.Condition()
+
+    # maximum number of concurrent evaluations in the current phase of the actor
+    def getLimit(self):
+        if(self.training_flag):
+            return min(self.config["eval_pool_size_training"], self.config["eval_pool_size"])
+        return self.config["eval_pool_size"]
+
+    # mark the begin and the end of the local training
+    def setTraining(self, training_flag):
+        with self.condition:
+            self.training_flag = training_flag
+            self.condition.notify_all()
+
+    # obtain an evaluation model for the duration of the context (blocks until admitted)
+    @contextmanager
+    def acquire(self):
+        with self.condition:
+            self.condition.wait_for(lambda: self.num_active < self.getLimit())
+            self.num_active += 1
+            eval_model = self.idle_models.pop() if self.idle_models else None
+            if(eval_model is None):
+                self.num_models += 1
+        try:
+            if(eval_model is None):
+                self.logger.debug(f'Building evaluation model {self.num_models}/{self.config["eval_pool_size"]}.')
+                eval_model = self.keras_model.clone()
+            yield eval_model
+        finally:
+            with self.condition:
+                if(eval_model is not None):
+                    self.idle_models.append(eval_model)
+                else: # building the model failed
+                    self.num_models -= 1
+                self.num_active -= 1
+                self.condition.notify_all()
+
+    # evaluate the specified weights on the data with a model of the pool
+    def evaluate(self, weights, data):
+        with self.acquire() as eval_model:
+            eval_model.setWeights(weights)
+            return KerasModel.evaluateKerasModel(eval_model.getModel(), data)
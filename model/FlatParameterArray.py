@@ -0,0 +1,149 @@
+from tffmodel.types.HeterogeneousDenseArray import HeterogeneousDenseArray
+
+import math
+import numpy as np
+
+STACK_BLOCK_SIZE = 262144 # number of parameters per block of the stacked model updates
+
+# dense model parameters backed by one contiguous buffer with a view per layer
+# NOTE: scalars are cast to the dtype of the buffer, such that the arithmetic never widens the
+#   dtype (e.g., float32 parameters multiplied by an int64 aggregation weight stay float32)
+class FlatParameterArray:
+    is_sparse = False
+
+    def __init__(self, buffer, shapes):
+        self.buffer = buffer
+        self.shapes = [tuple(shape) for shape in shapes]
+        self.layers = list()
+        offset = 0
+        for shape in self.shapes:
+            size = math.prod(shape)
+            self.layers.append(self.buffer[offset : offset+size].reshape(shape))
+            offset += size
+
+    # allocate an uninitialized buffer for parameters with the specified layer shapes
+    @classmethod
+    def empty(self_class, shapes, dtype=np.float32):
+        return self_class(np.empty(sum([math.prod(shape) for shape in shapes]), dtype=dtype), shapes)
+
+    # allocate an uninitialized buffer with the layer shapes and the dtype of the specified parameters
+    @classmethod
+    def emptyLike(self_class, parameters):
+        layers = parameters.get()
+        return self_class.empty([layer.shape for layer in layers], dtype=np.result_type(*layers))
+
+    # copy the layers of a HeterogeneousArray into one contiguous buffer
+    @classmethod
+    def fromHeterogeneous(self_class, parameters, dtype=None):
+        layers = parameters.get()
+        if(dtype is None):
+            dtype = np.result_type(*layers)
+        flat_parameters = self_class.empty([layer.shape for layer in layers], dtype=dtype)
+        for layer_view, layer in zip(flat_parameters.layers, layers):
+            np.copyto(layer_view, layer, casting="same_kind")
+        return flat_parameters
+
+    # wrap the layer views into a HeterogeneousDenseArray (without copying)
+    def toHeterogeneous(self):
+        return HeterogeneousDenseArray(list(self.layers))
+
+    def get(self):
+        return self.layers
+
+    def getFlattened(self):
+        return self.buffer
+
+    def getNumLayers(self):
+        return len(self.layers)
+
+    def getSize(self):
+        return self.buffer.nbytes
+
+    def getDType(self):
+        return self.buffer.dtype
+
+    def getDTypeName(self):
+        return self.buffer.dtype.name
+
+    def copy(self):
+        return FlatParameterArray(self.buffer.copy(), self.shapes)
+
+    # obtain the operand as scalar of the buffer dtype or as flat buffer
+    def getOperand(self, other):
+        if(isinstance(other, FlatParameterArray)):
+            return other.buffer
+        return self.buffer.dtype.type(other)
+
+    def __add__(self, other):
+        return FlatParameterArray(np.add(self.buffer, self.getOperand(other)), self.shapes)
+
+    def __sub__(self, other):
+        return FlatParameterArray(np.subtract(self.buffer, self.getOperand(other)), self.shapes)
+
+    def __mul__(self, other):
+        return FlatParameterArray(np.multiply(self.buffer, self.getOperand(other)), self.shapes)
+
+    def __truediv__(self, other):
+        return FlatParameterArray(np.divide(self.buffer, self.getOperand(other)), self.shapes)
+
+    def __iadd__(self, other):
+        np.add(self.buffer, self.getOperand(other), out=self.buffer)
+        return self
+
+    def __isub__(self, other):
+        np.subtract(self.buffer, self.getOperand(other), out=self.buffer)
+        return self
+
+    def __imul__(self, other):
+        np.multiply(self.buffer, self.getOperand(other), out=self.buffer)
+        return self
+
+    def __itruediv__(self, other):
+        np.divide(self.buffer, self.getOperand(other), out=self.buffer)
+        return self
+
+    # obtain the layers of the parameters (FlatParameterArray or HeterogeneousArray) as flat arrays
+    @classmethod
+    def getFlatLayers(self_class, parameters):
+        if(isinstance(parameters, FlatParameterArray)):
+            return [parameters.buffer]
+        return [layer.reshape(-1) for layer in parameters.get()]
+
+    # copy the elements [start, end) of the concatenated flat layers into the output
+    @classmethod
+    def copyRange(self_class, flat_layers, start, end, out):
+        offset = 0
+        for layer in flat_layers:
+            layer_end = offset + layer.size
+            if(layer_end > start and offset < end):
+                range_start, range_end = max(start, offset), min(end, layer_end)
+                np.copyto(out[range_start-start : range_end-start],
+                    layer[range_start-offset : range_end-offset], casting="same_kind")
+            if(layer_end >= end):
+                break
+            offset = layer_end
+
+    # average the parameters weighted by the specified weights
+    # NOTE: the parameters are stacked block by block into a (k x block size) matrix which is reduced
+    #   with a single matrix-vector product (BLAS), such that neither a temporary per operation nor a
+    #   stacked copy of all k models is allocated
+    @classmethod
+    def weightedAverage(self_class, parameters_list, weights=None, out=None, block_size=STACK_BLOCK_SIZE):
+        flat_layers_list = [self_class.getFlatLayers(parameters) for parameters in parameters_list]
+        dtype = out.buffer.dtype if out is not None \
+            else np.result_type(*[layer for flat_layers in flat_layers_list for layer in flat_layers])
+        if(out is None):
+            out = self_class.empty([layer.shape for layer in parameters_list[0].get()], dtype=dtype)
+        if(weights is None):
+            weights = np.ones(len(parameters_list))
+        weights = np.asarray(weights, dtype=np.float64)
+        weights = (weights / weights.sum()).astype(dtype)
+
+        num_parameters = out.buffer.size
+        stacked_block = np.empty((len(parameters_list), min(block_size, num_parameters)), dtype=dtype)
+        for start in range(0, num_parameters, block_size):
+            end = min(start + block_size, num_parameters)
+            for row, flat_layers in zip(stacked_block, flat_layers_list):
+                self_class.copyRange(flat_layers, start, end, row)
+            np.matmul(weights, stacked_block[:, : end-start], out=out.buffer[start : end])
+        return out
@@ -1,24 +1,57 @@
+from model.AggregationUtils import AggregationUtils
+from model.EvaluationModelPool import EvaluationModelPool
+from model.FlatParameterArray import FlatParameterArray
 from model.ModelUpdateMarket import ModelUpdateMarket
 from model.SerializationUtils import SerializationUtils
+from network.AdaptiveCompression import AdaptiveCompression
 from network.Compression import Compression
+from network.ErrorFeedback import ErrorFeedback
+from network.GRPCChannelPool import GRPCChannelPool
+from network.InMemoryModelUpdateService import ModelUpdateReference
+from network.ModelUpdateStreaming import ModelUpdateChunks, stripPayload
 from network.PartialDeviceParticipation import PartialDeviceParticipation
+from network.WireCodec import WireCodec, WireCodecType
 import network.protos.ModelUpdate_pb2 as ModelUpdate_pb2
-import network.protos.ModelUpdate_pb2_grpc as ModelUpdate_pb2_grpc
 from tffmodel.KerasModel import KerasModel
 from utils.CommunicationLogger import CommunicationLogger
 from utils.PerformanceLogger import PerformanceLogger
 
 from abc import ABC, abstractmethod
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import grpc
 import numpy as np
+import tensorflow as tf
+import threading
+import time
 
 class IDFLStrategy(ABC):
-    def __init__(self, config, keras_model, dataset):
+    # NOTE: without the network flag (e.g., in the lockstep simulation), the strategy neither opens
+    #   channels to the neighbors nor evaluates models for them or in the background
+    def __init__(self, config, keras_model, dataset, network_flag=True):
         self.config = config
         self.keras_model = keras_model
         self.model_update_market = ModelUpdateMarket(self.config)
         self.dataset = dataset
+        # long-lived channels to the neighbors and the event loop for all asynchronous calls
+        self.channel_pool = GRPCChannelPool(self.config) if network_flag else None
+        self.wire_codecs = dict() # negotiated wire codec per neighbor
+        self.aggregation_buffers = dict() # output and scratch buffers of the in-place aggregation
+        self.error_feedback = ErrorFeedback(self.config) # residuals of the compression error
+        self.adaptive_compression = AdaptiveCompression(self.config) # compression level per link
+        self.neighbor_levels = dict() # compression level per neighbor in the last broadcast
+        self.eval_model_pool = EvaluationModelPool(self.keras_model, self.config) \
+            if network_flag else None # models for the neighbor evaluations
+        self.round = 0 # current federated epoch
+        self.model_recipe = None # contributors and coefficients of the own model in the current round
+        self.round_models = (0, dict()) # weights broadcast in a round per actor (to derive the neighbors' models)
+        self.model_version = None # version and weights of the own model after the last aggregation
+        self.model_version_lock = threading.Lock() # guards the lazily computed hash of the version
+        self.eval_data = self.getEvaluationData()
+        # single thread for the evaluations in the background (overlapping the next local training)
+        self.eval_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="Evaluation") \
+            if (self.config["eval_background"] and network_flag) else None
+        self.eval_futures = list()
 
     # define the required callbacks for the service and start the model update service
     @abstractmethod
@@ -30,70 +63,315 @@ class IDFLStrategy(ABC):
     def fitLocal(self):
         pass
 
-    # construct the model update message and broadcast it to the specified address
-    async def broadcastParametersTo(self, address, weights_serialized=None, weights_sparse=None,
-        gradient_serialized=None, gradient_sparse=None, aggregation_weight=0):
-        async with grpc.aio.insecure_channel(address) as channel:
-            weights_msg = ModelUpdate_pb2.ModelParameters(sparse=weights_sparse,
-                parameters=weights_serialized) if weights_serialized else None
-            gradient_msg = ModelUpdate_pb2.ModelParameters(sparse=gradient_sparse,
-                parameters=gradient_serialized) if gradient_serialized else None
-            stub = ModelUpdate_pb2_grpc.ModelUpdateStub(channel)
-            await stub.TransferModelUpdate(ModelUpdate_pb2.ModelUpdateMessage(
+    # obtain the named aggregation buffer shaped like the specified parameters (reused across rounds)
+    # NOTE: a buffer whose content is broadcast is allocated anew each round if the model update
+    #   service passes references, because the neighbors may still hold the previous content
+    def getAggregationBuffer(self, name, shape_parameters, broadcast_flag=False):
+        if(name not in self.aggregation_buffers
+            or (broadcast_flag and self.model_update_service.passesReferences())):
+            self.aggregation_buffers[name] = FlatParameterArray.emptyLike(shape_parameters)
+        return self.aggregation_buffers[name]
+
+    # serialize the (compressed) parameters into the fields of a ModelParameters message or, if the
+    #   model update service passes references, reference the decompressed parameters instead
+    def toParametersFields(self, parameters):
+        if(self.model_update_service.passesReferences()):
+            return {"reference": Compression.decompress(parameters)}
+        return SerializationUtils.serializeParametersFields(parameters)
+
+    # perform the specified call on the neighbor (directly for in-process neighbors)
+    async def callNeighbor(self, address, method_name, request):
+        if(self.model_update_service.passesReferences()):
+            return await asyncio.to_thread(self.model_update_service.call, address, method_name, request)
+        return await self.channel_pool.call(address, method_name, request)
+
+    # obtain the lossless wire codec negotiated with the specified neighbor (cached per neighbor)
+    # NOTE: if the negotiation fails, the model update is sent without wire codec and the negotiation
+    #   is repeated with the next model update (unless the neighbor does not support wire codecs)
+    async def getWireCodec(self, address):
+        if(self.config["wire_codec"] == WireCodecType.NoneType
+            or self.model_update_service.isDirectlyReachable(address)):
+            return WireCodecType.NoneType
+        if(address not in self.wire_codecs):
+            try:
+                response = await self.channel_pool.call(address, "NegotiateWireCodec",
+                    ModelUpdate_pb2.WireCodecOffer(codecs=[self.config["wire_codec"].value]))
+                accepted_flag = self.config["wire_codec"].value in response.codecs
+            except grpc.aio.AioRpcError as err:
+                if(err.code() != grpc.StatusCode.UNIMPLEMENTED):
+                    self.logger.warning(f'Negotiating the wire codec with {address} failed ({err.code().name}), '
+                        + 'sending without wire codec.')
+                    return WireCodecType.NoneType
+                accepted_flag = False # the neighbor does not support wire codecs
+            self.wire_codecs[address] = self.config["wire_codec"] \
+                if accepted_flag else WireCodecType.NoneType
+            self.logger.debug(f'Negotiated wire codec {self.wire_codecs[address].name} with {address}.')
+        return self.wire_codecs[address]
+
+    # encode the ModelParameters fields with the specified wire codec (memoized per broadcast)
+    async def encodeParametersFields(self, parameters_fields, codec, encoding_cache):
+        key = (id(parameters_fields), codec)
+        if(key not in encoding_cache):
+            encoding_cache[key] = asyncio.ensure_future(asyncio.to_thread(WireCodec.encodeFields,
+                parameters_fields, codec, self.config["wire_codec_level"]))
+        return await encoding_cache[key]
+
+    # encode the model update with the wire codec negotiated per neighbor and transfer it
+    # NOTE: the weights and the gradient are passed as fields of a ModelParameters message
+    # NOTE: the encoding cache is shared among all calls of a broadcast, such that each payload
+    #   is encoded at most once per wire codec
+    async def broadcastParametersTo(self, addresses, weights_fields=None, gradient_fields=None,
+        aggregation_weight=0, encoding_cache=None):
+        if(not addresses):
+            return
+        if(self.model_update_service.passesReferences()):
+            await self.transferParametersTo(addresses, weights_fields=weights_fields,
+                gradient_fields=gradient_fields, aggregation_weight=aggregation_weight)
+            return
+        if(encoding_cache is None):
+            encoding_cache = dict()
+        codecs = await asyncio.gather(*[self.getWireCodec(addr) for addr in addresses])
+        codec_groups = dict()
+        for addr, codec in zip(addresses, codecs):
+            codec_groups.setdefault(codec, []).append(addr)
+
+        tasks = list()
+        for codec, group_addresses in codec_groups.items():
+            encoded_weights_fields = None
+            encoded_gradient_fields = None
+            if(weights_fields):
+                encoded_weights_fields, weights_stats = await self.encodeParametersFields(
+                    weights_fields, codec, encoding_cache)
+            if(gradient_fields):
+                encoded_gradient_fields, gradient_stats = await self.encodeParametersFields(
+                    gradient_fields, codec, encoding_cache)
+            if(self.config["log_communication_flag"] and codec != WireCodecType.NoneType):
+                # NOTE: the cpu time is spent once for all neighbors with the same wire codec
+                for stats in ([weights_stats] if weights_fields else []) \
+                    + ([gradient_stats] if gradient_fields else []):
+                    CommunicationLogger.logMultiple(self.config["address"], group_addresses, stats,
+                        category="wire_codec")
+            tasks.append(asyncio.create_task(self.transferParametersTo(group_addresses,
+                weights_fields=encoded_weights_fields, gradient_fields=encoded_gradient_fields,
+                aggregation_weight=aggregation_weight)))
+        await asyncio.wait(tasks, return_when=asyncio.ALL_COMPLETED)
+
+    # construct the model update message and transfer it to the specified addresses
+    # NOTE: directly reachable actors (e.g., co-located actors with shared memory) are served by the
+    #   model update service and all remaining actors via gRPC
+    async def transferParametersTo(self, addresses, weights_fields=None, gradient_fields=None,
+        aggregation_weight=0):
+        if(self.model_update_service.passesReferences()):
+            # in-process actors receive references to the parameters instead of a message
+            await asyncio.to_thread(self.model_update_service.transferModelUpdate, addresses,
+                ModelUpdateReference(weights=(weights_fields or {}).get("reference"),
+                    gradient=(gradient_fields or {}).get("reference"),
+                    aggregation_weight=aggregation_weight))
+            return
+
+        def createMessage(strip_flag):
+            weights_msg = ModelUpdate_pb2.ModelParameters(**(stripPayload(weights_fields)
+                if strip_flag else weights_fields)) if weights_fields else None
+            gradient_msg = ModelUpdate_pb2.ModelParameters(**(stripPayload(gradient_fields)
+                if strip_flag else gradient_fields)) if gradient_fields else None
+            return ModelUpdate_pb2.ModelUpdateMessage(
                 update=ModelUpdate_pb2.ModelParameterUpdate(
                     weights=weights_msg,
                     gradient=gradient_msg,
                     aggregation_weight=aggregation_weight),
-                identity=ModelUpdate_pb2.NetworkIdentity(ip_and_port=self.config["address"])))
+                identity=ModelUpdate_pb2.NetworkIdentity(ip_and_port=self.config["address"]))
+
+        direct_addresses = [addr for addr in addresses
+            if self.model_update_service.isDirectlyReachable(addr)]
+        grpc_addresses = [addr for addr in addresses if addr not in direct_addresses]
+        if(direct_addresses):
+            grpc_addresses.extend(await asyncio.to_thread(
+                self.model_update_service.transferModelUpdate, direct_addresses, createMessage(True),
+                weights_fields["parameters"] if weights_fields else None,
+                gradient_fields["parameters"] if gradient_fields else None))
+        if(not grpc_addresses):
+            return
+
+        payload_size = sum([len(elem) for elem in (weights_fields or {}).get("parameters", [])]) \
+            + sum([len(elem) for elem in (gradient_fields or {}).get("parameters", [])])
+        # stream large payloads in chunks to stay below the message size limit of gRPC
+        stream_flag = payload_size > self.config["stream_threshold"]
+        message = createMessage(stream_flag)
+
+        tasks = list()
+        for addr in grpc_addresses:
+            if(stream_flag):
+                tasks.append(asyncio.create_task(self.transferTo(addr, "TransferModelUpdateStream",
+                    ModelUpdateChunks(message,
+                        weights_fields["parameters"] if weights_fields else None,
+                        gradient_fields["parameters"] if gradient_fields else None,
+                        self.config["stream_chunk_size"]), payload_size,
+                    timeout=self.config["rpc_stream_timeout"])))
+            else:
+                tasks.append(asyncio.create_task(self.transferTo(addr, "TransferModelUpdate", message,
+                    payload_size)))
+        await asyncio.wait(tasks, return_when=asyncio.ALL_COMPLETED)
+
+    # transfer the model update message to the neighbor via gRPC and record the elapsed time of the
+    #   transfer for the adaptive compression
+    # NOTE: the processing time reported by the neighbor (decoding, market, and aggregation) is not
+    #   part of the transfer time of the link
+    async def transferTo(self, address, method_name, request, payload_size, timeout=None):
+        if(self.adaptive_compression.needsProbe(address)):
+            await self.probeRoundTripTime(address)
+        start_time = time.perf_counter()
+        response = await self.channel_pool.call(address, method_name, request, timeout)
+        elapsed = time.perf_counter() - start_time - response.processing_time
+        self.adaptive_compression.recordTransfer(address, payload_size, max(elapsed, 0))
+        return response
+
+    # measure the round-trip time of the link to the neighbor with a payload-free call
+    # NOTE: the wire codec negotiation without offered codecs has no side effects on the neighbor
+    # NOTE: only the second call is measured, since the first call may establish the connection
+    async def probeRoundTripTime(self, address):
+        for _ in range(2):
+            start_time = time.perf_counter()
+            try:
+                await self.channel_pool.call(address, "NegotiateWireCodec", ModelUpdate_pb2.WireCodecOffer())
+            except grpc.aio.AioRpcError as err:
+                if(err.code() != grpc.StatusCode.UNIMPLEMENTED):
+                    self.logger.debug(f'Probing the round-trip time to {address} failed ({err.code().name}).')
+                    return
+        self.adaptive_compression.recordTransfer(address, 0, time.perf_counter() - start_time)
+
+    # select the compression level of the link to the neighbor for the specified parameters
+    #   (None for the configured compression)
+    def selectCompressionLevel(self, address, parameters_list):
+        if(not self.adaptive_compression.isEnabled()):
+            return None
+        dense_size = sum([layer.nbytes for parameters in parameters_list if parameters
+            for layer in parameters.get()])
+        return self.adaptive_compression.selectLevel(address, dense_size)
+
+    # compress the parameters of the specified kind with the specified compression method
+    #   (and with error feedback if enabled)
+    # NOTE: the compression level selects the compression options of the adaptive compression
+    # NOTE: error feedback is only applied to model deltas and gradients, since the residual of full
+    #   model weights would add the weights again in every round
+    def compressParameters(self, parameters, kind, address=None, level=None, full_weights_flag=False):
+        config = self.adaptive_compression.getConfig(level)
+        if(self.error_feedback.isEnabled() and not full_weights_flag):
+            compressed_parameters = self.error_feedback.compress(parameters, kind, address, config)
+        else:
+            compressed_parameters = Compression.compress(parameters, config)
+        if(compressed_parameters and level is not None):
+            self.adaptive_compression.recordCompression(level,
+                sum([layer.nbytes for layer in parameters.get()]), compressed_parameters.getSize())
+        return compressed_parameters
 
     # broadcast the model update to the neighboring actors
-    async def broadcastParametersToNeighbors(self, weights=None, gradient=None, aggregation_weight=0):
+    # NOTE: the full weights flag marks weights which are no model deltas (excluded from error feedback)
+    async def broadcastParametersToNeighbors(self, weights=None, gradient=None, aggregation_weight=0,
+        full_weights_flag=False):
         # neighbors are selected by partial device participation strategy
         selected_neighbors = PartialDeviceParticipation.getNeighbors(self.config)
 
-        weights_serialized = None
-        weights_sparse = None
-        gradient_serialized = None
-        gradient_sparse = None
+        if(self.error_feedback.isPerNeighbor() or self.adaptive_compression.isEnabled()):
+            await self.broadcastParametersPerNeighbor(selected_neighbors, weights, gradient,
+                aggregation_weight, full_weights_flag)
+            return
+
+        weights_fields = None
+        gradient_fields = None
         if(weights):
             # apply compression by the specified compression method
-            weights = Compression.compress(weights, self.config)
-            weights_serialized = weights.serialize()
-            weights_sparse = weights.is_sparse
+            weights = self.compressParameters(weights, "weights", full_weights_flag=full_weights_flag)
+            weights_fields = self.toParametersFields(weights)
             if(self.config["log_communication_flag"]):
                 CommunicationLogger.logMultiple(self.config["address"], selected_neighbors,
                     {"size": weights.getSize(), "dtype": weights.getDTypeName()})
         if(gradient):
             # apply compression by the specified compression method
-            gradient = Compression.compress(gradient, self.config)
-            gradient_serialized = gradient.serialize()
-            gradient_sparse = gradient.is_sparse
+            gradient = self.compressParameters(gradient, "gradient")
+            gradient_fields = self.toParametersFields(gradient)
             if(self.config["log_communication_flag"]):
                 CommunicationLogger.logMultiple(self.config["address"], selected_neighbors,
                     {"size": gradient.getSize(), "dtype": gradient.getDTypeName()})
 
-        tasks = []
         self.logger.debug(f'Broadcasting updates to {len(selected_neighbors)} neighboring actors.')
+        # the same model update message is constructed once for all selected neighbors
+        tasks = [asyncio.create_task(self.broadcastParametersTo(
+            [addr for addr in self.config["neighbors"] if addr in selected_neighbors],
+            weights_fields=weights_fields, gradient_fields=gradient_fields,
+            aggregation_weight=aggregation_weight))]
+        # send an empty model update message to excluded neighbors
+        tasks.append(asyncio.create_task(self.broadcastParametersTo(
+            [addr for addr in self.config["neighbors"] if addr not in selected_neighbors])))
+        await asyncio.wait(tasks, return_when=asyncio.ALL_COMPLETED)
+
+    # compress the model update once per group of selected neighbors and transfer it to the group
+    # NOTE: with per-neighbor residuals (error feedback), each neighbor forms its own group, and
+    #   otherwise all neighbors with the same compression level (adaptive compression) form a group
+    # NOTE: the per-actor residuals are kept per compression level, since the neighbors of different
+    #   levels receive different model updates
+    async def broadcastParametersPerNeighbor(self, selected_neighbors, weights=None, gradient=None,
+        aggregation_weight=0, full_weights_flag=False):
+        per_neighbor_flag = self.error_feedback.isPerNeighbor()
+        groups = dict()
         for addr in self.config["neighbors"]:
             if addr in selected_neighbors:
-                tasks.append(asyncio.create_task(self.broadcastParametersTo(addr,
-                    weights_serialized=weights_serialized, weights_sparse=weights_sparse,
-                    gradient_serialized=gradient_serialized, gradient_sparse=gradient_sparse,
-                    aggregation_weight=aggregation_weight)))
-            else: # send an empty model update message to excluded neighbors
-                tasks.append(asyncio.create_task(self.broadcastParametersTo(addr)))
+                level = self.selectCompressionLevel(addr, [weights, gradient])
+                groups.setdefault(addr if per_neighbor_flag else level, (level, list()))[1].append(addr)
+        if(not per_neighbor_flag):
+            self.mergeStaleResiduals({addr: level for level, addresses in groups.values()
+                for addr in addresses})
+
+        tasks = list()
+        for key, (level, addresses) in groups.items():
+            address = key if per_neighbor_flag else None
+            kind_suffix = "" if per_neighbor_flag else self.getLevelKindSuffix(level)
+            group_weights = self.compressParameters(weights, f'weights{kind_suffix}', address, level,
+                full_weights_flag)
+            group_gradient = self.compressParameters(gradient, f'gradient{kind_suffix}', address, level)
+            if(self.config["log_communication_flag"]):
+                for parameters in [group_weights, group_gradient]:
+                    if(parameters):
+                        CommunicationLogger.logMultiple(self.config["address"], addresses,
+                            {"size": parameters.getSize(), "dtype": parameters.getDTypeName()})
+            tasks.append(asyncio.create_task(self.broadcastParametersTo(addresses,
+                weights_fields=self.toParametersFields(group_weights) if group_weights else None,
+                gradient_fields=self.toParametersFields(group_gradient) if group_gradient else None,
+                aggregation_weight=aggregation_weight)))
+        # send an empty model update message to excluded neighbors
+        tasks.append(asyncio.create_task(self.broadcastParametersTo(
+            [addr for addr in self.config["neighbors"] if addr not in selected_neighbors])))
         await asyncio.wait(tasks, return_when=asyncio.ALL_COMPLETED)
 
+    # obtain the suffix of the residual kinds of the compression level (per-actor error feedback)
+    def getLevelKindSuffix(self, level):
+        return "" if level is None else f'/level{level}'
+
+    # merge the per-actor residuals of the compression levels which no selected neighbor uses anymore
+    #   into the residuals of the level most of their neighbors changed to
+    # NOTE: otherwise, the residual of a level would remain stale after its neighbors changed the level
+    def mergeStaleResiduals(self, levels):
+        changed_levels = dict()
+        for addr, level in levels.items():
+            previous_level = self.neighbor_levels.get(addr, level)
+            if(previous_level not in levels.values()):
+                changed_levels.setdefault(previous_level, list()).append(level)
+        for previous_level, new_levels in changed_levels.items():
+            new_level = max(set(new_levels), key=new_levels.count)
+            for kind in ["weights", "gradient"]:
+                self.error_feedback.mergeResidual(f'{kind}{self.getLevelKindSuffix(previous_level)}',
+                    f'{kind}{self.getLevelKindSuffix(new_level)}')
+        self.neighbor_levels.update(levels)
+
     # broadcast the partitions of a partitioned model to the respective actors
     async def broadcastWeightPartitions(self, weights_partitioned,
         aggregation_weight=0):
         # apply compression by the specified compression method
-        weights_partitioned = {addr: Compression.compress(weights, self.config)
+        # NOTE: the partition of each neighbor has its own residual in both error feedback modes
+        weights_partitioned = {addr: self.compressParameters(weights, f'weights/{addr}',
+                level=self.selectCompressionLevel(addr, [weights]))
             for addr, weights in weights_partitioned.items()}
 
-        weights_partitioned_serialized = {addr: weights.serialize()
-            for addr, weights in weights_partitioned.items()}
-        weights_partitioned_sparse = {addr: weights.is_sparse
+        weights_partitioned_fields = {addr: self.toParametersFields(weights)
             for addr, weights in weights_partitioned.items()}
 
         selected_neighbors = PartialDeviceParticipation.getNeighbors(self.config)
@@ -105,53 +383,59 @@ class IDFLStrategy(ABC):
                         {"size": weights.getSize(), "dtype": weights.getDTypeName()})
 
         tasks = list()
-        for addr, weights_serialized in weights_partitioned_serialized.items():
+        for addr, weights_fields in weights_partitioned_fields.items():
             if addr in selected_neighbors:
-                tasks.append(asyncio.create_task(self.broadcastParametersTo(addr,
-                    weights_serialized=weights_serialized,
-                    weights_sparse=weights_partitioned_sparse[addr],
+                tasks.append(asyncio.create_task(self.broadcastParametersTo([addr],
+                    weights_fields=weights_fields,
                     aggregation_weight=aggregation_weight)))
             else: # send an empty model update message to excluded neighbors
-                tasks.append(asyncio.create_task(self.broadcastParametersTo(addr)))
+                tasks.append(asyncio.create_task(self.broadcastParametersTo([addr])))
         await asyncio.wait(tasks, return_when=asyncio.ALL_COMPLETED)
 
     # broadcast weights and individual gradients to the neighboring actors
     async def broadcastWeightsAndGradientsToNeighbors(self, weights,
         gradient_dict, aggregation_weight=0):
+        selected_neighbors = PartialDeviceParticipation.getNeighbors(self.config)
+
         # apply compression by the specified compression method
-        weights = Compression.compress(weights, self.config)
-        gradient_dict = {addr: Compression.compress(grad, self.config)
+        # NOTE: the weights are shared by all neighbors with the same compression level and the
+        #   gradient of each neighbor has its own residual in both error feedback modes
+        # NOTE: the weights are full model weights, hence, they are compressed without error feedback
+        levels = {addr: self.selectCompressionLevel(addr, [weights, gradient_dict.get(addr)])
+            for addr in self.config["neighbors"]}
+        compressed_weights = {level: self.compressParameters(weights, "weights", level=level,
+                full_weights_flag=True)
+            for level in set([levels[addr] for addr in selected_neighbors])}
+        gradient_dict = {addr: self.compressParameters(grad, f'gradient/{addr}', level=levels[addr])
             for addr, grad in gradient_dict.items()}
 
-        weights_serialized = weights.serialize()
-        weights_sparse = weights.is_sparse
-        gradient_serialized_dict = dict(
-            [(addr, SerializationUtils.serializeParameters(grad)) for addr, grad in gradient_dict.items()])
-        gradient_sparse_dict = dict(
-            [(addr, grad.is_sparse) for addr, grad in gradient_dict.items()])
-
-        selected_neighbors = PartialDeviceParticipation.getNeighbors(self.config)
+        weights_fields_dict = {level: self.toParametersFields(level_weights)
+            for level, level_weights in compressed_weights.items()}
+        gradient_fields_dict = dict(
+            [(addr, self.toParametersFields(grad)) for addr, grad in gradient_dict.items()])
 
         if(self.config["log_communication_flag"]):
-            CommunicationLogger.logMultiple(self.config["address"], selected_neighbors,
-                {"size": weights.getSize(), "dtype": weights.getDTypeName()})
+            for addr in selected_neighbors:
+                CommunicationLogger.log(self.config["address"], addr,
+                    {"size": compressed_weights[levels[addr]].getSize(),
+                        "dtype": compressed_weights[levels[addr]].getDTypeName()})
             for addr, grad in gradient_dict.items():
                 if addr in selected_neighbors:
                     CommunicationLogger.log(self.config["address"], addr,
                         {"size": grad.getSize(), "dtype": grad.getDTypeName()})
 
         tasks = []
+        encoding_cache = dict() # encode the shared weights only once per wire codec
         self.logger.debug(f'Broadcasting updates to {len(selected_neighbors)} neighboring actors.')
         for addr in self.config["neighbors"]:
             if addr in selected_neighbors:
-                tasks.append(asyncio.create_task(self.broadcastParametersTo(addr,
-                    weights_serialized=weights_serialized,
-                    weights_sparse=weights_sparse,
-                    gradient_serialized=gradient_serialized_dict[addr],
-                    gradient_sparse=gradient_sparse_dict[addr],
-                    aggregation_weight=aggregation_weight)))
+                tasks.append(asyncio.create_task(self.broadcastParametersTo([addr],
+                    weights_fields=weights_fields_dict[levels[addr]],
+                    gradient_fields=gradient_fields_dict[addr],
+                    aggregation_weight=aggregation_weight,
+                    encoding_cache=encoding_cache)))
             else: # send an empty model update message to excluded neighbors
-                tasks.append(asyncio.create_task(self.broadcastParametersTo(addr)))
+                tasks.append(asyncio.create_task(self.broadcastParametersTo([addr])))
         await asyncio.wait(tasks, return_when=asyncio.ALL_COMPLETED)
 
     # model update exchange step of the actor
@@ -165,47 +449,176 @@ class IDFLStrategy(ABC):
         pass
 
     # obtain evaluation metrics from our own model evaluated on the neighbors' evaluation data
-    async def evaluateWeightsNeighbor(self, weights_serialized, weights_sparse, address):
-        async with grpc.aio.insecure_channel(address) as channel:
-            stub = ModelUpdate_pb2_grpc.ModelUpdateStub(channel)
-            eval_metrics = await stub.EvaluateModel(
-                ModelUpdate_pb2.ModelParameters(sparse=weights_sparse, parameters=weights_serialized))
+    # NOTE: the model is referenced by its version first and the weights are only sent if the
+    #   neighbor neither holds nor can derive this version
+    async def evaluateWeightsNeighbor(self, request, address, version=None):
+        if(version is not None):
+            try:
+                eval_metrics = await self.channel_pool.call(address, "EvaluateModelVersion", version)
+                if(not eval_metrics.miss):
+                    return eval_metrics.metrics
+            except grpc.aio.AioRpcError as err:
+                if(err.code() != grpc.StatusCode.UNIMPLEMENTED):
+                    raise # otherwise, the neighbor does not support model versions
+        eval_metrics = await self.callNeighbor(address, "EvaluateModel", request())
         return eval_metrics.metrics
 
-    async def evaluateWeightsAllNeighbors(self, weights):
-        weights_serialized = weights.serialize()
-        weights_sparse = weights.is_sparse
+    async def evaluateWeightsAllNeighbors(self, weights, version=None):
+        # NOTE: in-process neighbors evaluate the weights by reference
+        if(self.model_update_service.passesReferences()):
+            request = lambda: weights
+            version = None
+        else: # serialize the weights once on the first miss
+            serialized_request = list()
+            def request():
+                if(not serialized_request):
+                    serialized_request.append(ModelUpdate_pb2.ModelParameters(
+                        **SerializationUtils.serializeParametersFields(weights)))
+                return serialized_request[0]
         tasks = []
         for addr in self.config["neighbors"]:
             tasks.append(asyncio.create_task(self.evaluateWeightsNeighbor(
-                weights_serialized, weights_sparse, addr)))
+                request, addr, version)))
         eval_metrics = []
-        for t in tasks:
-            response = await t
+        for addr, t in zip(self.config["neighbors"], tasks):
+            try:
+                response = await t
+            except grpc.aio.AioRpcError as err:
+                if(err.code() != grpc.StatusCode.DEADLINE_EXCEEDED):
+                    raise
+                # NOTE: neighbors which do not respond in time are excluded from the average
+                self.logger.warning(f'Skipping the evaluation on {addr}.')
+                continue
             eval_metrics.append(dict([(elem.key, elem.value) for elem in response]))
         return eval_metrics
 
-    def evaluateNeighbors(self):
-        weights = self.keras_model.getWeights()
-
-        eval_metrics = asyncio.run(self.evaluateWeightsAllNeighbors(weights))
-        eval_metrics.append(self.evaluate())
+    # NOTE: the model version is specified for the evaluation of a snapshot, where the own model is
+    #   evaluated with the weights of the snapshot instead of the current weights
+    def evaluateNeighbors(self, model_version=None):
+        snapshot_flag = model_version is not None
+        if(not snapshot_flag):
+            if(self.model_version is None):
+                self.registerModelVersion()
+            model_version = self.model_version
+        weights = model_version[1]
+        version = self.getModelVersion(model_version) if self.config["eval_version_flag"] else None
+
+        eval_metrics = self.channel_pool.run(self.evaluateWeightsAllNeighbors(weights, version))
+        eval_metrics.append(self.evaluateWeights(weights) if snapshot_flag else self.evaluate())
         eval_avg = dict([(key, np.mean([em[key] for em in eval_metrics]))
             for key in eval_metrics[0].keys()])
         return eval_avg
 
     def evaluateWeights(self, weights):
-        eval_model = self.keras_model.clone()
-        eval_model.setWeights(weights)
-        eval_metrics = KerasModel.evaluateKerasModel(
-            eval_model.getModel(), self.dataset.val)
+        eval_metrics = self.eval_model_pool.evaluate(weights, self.eval_data)
         return eval_metrics
 
     def evaluate(self):
         eval_metrics = KerasModel.evaluateKerasModel(
-            self.keras_model.getModel(), self.dataset.val)
+            self.keras_model.getModel(), self.eval_data)
         return eval_metrics
 
+    # obtain the validation data of all evaluations, i.e., the full validation set or a fixed random
+    #   subset of eval_num_batches batches (selected once with the seed of the actor)
+    # NOTE: the subset is cached in memory, such that only the first evaluation reads all batches
+    def getEvaluationData(self):
+        eval_data = self.dataset.val
+        num_batches = int(eval_data.cardinality().numpy())
+        if(0 < self.config["eval_num_batches"] < num_batches):
+            rng = np.random.default_rng(self.config["seed"])
+            batch_indices = tf.constant(np.sort(rng.choice(num_batches, self.config["eval_num_batches"],
+                replace=False)), dtype=tf.int64)
+            eval_data = eval_data.enumerate().filter(
+                lambda idx, _: tf.reduce_any(tf.equal(idx, batch_indices))).map(lambda _, batch: batch).cache()
+        return eval_data
+
+    # whether the models are evaluated in the specified round (i.e., every eval_interval rounds)
+    def isEvaluationRound(self, epoch):
+        return (epoch + 1) % self.config["eval_interval"] == 0
+
+    # evaluate the local model (or the specified weights) and log the metrics tagged with the round
+    def evaluateLocalRound(self, epoch, weights=None):
+        eval_metrics = self.evaluate() if weights is None else self.evaluateWeights(weights)
+        if(self.config['log_performance_flag']):
+            PerformanceLogger.log(f'{self.config["log_dir"]}/local/eval', {"round": epoch, **eval_metrics})
+        return eval_metrics
+
+    # evaluate the local model (or the specified model version) on the neighboring actors and log
+    #   the average metrics tagged with the round
+    def evaluateNeighborsRound(self, epoch, model_version=None):
+        eval_avg = self.evaluateNeighbors(model_version)
+        if(self.config['log_performance_flag']):
+            PerformanceLogger.log(f'{self.config["log_dir"]}/neighbors/eval', {"round": epoch, **eval_avg})
+        return eval_avg
+
+    # run the evaluation directly or in the background on the specified snapshot
+    def scheduleEvaluation(self, evaluation, epoch, snapshot):
+        if(self.eval_executor is None):
+            evaluation(epoch)
+            return
+        for future in [future for future in self.eval_futures if future.done()]:
+            future.result() # raise the errors of finished evaluations
+        self.eval_futures = [future for future in self.eval_futures if not future.done()]
+        self.eval_futures.append(self.eval_executor.submit(evaluation, epoch, snapshot()))
+
+    # wait until all background evaluations have finished
+    def waitForEvaluations(self):
+        for future in self.eval_futures:
+            future.result()
+        self.eval_futures = list()
+
+    # register the weights broadcast in this round per actor (including our own weights), such that
+    #   the models of the neighbors can be derived from them
+    def registerRoundModels(self, round_models):
+        self.round_models = (self.round, round_models)
+
+    # record the version of the own model after the aggregation
+    # NOTE: the content hash is computed on demand (see getModelVersion), since the version is only
+    #   requested in evaluation rounds or by neighbors evaluating model versions
+    def registerModelVersion(self):
+        weights = self.keras_model.getWeights()
+        contributors, coefficients = self.model_recipe if self.model_recipe else ([], [])
+        version = ModelUpdate_pb2.ModelVersion(round=self.round,
+            contributors=contributors, coefficients=coefficients)
+        self.model_version = (version, weights)
+
+    # obtain the version of the recorded model with its content hash (computed once)
+    def getModelVersion(self, model_version):
+        version, weights = model_version
+        with self.model_version_lock:
+            if(not version.hash):
+                version.hash = SerializationUtils.hashParameters(weights)
+        return version
+
+    # obtain the weights of the specified model version of a neighbor, i.e., our own model (e.g., the
+    #   common model of DFLv1) or the combination of the weights broadcast in the same round
+    # NOTE: the weights are verified with the content hash (None if the version is unknown)
+    def resolveModelVersion(self, version):
+        model_version = self.model_version
+        if(model_version is not None and model_version[0].round == version.round
+            and self.getModelVersion(model_version).hash == version.hash):
+            return model_version[1]
+        round_idx, round_models = self.round_models
+        if(round_idx != version.round or not version.contributors
+            or not all([addr in round_models for addr in version.contributors])):
+            return None
+        parameters_list = [round_models[addr] for addr in version.contributors]
+        if(not AggregationUtils.isDense(parameters_list)):
+            return None
+        weights = AggregationUtils.linearCombinationInPlace(parameters_list, list(version.coefficients),
+            FlatParameterArray.emptyLike(parameters_list[0]), FlatParameterArray.emptyLike(parameters_list[0]))
+        if(SerializationUtils.hashParameters(weights) != version.hash):
+            return None
+        return weights.toHeterogeneous()
+
+    # evaluate the model version of a neighbor (None if this actor can not obtain the weights)
+    def evaluateModelVersion(self, version):
+        weights = self.resolveModelVersion(version)
+        if(weights is None):
+            self.logger.debug(f'Unknown model version of round {version.round} requested.')
+            return None
+        return self.evaluateWeights(weights)
+
     # register the termination permission of a neighboring actor
     def registerTerminationPermission(self, address):
         self.termination_permission[address] = True
@@ -214,10 +627,8 @@ class IDFLStrategy(ABC):
 
     # notify the specified neighboring actor that we are ready to terminate
     async def signalTerminationPermissionTo(self, address):
-        async with grpc.aio.insecure_channel(address) as channel:
-            stub = ModelUpdate_pb2_grpc.ModelUpdateStub(channel)
-            await stub.AllowTermination(ModelUpdate_pb2.NetworkIdentity(
-                ip_and_port=self.config["address"]))
+        await self.callNeighbor(address, "AllowTermination",
+            ModelUpdate_pb2.NetworkIdentity(ip_and_port=self.config["address"]))
 
     # notify all neighboring actors that we are ready to terminate
     async def signalTerminationPermission(self):
@@ -230,6 +641,15 @@ class IDFLStrategy(ABC):
     def stop(self):
         pass
 
+    def logTrainMetrics(self, train_metrics):
+        metric_keys = list(train_metrics.keys())
+        if(isinstance(list(train_metrics.values())[0], list)):
+            # log the result of multiple local epochs in different rows
+            for metric_values in zip(*train_metrics.values()):
+                PerformanceLogger.log(f'{self.config["log_dir"]}/local/train', dict(zip(metric_keys, metric_values)))
+        else:
+            PerformanceLogger.log(f'{self.config["log_dir"]}/local/train', dict(zip(metric_keys, list(train_metrics.values()))))
+
     # general training loop
     def performTraining(self):
         self.startServer()
@@ -237,39 +657,53 @@ class IDFLStrategy(ABC):
         # TODO: think about the number of epochs for learning (perhaps termination based on local training loss?)
         for epoch in range(int(self.config["num_fed_epochs"])):
             self.logger.debug(f'Federated epoch #{epoch}')
-
-            # train the local model
-            train_metrics = self.fitLocal()
+            self.round = epoch
+            self.model_recipe = None
+
+            # train the local model (with limited admission of neighbor evaluations)
+            self.eval_model_pool.setTraining(True)
+            try:
+                train_metrics = self.fitLocal()
+            finally:
+                self.eval_model_pool.setTraining(False)
             if(self.config['log_performance_flag'] and train_metrics):
-                metric_keys = list(train_metrics.keys())
-                if(isinstance(list(train_metrics.values())[0], list)):
-                    # log the result of multiple local epochs in different rows
-                    for metric_values in zip(*train_metrics.values()):
-                        PerformanceLogger.log(f'{self.config["log_dir"]}/local/train', dict(zip(metric_keys, metric_values)))
-                else:
-                    PerformanceLogger.log(f'{self.config["log_dir"]}/local/train', dict(zip(metric_keys, list(train_metrics.values()))))
-
-            # evaluate the local model
-            eval_metrics = self.evaluate()
-            if(self.config['log_performance_flag']):
-                PerformanceLogger.log(f'{self.config["log_dir"]}/local/eval', eval_metrics)
+                self.logTrainMetrics(train_metrics)
+
+            # evaluate the local model (in the background on a snapshot of the weights)
+            if(self.isEvaluationRound(epoch)):
+                self.scheduleEvaluation(self.evaluateLocalRound, epoch, self.keras_model.getWeights)
 
             # send model update to neighboring actors
             self.broadcast()
 
             # aggregate model updates received from neighboring actors and update local model
             self.aggregate()
+            if(self.config["eval_version_flag"] or self.isEvaluationRound(epoch)):
+                self.registerModelVersion()
+            else:
+                self.model_version = None # the own model is neither evaluated nor requested as version
+            if(self.config['log_performance_flag']):
+                for market_statistics in self.model_update_market.getStatistics():
+                    PerformanceLogger.log(f'{self.config["log_dir"]}/network/market', market_statistics)
 
             # evaluate the local model on the neighboring actors
-            eval_avg = self.evaluateNeighbors()
-            if(self.config['log_performance_flag']):
-                PerformanceLogger.log(f'{self.config["log_dir"]}/neighbors/eval', eval_avg)
+            if(self.isEvaluationRound(epoch)):
+                self.scheduleEvaluation(self.evaluateNeighborsRound, epoch, lambda: self.model_version)
 
+        self.waitForEvaluations()
+        if(self.eval_executor is not None):
+            self.eval_executor.shutdown()
         eval_avg = self.evaluateNeighbors()
         self.logger.info(f'Evaluation with neighbors resulted in an average of {eval_avg}')
 
         self.stop()
+        self.channel_pool.close()
+        self.model_update_market.close()
         if(self.config['log_performance_flag']):
-            PerformanceLogger.write()
+            PerformanceLogger.write(self.config["log_dir"])
         if(self.config['log_communication_flag']):
-            CommunicationLogger.write(f'{self.config["log_dir"]}/network/communication')
+            CommunicationLogger.write(f'{self.config["log_dir"]}/network/communication',
+                self.config["address"])
+            if(self.config["wire_codec"] != WireCodecType.NoneType):
+                CommunicationLogger.write(f'{self.config["log_dir"]}/network/wire_codec',
+                    self.config["address"], category="wire_codec")
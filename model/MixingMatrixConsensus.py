@@ -0,0 +1,64 @@
+from tffmodel.types.HeterogeneousDenseArray import HeterogeneousDenseArray
+
+import numpy as np
+import sparse
+
+# aggregation step of all actors of a simulation at once, i.e., the flattened parameters of the
+#   actors are stacked into one (N x P) matrix which is multiplied by a sparse (N x N) mixing matrix
+#   derived from the adjacency matrix of the actor network
+class MixingMatrixConsensus:
+    # obtain the adjacency matrix as boolean matrix without self-loops
+    @classmethod
+    def getNeighborhood(self_class, adj_mat):
+        neighborhood = np.asarray(adj_mat) != 0
+        np.fill_diagonal(neighborhood, False)
+        return neighborhood
+
+    # mixing matrix of the consensus step of DFLv2 (i.e., consensusbasedFedAvg), where row i holds
+    #   1 - eps_i * alpha * |N(i)| for the actor itself and eps_i * alpha for each neighbor j
+    # NOTE: the consensus step-size defaults to the inverse number of neighbors as in DFLv2
+    @classmethod
+    def getConsensusMatrix(self_class, adj_mat, eps=None, alpha=1, dtype=np.float32):
+        neighborhood = self_class.getNeighborhood(adj_mat)
+        num_actors = neighborhood.shape[0]
+        num_neighbors = neighborhood.sum(axis=1)
+        if(eps is None):
+            eps = 1 / np.maximum(num_neighbors, 1)
+        eps = np.broadcast_to(eps, (num_actors,))
+        rows, cols = np.nonzero(neighborhood)
+        actor_idx = np.arange(num_actors)
+        coords = np.stack([np.concatenate([rows, actor_idx]), np.concatenate([cols, actor_idx])])
+        data = np.concatenate([eps[rows] * alpha, 1 - eps * alpha * num_neighbors]).astype(dtype)
+        return sparse.COO(coords, data, shape=(num_actors, num_actors))
+
+    # mixing matrix of the weighted averaging of DFLv1 and DFLv8 (i.e., averageModelParameters),
+    #   where row i holds the normalized aggregation weights of the actor itself and its neighbors
+    # NOTE: equivalent to DFLv8 on fully connected topologies only
+    @classmethod
+    def getAveragingMatrix(self_class, adj_mat, aggregation_weights, dtype=np.float32):
+        neighborhood = self_class.getNeighborhood(adj_mat)
+        np.fill_diagonal(neighborhood, True)
+        num_actors = neighborhood.shape[0]
+        rows, cols = np.nonzero(neighborhood)
+        weights = np.asarray(aggregation_weights, dtype=np.float64)[cols]
+        weight_sums = np.bincount(rows, weights=weights, minlength=num_actors)
+        data = (weights / weight_sums[rows]).astype(dtype)
+        return sparse.COO(np.stack([rows, cols]), data, shape=(num_actors, num_actors))
+
+    # stack the flattened parameters of all actors into one (N x P) matrix
+    @classmethod
+    def stackParameters(self_class, parameters_list):
+        return np.stack([parameters.getFlattened() for parameters in parameters_list])
+
+    # split the (N x P) matrix into the parameters of each actor (shaped like the specified parameters)
+    @classmethod
+    def unstackParameters(self_class, stacked_parameters, shape_parameters):
+        return [HeterogeneousDenseArray.fromFlattened(row, shape_parameters) for row in stacked_parameters]
+
+    # apply the mixing matrix to the stacked parameters with a single sparse-dense product
+    @classmethod
+    def mix(self_class, mixing_matrix, stacked_parameters):
+        mixed_parameters = mixing_matrix @ stacked_parameters
+        if(isinstance(mixed_parameters, sparse.SparseArray)):
+            mixed_parameters = mixed_parameters.todense()
+        return mixed_parameters
@@ -1,9 +1,16 @@
-import asyncio
+from collections import deque
+from concurrent import futures
 from enum import Enum
+import logging
 import math
-from queue import SimpleQueue
+import numpy as np
+import threading
+import time
 
+from model.AggregationUtils import AggregationUtils
+from model.FlatParameterArray import FlatParameterArray
 from model.SerializationUtils import SerializationUtils
+from network.InMemoryModelUpdateService import ModelUpdateReference
 
 # determine the strategy for obtaining the model updates from the market
 class SynchronizationStrategy(Enum):
@@ -14,16 +21,271 @@ class SynchronizationStrategy(Enum):
     MIN_K = 5
     ONE_FROM_EACH_T = 6
 
+# determine how a full queue of the market handles an incoming model update
+class MarketOverflowPolicy(Enum):
+    BLOCK = 1 # block the sender until there is space (up to the block timeout), then drop the oldest
+    DROP_OLDEST = 2 # drop the oldest queued model update
+    KEEP_LATEST = 3 # drop all queued model updates and keep only the incoming one
+    MERGE = 4 # merge the incoming model update into the newest queued one with a weighted sum
+
+# determine whether the market element can be merged, i.e., it is decoded and carries model deltas or
+#   gradients with a positive aggregation weight
+# NOTE: full model weights (aggregation weight 0, e.g., DFLv2 and DFLv3) and flagged model updates
+#   (negative aggregation weight, e.g., the global partitions of DFLv8) are never merged
+def isMergeable(elem):
+    return isinstance(elem, dict) and elem["aggregation_weight"] > 0
+
+# merge two market elements into one by averaging weighted by their aggregation weights
+def mergeMarketElements(queued, incoming):
+    total_weight = queued["aggregation_weight"] + incoming["aggregation_weight"]
+    queued_factor, incoming_factor = (queued["aggregation_weight"] / total_weight,
+        incoming["aggregation_weight"] / total_weight) if total_weight else (0.5, 0.5)
+    def mergeParameters(queued_params, incoming_params):
+        if(queued_params is None or incoming_params is None):
+            return incoming_params if queued_params is None else queued_params
+        return queued_params * queued_factor + incoming_params * incoming_factor
+    return {"weights": mergeParameters(queued["weights"], incoming["weights"]),
+        "gradient": mergeParameters(queued["gradient"], incoming["gradient"]),
+        "aggregation_weight": total_weight}
+
+# running sum of the accumulated model updates at one position of the queues
+# NOTE: the model updates are folded into the sum with the lock of the slot (i.e., outside the lock
+#   of the market), and the pending folds are counted with the lock of the market held
+class AccumulationSlot:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.weighted_sum = None
+        self.aggregation_weight = 0
+        self.count = 0
+        self.num_pending = 0
+
+# model update that is queued in its serialized form and decoded only when it is retrieved
+class EncodedMarketElement:
+    def __init__(self, update, address):
+        self.update = update
+        # cheap header of the model update
+        self.sender = address
+        self.aggregation_weight = update.aggregation_weight
+        self.sparse = update.weights.sparse or update.gradient.sparse
+        self.size = sum([len(elem) for elem in update.weights.parameters]) \
+            + sum([len(elem) for elem in update.gradient.parameters])
+
+    # deserialize and decompress the model update into a market element
+    def decode(self):
+        return {"weights": SerializationUtils.deserializeParametersMessage(self.update.weights),
+            "gradient": SerializationUtils.deserializeParametersMessage(self.update.gradient),
+            "aggregation_weight": self.aggregation_weight}
+
+# queue of model updates of a single neighbor with an optional capacity
+# NOTE: all queues of a market share the condition of the market, such that waiting for model
+#   updates of any neighbor does not require polling
+class UpdateQueue:
+    def __init__(self, condition, capacity=0, overflow_policy=MarketOverflowPolicy.DROP_OLDEST,
+        block_timeout=None):
+        self.condition = condition
+        self.capacity = capacity # 0 for an unbounded queue
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout
+        self.elements = deque()
+        self.peak_depth = 0
+        self.num_dropped = 0
+        self.num_merged = 0
+
+    def isFull(self):
+        return self.capacity > 0 and len(self.elements) >= self.capacity
+
+    def put(self, elem):
+        with self.condition:
+            if(self.isFull()):
+                self.handleOverflow(elem)
+            else:
+                self.elements.append(elem)
+            self.peak_depth = max(self.peak_depth, len(self.elements))
+            self.condition.notify_all()
+
+    # NOTE: must be called with the lock of the condition held
+    def handleOverflow(self, elem):
+        match self.overflow_policy:
+            case MarketOverflowPolicy.BLOCK:
+                if(self.condition.wait_for(lambda: not self.isFull(), self.block_timeout)):
+                    self.elements.append(elem)
+                    return
+                self.elements.popleft()
+                self.num_dropped += 1
+                self.elements.append(elem)
+            case MarketOverflowPolicy.DROP_OLDEST:
+                self.elements.popleft()
+                self.num_dropped += 1
+                self.elements.append(elem)
+            case MarketOverflowPolicy.KEEP_LATEST:
+                self.num_dropped += len(self.elements)
+                self.elements.clear()
+                self.elements.append(elem)
+            case MarketOverflowPolicy.MERGE:
+                if(isMergeable(elem) and isMergeable(self.elements[-1])):
+                    self.elements[-1] = mergeMarketElements(self.elements[-1], elem)
+                    self.num_merged += 1
+                elif(elem and self.elements[-1]): # keep the latest model update if it cannot be merged
+                    self.num_dropped += len(self.elements)
+                    self.elements.clear()
+                    self.elements.append(elem)
+                elif(elem): # the newest queued model update is empty
+                    self.elements[-1] = elem
+                    self.num_dropped += 1
+                else: # empty model updates carry nothing to merge
+                    self.num_dropped += 1
+            case _:
+                raise NotImplementedError
+
+    # NOTE: must be called with the lock of the condition held
+    def pop(self):
+        elem = self.elements.popleft()
+        self.condition.notify_all() # wake up blocked senders
+        return elem
+
+    def qsize(self):
+        return len(self.elements)
+
+    # obtain the current depth, the peak depth since the last call, and the drop and merge counters
+    def getStatistics(self):
+        with self.condition:
+            statistics = {"depth": len(self.elements), "peak_depth": self.peak_depth,
+                "dropped": self.num_dropped, "merged": self.num_merged}
+            self.peak_depth = len(self.elements)
+        return statistics
+
 # market to store incoming model updates and retrieve them with a prespecified strategy when needed
+# NOTE: the retrieval waits on a condition that is notified by each incoming model update
 class ModelUpdateMarket:
     def __init__(self, config):
         self.config = config
         self.config.setdefault("sync_strategy", SynchronizationStrategy.ONE_FROM_EACH)
+        self.logger = logging.getLogger("model/ModelUpdateMarket")
+        self.logger.setLevel(config.get("log_level", logging.INFO))
+        self.condition = threading.Condition()
         # store a queue of model updates for each neighboring actor
         self.model_updates = dict(
-            [(addr, SimpleQueue()) for addr in config["neighbors"]])
+            [(addr, UpdateQueue(self.condition, config.get("market_capacity", 0),
+                config.get("market_overflow_policy", MarketOverflowPolicy.DROP_OLDEST),
+                config.get("market_block_timeout", None))) for addr in config["neighbors"]])
+        # running sums of the accumulated model updates, the i-th sum belongs to the i-th queued
+        #   model update of each neighbor (i.e., the first sum is completed by the next get)
+        self.accumulation_key = None
+        self.accumulation_sums = deque()
+        self.free_buffers = list() # preallocated buffers of the running sums
+        self.returned_buffers = list() # buffers of the running sums passed by the last getAccumulated
+        self.decode_executor = None # created on the first model updates to decode
+
+    # fold the specified parameters ("weights" or "gradient") of the incoming model updates into
+    #   weighted running sums on arrival and only queue tokens, such that the market holds O(1) models
+    # NOTE: only supported for synchronization strategies that take the oldest model update of each
+    #   neighbor, because the running sums cannot be split afterwards
+    def enableAccumulation(self, parameters_key):
+        if(self.config["sync_strategy"] not in (SynchronizationStrategy.ONE_FROM_EACH,
+            SynchronizationStrategy.ONE_FROM_EACH_T)):
+            self.logger.warning(f'Accumulation is not supported with {self.config["sync_strategy"].name}, '
+                + 'queueing the model updates instead.')
+            return False
+        self.accumulation_key = parameters_key
+        return True
+
+    def isAccumulating(self):
+        return self.accumulation_key is not None
+
+    # obtain the slot of the running sum of the specified position and register a pending fold
+    # NOTE: must be called with the lock of the condition held
+    def reserveSlot(self, position):
+        while(len(self.accumulation_sums) <= position):
+            self.accumulation_sums.append(AccumulationSlot())
+        slot = self.accumulation_sums[position]
+        slot.num_pending += 1
+        return slot
+
+    # take a preallocated buffer for a running sum (or allocate one like the parameters)
+    def takeBuffer(self, parameters):
+        with self.condition:
+            if(self.free_buffers):
+                return self.free_buffers.pop()
+        return FlatParameterArray.emptyLike(parameters)
+
+    # add the weighted parameters to the running sum of the slot
+    # NOTE: dense parameters are folded into a preallocated buffer
+    def accumulate(self, slot, parameters, aggregation_weight):
+        with slot.lock:
+            if(parameters.is_sparse):
+                weighted_parameters = parameters * aggregation_weight
+                slot.weighted_sum = weighted_parameters if slot.weighted_sum is None \
+                    else slot.weighted_sum + weighted_parameters
+            elif(slot.weighted_sum is None):
+                slot.weighted_sum = AggregationUtils.scaleInPlace(self.takeBuffer(parameters),
+                    parameters, aggregation_weight)
+            else:
+                for sum_layer, layer in zip(slot.weighted_sum.get(), parameters.get()):
+                    np.add(sum_layer, layer * sum_layer.dtype.type(aggregation_weight), out=sum_layer)
+            slot.aggregation_weight += aggregation_weight
+            slot.count += 1
+
+    # fold an incoming model update into the running sums and queue a token for it
+    # NOTE: the tokens are exempt from the capacity of the queues
+    # NOTE: the token is queued before the model update is folded, and the running sum is only
+    #   retrieved after all pending folds have completed
+    def putAccumulated(self, update, address):
+        parameters = SerializationUtils.deserializeParametersMessage(getattr(update, self.accumulation_key))
+        with self.condition:
+            update_queue = self.model_updates[address]
+            if(parameters):
+                slot = self.reserveSlot(update_queue.qsize())
+                update_queue.elements.append({"accumulated": True,
+                    "aggregation_weight": update.aggregation_weight})
+            elif(self.config["sync_strat_allowempty"]):
+                update_queue.elements.append(None) # the empty model update fills its position
+                slot = None
+            else:
+                return # empty model updates are discarded anyway
+            update_queue.peak_depth = max(update_queue.peak_depth, update_queue.qsize())
+            if(slot is None):
+                self.condition.notify_all()
+                return
+        try:
+            self.accumulate(slot, parameters, update.aggregation_weight)
+        finally:
+            with self.condition:
+                slot.num_pending -= 1
+                self.condition.notify_all()
+
+    # obtain the weighted sum and the sum of aggregation weights of the model updates selected by
+    #   the synchronization strategy (or None if there is no model update)
+    # NOTE: the weighted sum is valid until the next call, which recycles its buffer
+    def getAccumulated(self):
+        with self.condition:
+            self.free_buffers.extend(self.returned_buffers)
+            self.returned_buffers = list()
+            match self.config["sync_strategy"]:
+                case SynchronizationStrategy.ONE_FROM_EACH:
+                    self.collectOneFromEach(self.model_updates.keys(), self.getDeadline())
+                case SynchronizationStrategy.ONE_FROM_EACH_T:
+                    self.collectOneFromEach(self.model_updates.keys(),
+                        self.getDeadline(self.config.setdefault("sync_strat_timeout", 3)), allow_empty=True)
+                case _:
+                    raise NotImplementedError
+            # NOTE: the oldest tokens of all neighbors have been taken, hence, the first running sum is
+            #   complete once its pending folds have completed
+            if(not self.accumulation_sums):
+                return None
+            slot = self.accumulation_sums.popleft()
+            self.condition.wait_for(lambda: slot.num_pending == 0)
+            if(not slot.count):
+                return None
+            if(isinstance(slot.weighted_sum, FlatParameterArray)):
+                self.returned_buffers.append(slot.weighted_sum)
+                weighted_sum = slot.weighted_sum.toHeterogeneous()
+            else:
+                weighted_sum = slot.weighted_sum
+        return {"weighted_sum": weighted_sum, "aggregation_weight": slot.aggregation_weight,
+            "count": slot.count}
 
     # obtain the model updates using the prespecified synchronization strategy
+    # NOTE: the getters of the synchronization strategies return decoded model updates
     def get(self):
         model_updates_dict = None
         match self.config["sync_strategy"]:
@@ -42,108 +304,177 @@ class ModelUpdateMarket:
             case _:
                 raise NotImplementedError
 
-        model_updates_dict = {key: val for key, val in model_updates_dict.items() if val}
-        return model_updates_dict
+        return {key: val for key, val in model_updates_dict.items() if val}
 
     # put a model update into the market
     def putUpdate(self, update, address):
-        weights = SerializationUtils.deserializeParameters(
-            update.weights.parameters, sparse=update.weights.sparse)
-        gradient = SerializationUtils.deserializeParameters(
-            update.gradient.parameters, sparse=update.gradient.sparse)
-        market_element = None if (not weights and not gradient) else {
-            "weights": weights, "gradient": gradient,
-            "aggregation_weight": update.aggregation_weight
-        }
+        if(self.isAccumulating()):
+            self.putAccumulated(update, address)
+            return
+        if(isinstance(update, ModelUpdateReference)):
+            # model updates of in-process actors are not serialized
+            self.put(None if update.isEmpty() else update.decode(), address)
+            return
+        if(not update.weights.parameters and not update.gradient.parameters):
+            self.put(None, address)
+            return
+        market_element = EncodedMarketElement(update, address)
+        if(self.config.get("market_capacity", 0) > 0 and self.config.get("market_overflow_policy",
+            MarketOverflowPolicy.DROP_OLDEST) == MarketOverflowPolicy.MERGE
+            and update.aggregation_weight > 0):
+            market_element = market_element.decode() # merging requires the decoded parameters
         self.put(market_element, address)
 
+    # decode the selected model updates in parallel
+    # NOTE: deserialization and decompression release the GIL for large arrays
+    # NOTE: must be called without the lock of the condition held, such that incoming model updates
+    #   are not blocked by the decoding
+    def decodeSelected(self, model_updates_dict):
+        encoded_elements = [elem for val in model_updates_dict.values()
+            for elem in (val if isinstance(val, list) else [val])
+            if isinstance(elem, EncodedMarketElement)]
+        if(not encoded_elements):
+            return model_updates_dict
+        if(self.decode_executor is None):
+            self.decode_executor = futures.ThreadPoolExecutor(
+                max_workers=self.config.get("num_threads_decode", 4), thread_name_prefix="ModelUpdateMarket")
+        decoded = dict(zip([id(elem) for elem in encoded_elements],
+            self.decode_executor.map(lambda elem: elem.decode(), encoded_elements)))
+        def replaceDecoded(elem):
+            return decoded[id(elem)] if isinstance(elem, EncodedMarketElement) else elem
+        return {key: [replaceDecoded(elem) for elem in val] if isinstance(val, list) else replaceDecoded(val)
+            for key, val in model_updates_dict.items()}
+
     def put(self, elem, address):
         self.model_updates[address].put(elem)
 
-    # block until we get one model update from each neighbor
-    def getOneFromAll(self):
+    # release the workers for decoding
+    def close(self):
+        if(self.decode_executor is not None):
+            self.decode_executor.shutdown(wait=True)
+            self.decode_executor = None
+
+    # obtain the queue statistics (depth and overflow counters) for each neighbor
+    def getStatistics(self):
+        return [{"neighbor": addr, **update_queue.getStatistics()}
+            for addr, update_queue in self.model_updates.items()]
+
+    # obtain the deadline (monotonic time) for waiting or None if the timeout is not set
+    def getDeadline(self, timeout=None):
+        if(timeout is None):
+            timeout = self.config.get("sync_strat_deadline", 0)
+        return time.monotonic() + timeout if timeout else None
+
+    # wait until the market is notified, returns False if the deadline has already passed
+    # NOTE: must be called with the lock of the condition held
+    def waitForUpdate(self, deadline):
+        if(deadline is None):
+            self.condition.wait()
+            return True
+        remaining = deadline - time.monotonic()
+        if(remaining <= 0):
+            return False
+        self.condition.wait(remaining)
+        return True
+
+    # take the next model update of the neighbor, discarding empty model updates if not allowed
+    #   returns whether a model update was taken and the model update itself
+    # NOTE: must be called with the lock of the condition held
+    def popUpdate(self, addr, allow_empty=None):
+        if(allow_empty is None):
+            allow_empty = self.config["sync_strat_allowempty"]
+        update_queue = self.model_updates[addr]
+        while(update_queue.qsize() > 0):
+            update = update_queue.pop()
+            if(allow_empty or update):
+                return True, update
+        return False, None
+
+    # take one model update from each of the specified neighbors until the deadline passes
+    # NOTE: must be called with the lock of the condition held
+    def collectOneFromEach(self, addresses, deadline, allow_empty=None):
         result = dict()
-        for addr, queue in self.model_updates.items():
-            update = queue.get(block=True, timeout=None)
-            while(not self.config["sync_strat_allowempty"] and not update):
-                update = queue.get(block=True, timeout=None)
-            result[addr] = update
+        remaining_addresses = list(addresses)
+        while(True):
+            for addr in list(remaining_addresses):
+                taken_flag, update = self.popUpdate(addr, allow_empty)
+                if(taken_flag):
+                    result[addr] = update
+                    remaining_addresses.remove(addr)
+            if(not remaining_addresses or not self.waitForUpdate(deadline)):
+                return result
+
+    # take all model updates that are currently available
+    # NOTE: must be called with the lock of the condition held
+    def collectAvailable(self, result):
+        for addr, update_queue in self.model_updates.items():
+            while(update_queue.qsize() > 0):
+                result.setdefault(addr, list()).append(update_queue.pop())
         return result
 
+    # block until we get one model update from each neighbor
+    def getOneFromAll(self):
+        with self.condition:
+            result = self.collectOneFromEach(self.model_updates.keys(), self.getDeadline())
+        return self.decodeSelected(result)
+
     # do not block, get all model updates that are currently available
     def getAvailable(self):
-        result = dict()
-        for addr, queue in self.model_updates.items():
-            result[addr] = list()
-            try:
-                while True:
-                    result[addr].append(queue.get(block=False))
-            except queue.Empty:
-                pass # do nothing, queue is empty, continue with next queue
-        return result
+        with self.condition:
+            result = self.collectAvailable(dict())
+        return self.decodeSelected(result)
 
     # get all available models but at least one from each neighbor
     def getAtLeastOneFromAll(self):
-        result = dict()
-        for addr, queue in self.model_updates.items():
-            update = [queue.get(block=True, timeout=None)]
-            while(not self.config["sync_strat_allowempty"] and not update[0]):
-                update = [queue.get(block=True, timeout=None)]
-            result[addr] = update
-        for addr, queue in self.model_updates.items():
-            try:
-                while True:
-                    result[addr].append(queue.get(block=False))
-            except queue.Empty:
-                pass # do nothing, queue is empty, continue with next queue
-        return result
+        with self.condition:
+            result = self.collectOneFromEach(self.model_updates.keys(), self.getDeadline())
+            result = {addr: [update] for addr, update in result.items()}
+            result = self.collectAvailable(result)
+        return self.decodeSelected(result)
 
-    # poll until we got one model update from at least the specified proportion of neighbors
+    # block until we got one model update from at least the specified proportion of neighbors
     def getOneFromAtLeastPercentage(self):
         percentage = self.config.setdefault("sync_strat_percentage", 0.5)
         amount = math.ceil(len(self.model_updates) * percentage)
+        deadline = self.getDeadline()
         result = dict()
-        while(len(result) < amount):
-            remaining_addresses = set(self.model_updates.keys()).difference(set(result.keys()))
-            for addr in remaining_addresses:
-                queue = self.model_updates[addr]
-                try:
-                    update = queue.get(block=False)
-                    if(self.config["sync_strat_allowempty"] or update):
-                        result[addr] = update
-                except queue.Empty:
-                    pass # do nothing, queue is empty, continue with next queue
-        return result
+        with self.condition:
+            while(True):
+                for addr in self.model_updates.keys():
+                    if(addr not in result):
+                        taken_flag, update = self.popUpdate(addr)
+                        if(taken_flag):
+                            result[addr] = update
+                if(len(result) >= amount or not self.waitForUpdate(deadline)):
+                    break
+        return self.decodeSelected(result)
 
-    # poll until we got at least the specified amount of model updates
+    # block until we got at least the specified amount of model updates
+    # NOTE: the queues are drained round-robin (one model update per neighbor and pass), and the
+    #   market only waits for incoming model updates if all queues are empty
     def getAtLeastK(self):
         amount = self.config.setdefault("sync_strat_amount", len(self.model_updates) // 2)
+        deadline = self.getDeadline()
         result = dict()
-        while(amount > 0):
-            for addr, queue in self.model_updates.items():
-                try:
-                    update = queue.get(block=False)
-                    if(self.config["sync_strat_allowempty"] or update):
-                        result.setdefault(addr, list()).append(update)
-                        amount -= 1
-                except queue.Empty:
-                    pass # do nothing, queue is empty, continue with next queue
-        return result
+        with self.condition:
+            while(True):
+                taken_any_flag = True
+                while(amount > 0 and taken_any_flag):
+                    taken_any_flag = False
+                    for addr in self.model_updates.keys():
+                        taken_flag, update = self.popUpdate(addr)
+                        if(taken_flag):
+                            result.setdefault(addr, list()).append(update)
+                            amount -= 1
+                            taken_any_flag = True
+                if(amount <= 0 or not self.waitForUpdate(deadline)):
+                    break
+        return self.decodeSelected(result)
 
     # try to get one from each neighbor until we reach the specified timeout (seconds) (allow empty)
-    def getOneFromAllTimeout(self, timeout):
+    def getOneFromAllTimeout(self):
         timeout = self.config.setdefault("sync_strat_timeout", 3)
-        async def getOneTimeout(addr, queue, timeout):
-            try:
-                mod_update = (addr, queue.get(block=True, timeout=timeout))
-            except queue.Empty:
-                mod_update = None
-            return mod_update
-        async def spawnAndCollect(timeout):
-            res = await asyncio.gather(*[getOneTimeout(addr, queue, timeout)
-                for addr, queue in self.model_updates.items()])
-            res = dict([elem for elem in res if elem != None])
-            return res
-
-        result = asyncio.run(spawnAndCollect(timeout))
-        return result
+        with self.condition:
+            result = self.collectOneFromEach(self.model_updates.keys(), self.getDeadline(timeout),
+                allow_empty=True)
+        return self.decodeSelected(result)
@@ -1,11 +1,56 @@
-from network.Compression import Compression
+from network.Compression import Compression, CompressionType
+from network.WireCodec import WireCodec
+import network.protos.ModelUpdate_pb2 as ModelUpdate_pb2
+from tffmodel.types.HeterogeneousArray import HeterogeneousArray
 from tffmodel.types.HeterogeneousDenseArray import HeterogeneousDenseArray
 from tffmodel.types.HeterogeneousSparseArray import HeterogeneousSparseArray
 
+from enum import Enum
+import hashlib
+import json
+import math
 import numpy as np
 import pickle
+import struct
 import tensorflow as tf
 
+# layout of the contiguous wire format:
+#   magic (4 bytes) | header length (uint32) | header (json) | padding | aligned data region
+CONTIGUOUS_MAGIC = b"MDFL"
+CONTIGUOUS_PREFIX = struct.Struct("<4sI")
+CONTIGUOUS_ALIGNMENT = 64 # alignment (bytes) of the layers in the data region
+
+def alignOffset(offset):
+    return -(-offset // CONTIGUOUS_ALIGNMENT) * CONTIGUOUS_ALIGNMENT
+
+# encode a compression property as json-serializable value with type information
+def encodeProperty(value):
+    if(isinstance(value, CompressionType)):
+        return {"compression_type": value.value}
+    elif(isinstance(value, np.generic)):
+        return {"scalar": value.item(), "dtype": value.dtype.str}
+    elif(isinstance(value, (np.dtype, type))):
+        return {"dtype": np.dtype(value).str}
+    elif(isinstance(value, np.ndarray)):
+        return {"array": value.tolist(), "dtype": value.dtype.str}
+    elif(isinstance(value, Enum)):
+        raise RuntimeError(f'Cannot encode enum {type(value).__name__} in the contiguous wire format.')
+    else:
+        return {"value": value}
+
+# decode a compression property from its json-serializable representation
+def decodeProperty(encoded):
+    if("compression_type" in encoded):
+        return CompressionType(encoded["compression_type"])
+    elif("scalar" in encoded):
+        return np.dtype(encoded["dtype"]).type(encoded["scalar"])
+    elif("array" in encoded):
+        return np.array(encoded["array"], dtype=np.dtype(encoded["dtype"]))
+    elif("dtype" in encoded):
+        return np.dtype(encoded["dtype"])
+    else:
+        return encoded["value"]
+
 class SerializationUtils:
     # serialize parameters of type HeterogeneousArray into an array of byte-strings
     @classmethod
@@ -26,6 +71,92 @@ class SerializationUtils:
             data = Compression.decompress(data) # decompress the data if compressed
             return data
 
+    # serialize dense parameters into a single buffer with a self-describing header
+    #   (dtype, shape, and offset per layer) followed by one contiguous and aligned data region
+    @classmethod
+    def serializeParametersContiguous(self_class, parameters):
+        layers = [np.asarray(layer, order="C") for layer in parameters.get()]
+        layer_headers = list()
+        offset = 0
+        for layer in layers:
+            offset = alignOffset(offset)
+            layer_headers.append({"dtype": layer.dtype.str, "shape": list(layer.shape), "offset": offset})
+            offset += layer.nbytes
+        compression_properties = parameters.getCompressionProperties()
+        header = json.dumps({"layers": layer_headers,
+            "compression": {key: encodeProperty(val) for key, val in compression_properties.items()}
+                if compression_properties else None}).encode()
+
+        data_start = alignOffset(CONTIGUOUS_PREFIX.size + len(header))
+        pieces = [CONTIGUOUS_PREFIX.pack(CONTIGUOUS_MAGIC, len(header)), header]
+        position = CONTIGUOUS_PREFIX.size + len(header)
+        for layer, layer_header in zip(layers, layer_headers):
+            layer_start = data_start + layer_header["offset"]
+            pieces.append(bytes(layer_start - position)) # padding
+            pieces.append(memoryview(layer.reshape(-1).view(np.uint8)))
+            position = layer_start + layer.nbytes
+        # NOTE: joining the pieces copies each layer exactly once into the resulting buffer
+        return b"".join(pieces)
+
+    # deserialize parameters from a contiguous buffer into a HeterogeneousDenseArray
+    # NOTE: the layers are views into the buffer and hence, read-only if the buffer is immutable
+    @classmethod
+    def deserializeParametersContiguous(self_class, buffer):
+        magic, header_length = CONTIGUOUS_PREFIX.unpack_from(buffer)
+        if(magic != CONTIGUOUS_MAGIC):
+            raise RuntimeError('Buffer is not in the contiguous wire format.')
+        header = json.loads(bytes(memoryview(buffer)[CONTIGUOUS_PREFIX.size :
+            CONTIGUOUS_PREFIX.size + header_length]))
+        data_start = alignOffset(CONTIGUOUS_PREFIX.size + header_length)
+        layers = list()
+        for layer_header in header["layers"]:
+            dtype = np.dtype(layer_header["dtype"])
+            shape = tuple(layer_header["shape"])
+            layers.append(np.frombuffer(buffer, dtype=dtype, count=math.prod(shape),
+                offset=data_start + layer_header["offset"]).reshape(shape))
+        data = HeterogeneousDenseArray(layers)
+        if(header["compression"]):
+            data.setCompressionProperties({key: decodeProperty(val)
+                for key, val in header["compression"].items()})
+        data = Compression.decompress(data) # decompress the data if compressed
+        return data
+
+    # serialize parameters of type HeterogeneousArray into the fields of a ModelParameters message
+    #   (dense parameters use the contiguous wire format, sparse parameters one byte-string per layer)
+    @classmethod
+    def serializeParametersFields(self_class, parameters):
+        if(parameters.is_sparse):
+            return {"sparse": True, "wire_format": ModelUpdate_pb2.LAYERWISE,
+                "parameters": self_class.serializeParameters(parameters)}
+        return {"sparse": False, "wire_format": ModelUpdate_pb2.CONTIGUOUS,
+            "parameters": [self_class.serializeParametersContiguous(parameters)]}
+
+    # deserialize parameters from a ModelParameters message back into a HeterogeneousArray
+    #   (parameters passed by reference between in-process actors are returned as they are)
+    @classmethod
+    def deserializeParametersMessage(self_class, message):
+        if(message is None or isinstance(message, HeterogeneousArray)):
+            return message
+        if(not message.parameters):
+            return None
+        parameters = WireCodec.decodeParameters(message.parameters, message.wire_codec)
+        match message.wire_format:
+            case ModelUpdate_pb2.LAYERWISE:
+                return self_class.deserializeParameters(parameters, sparse=message.sparse)
+            case ModelUpdate_pb2.CONTIGUOUS:
+                return self_class.deserializeParametersContiguous(parameters[0])
+            case _:
+                raise NotImplementedError
+
+    # content hash of the (dense) parameters, i.e., of the dtype, shape, and data of each layer
+    @classmethod
+    def hashParameters(self_class, parameters):
+        parameters_hash = hashlib.blake2b(digest_size=16)
+        for layer in parameters.get():
+            parameters_hash.update(f'{layer.dtype.str}{layer.shape}'.encode())
+            parameters_hash.update(np.ascontiguousarray(layer).data)
+        return parameters_hash.digest()
+
     # serialize the model architecture and the optimizer configuration of a keras model
     @classmethod
     def serializeModel(self_class, model, optimizer):
@@ -0,0 +1,135 @@
+from network.Compression import CompressionType
+
+import logging
+import threading
+
+ADAPTIVE_SMOOTHING = 0.3 # weight of the latest sample in the moving averages of the link statistics
+
+# compression levels ordered from the least to the most lossy setting
+# NOTE: the ratio is the initial estimate of the compressed size relative to float32 parameters and is
+#   refined with the sizes of the actually compressed parameters
+COMPRESSION_LEVELS = [
+    {"ratio": 1, "overrides": {"compression_type": CompressionType.NoneType}},
+    {"ratio": 1/2, "overrides": {"compression_type": CompressionType.QUANTIZE_PROBABILISTIC,
+        "compression_precision": 16}},
+    {"ratio": 1/4, "overrides": {"compression_type": CompressionType.QUANTIZE_PROBABILISTIC,
+        "compression_precision": 8}},
+    {"ratio": 1/8, "overrides": {"compression_type": CompressionType.QUANTIZE_PROBABILISTIC,
+        "compression_precision": 4}},
+    {"ratio": 1/16, "overrides": {"compression_type": CompressionType.QUANTIZE_PROBABILISTIC,
+        "compression_precision": 2}},
+    {"ratio": 1/32, "overrides": {"compression_type": CompressionType.SPARSIFY_LAYERWISE_PERCENTAGE,
+        "compression_percentage": 0.02}},
+    {"ratio": 1/128, "overrides": {"compression_type": CompressionType.SPARSIFY_LAYERWISE_PERCENTAGE,
+        "compression_percentage": 0.005}},
+]
+
+# obtain a readable name of the compression level for logging
+def getLevelName(level):
+    if(level is None):
+        return "configured"
+    overrides = COMPRESSION_LEVELS[level]["overrides"]
+    return "/".join([str(val.name if isinstance(val, CompressionType) else val) for val in overrides.values()])
+
+# moving averages of the round-trip time and the throughput of the link to a neighbor
+class LinkStatistics:
+    def __init__(self):
+        self.rtt = None
+        self.throughput = None
+
+    # update the statistics with the elapsed time (seconds) of a transfer of the payload size (bytes)
+    # NOTE: only transfers without payload (i.e., probes and empty model updates) are round-trip
+    #   samples, every other transfer is a throughput sample regardless of its size
+    # NOTE: the transfers to all neighbors run concurrently, hence, the throughput is the share of the
+    #   uplink the neighbor receives during a broadcast
+    def update(self, payload_size, elapsed):
+        if(payload_size == 0):
+            self.rtt = elapsed if self.rtt is None \
+                else (1 - ADAPTIVE_SMOOTHING) * self.rtt + ADAPTIVE_SMOOTHING * elapsed
+            return
+        throughput = payload_size / max(elapsed - (self.rtt or 0), elapsed / 10)
+        self.throughput = throughput if self.throughput is None \
+            else (1 - ADAPTIVE_SMOOTHING) * self.throughput + ADAPTIVE_SMOOTHING * throughput
+
+    def isKnown(self):
+        return self.throughput is not None
+
+    # predict the transfer time (seconds) of the payload size (bytes)
+    def predictTransferTime(self, payload_size):
+        return (self.rtt or 0) + payload_size / self.throughput
+
+# controller selecting the compression level of each link, such that the predicted transfer time of
+#   the model update stays within the target transfer time
+# NOTE: the round-trip time is probed once per link with a payload-free call (and refined with empty
+#   model updates)
+# NOTE: the statistics are measured from the model update transfers via gRPC, hence, links without
+#   measured throughput (e.g., in the first round or to directly reachable actors) use the
+#   configured compression
+# NOTE: the compression properties are stored with the compressed parameters, such that the
+#   receiver decodes every level without further negotiation
+class AdaptiveCompression:
+    def __init__(self, config):
+        self.config = config
+        self.logger = logging.getLogger("network/AdaptiveCompression")
+        self.logger.setLevel(config["log_level"])
+        self.links = dict()
+        self.levels = dict() # last selected level per link (for logging the changes)
+        self.probed = set() # links whose round-trip time has been probed
+        self.ratios = [level["ratio"] for level in COMPRESSION_LEVELS]
+        self.lock = threading.Lock()
+
+    def isEnabled(self):
+        return self.config["adaptive_compression_flag"]
+
+    # whether the round-trip time of the link to the neighbor has to be probed (once per link)
+    def needsProbe(self, address):
+        if(not self.isEnabled()):
+            return False
+        with self.lock:
+            if(address in self.probed):
+                return False
+            self.probed.add(address)
+            return True
+
+    # record the elapsed time (seconds) of a transfer of the payload size (bytes) to the neighbor
+    def recordTransfer(self, address, payload_size, elapsed):
+        if(not self.isEnabled()):
+            return
+        with self.lock:
+            self.links.setdefault(address, LinkStatistics()).update(payload_size, elapsed)
+
+    # record the size of the parameters compressed with the specified level (refines the estimate)
+    def recordCompression(self, level, dense_size, compressed_size):
+        if(level is None or not dense_size):
+            return
+        with self.lock:
+            ratio = compressed_size / dense_size
+            self.ratios[level] = (1 - ADAPTIVE_SMOOTHING) * self.ratios[level] + ADAPTIVE_SMOOTHING * ratio
+
+    # select the least lossy compression level whose predicted transfer time of the dense size (bytes)
+    #   meets the target (the most lossy level if none does; None for links without statistics)
+    def selectLevel(self, address, dense_size):
+        if(not self.isEnabled()):
+            return None
+        with self.lock:
+            link = self.links.get(address)
+            if(link is None or not link.isKnown()):
+                return None
+            selected_level = len(COMPRESSION_LEVELS) - 1
+            for level, ratio in enumerate(self.ratios):
+                if(link.predictTransferTime(dense_size * ratio) <= self.config["adaptive_compression_target"]):
+                    selected_level = level
+                    break
+            predicted_time = link.predictTransferTime(dense_size * self.ratios[selected_level])
+            changed_flag = self.levels.get(address) != selected_level
+            self.levels[address] = selected_level
+        if(changed_flag):
+            self.logger.debug(f'Selected compression level {getLevelName(selected_level)} for {address} '
+                + f'(predicted transfer time {predicted_time:.3f}s).')
+        return selected_level
+
+    # obtain the configuration with the compression options of the specified level
+    def getConfig(self, level):
+        if(level is None):
+            return self.config
+        return {**self.config, **COMPRESSION_LEVELS[level]["overrides"]}
@@ -12,6 +12,7 @@ class CompressionType(Enum):
     # ===== Sparsification =====
     SPARSIFY_LAYERWISE_TOPK = 101
     SPARSIFY_LAYERWISE_PERCENTAGE = 102
+    SPARSIFY_GLOBAL_TOPK = 103 # K highest values across all layers
 
 # static class with methods for compressing and decompressing model parameters of type HeterogeneousArray
 class Compression:
@@ -31,6 +32,8 @@ class Compression:
                 return Sparsification.sparsifyLayerwiseTopK(data, config["compression_k"])
             case CompressionType.SPARSIFY_LAYERWISE_PERCENTAGE:
                 return Sparsification.sparsifyLayerwisePercentage(data, config["compression_percentage"])
+            case CompressionType.SPARSIFY_GLOBAL_TOPK:
+                return Sparsification.sparsifyGlobalTopK(data, config["compression_k"])
             case _:
                 raise NotImplementedError
 
@@ -50,10 +53,9 @@ class Compression:
                 return data
             case CompressionType.QUANTIZE_PROBABILISTIC:
                 return Quantization.dequantizeProbabilistic(data, compression_properties)
-            case CompressionType.SPARSIFY_LAYERWISE_TOPK:
-                return data
-            case CompressionType.SPARSIFY_LAYERWISE_PERCENTAGE:
-                return data
+            case CompressionType.SPARSIFY_LAYERWISE_TOPK | CompressionType.SPARSIFY_LAYERWISE_PERCENTAGE \
+                | CompressionType.SPARSIFY_GLOBAL_TOPK:
+                return Sparsification.desparsify(data, compression_properties)
             case _:
                 raise NotImplementedError
 
@@ -61,9 +63,12 @@ class Compression:
     @classmethod
     def compressDecompress(self_class, data, config):
         compressed_data = self_class.compress(data, config)
-        decompressed_data = self_class.decompress(data)
+        decompressed_data = self_class.decompress(compressed_data)
         return decompressed_data
 
+QUANTIZATION_BLOCK_SIZE = 65536 # number of values quantized and packed at once (multiple of 8)
+MAX_PACKED_PRECISION = 16 # maximum bit width of the packed quantized values
+
 # select the numpy type for binning/quantization based on the specified precision
 def getNumpyTypeForPrecision(precision):
     # NOTE: We only support predefined numpy uint types yet
@@ -78,71 +83,240 @@ def getNumpyTypeForPrecision(precision):
     else:
         raise NotImplementedError
 
+# pack unsigned integers of the specified bit width (1-16) tightly into a bitstream (msb first)
+def packBits(values, precision):
+    bits = np.unpackbits(values.astype(">u2").view(np.uint8).reshape(-1, 2), axis=1)
+    return np.packbits(bits[:, 16-precision:])
+
+# unpack the specified number of unsigned integers of the specified bit width from a bitstream
+def unpackBits(packed, precision, count):
+    bits = np.zeros((count, 16), dtype=np.uint8)
+    bits[:, 16-precision:] = np.unpackbits(packed, count=count*precision).reshape(count, precision)
+    return np.packbits(bits, axis=1).view(">u2").reshape(count)
+
 # static class for quantization methods
 class Quantization(Compression):
-    # quantize the data to the specified precision (bits) by probabilisticly rounding down/up
+    generators = dict() # random generator per seed (i.e., per actor)
+
+    # obtain the random generator of the specified seed (created on first use)
+    @classmethod
+    def getGenerator(self_class, seed):
+        if(seed not in self_class.generators):
+            self_class.generators[seed] = np.random.default_rng(seed)
+        return self_class.generators[seed]
+
+    # quantize the data to the specified precision (bits) by probabilistically rounding down/up
+    # NOTE: the values are shifted, scaled, and stochastically rounded (i.e., floor(x + u) with uniform
+    #   noise u) block by block in reusable buffers, and values of up to 16 bits are packed tightly
+    #   into one bitstream per layer
     @classmethod
     def quantizeProbabilistic(self_class, data, precision, seed):
+        rng = self_class.getGenerator(seed)
         offset = data.min()
-        scale = (2**precision) / (data.max() - data.min())
-        quantized_data = data - offset # shift data to zero
-        quantized_data *= scale # scale data to the range [0, 2^precision]
+        value_range = data.max() - offset
+        max_value = 2**precision - 1
+        scale = max_value / value_range if value_range > 0 else 1.0
+        packed_flag = precision <= MAX_PACKED_PRECISION
 
-        probabilities = quantized_data.get() % 1
-        rounding_indicator = HeterogeneousDenseArray(
-            [np.random.binomial(1, parr, parr.shape) for parr in probabilities])
-        quantized_data += rounding_indicator
-        quantized_data.floor()
-        quantized_data.setDType(getNumpyTypeForPrecision(precision))
+        layers = list()
+        for layer in data.get():
+            flat_layer = layer.reshape(-1)
+            # NOTE: float32 resolves all values of up to 16 bits exactly
+            buffer_dtype = np.result_type(layer.dtype, np.float32 if packed_flag else np.float64)
+            values = np.empty(min(QUANTIZATION_BLOCK_SIZE, flat_layer.size), dtype=buffer_dtype)
+            noise = np.empty(values.size, dtype=buffer_dtype)
+            if(packed_flag):
+                quantized_layer = np.empty(math.ceil(flat_layer.size * precision / 8), dtype=np.uint8)
+            else:
+                quantized_layer = np.empty(layer.shape, dtype=getNumpyTypeForPrecision(precision))
+            for start in range(0, flat_layer.size, QUANTIZATION_BLOCK_SIZE):
+                block = flat_layer[start : start+QUANTIZATION_BLOCK_SIZE]
+                block_values = values[: block.size]
+                np.subtract(block, offset, out=block_values)
+                np.multiply(block_values, scale, out=block_values)
+                rng.random(dtype=buffer_dtype, out=noise[: block.size])
+                np.add(block_values, noise[: block.size], out=block_values)
+                np.floor(block_values, out=block_values)
+                np.clip(block_values, 0, max_value, out=block_values)
+                if(packed_flag):
+                    packed_block = packBits(block_values, precision)
+                    packed_start = start * precision // 8
+                    quantized_layer[packed_start : packed_start+packed_block.size] = packed_block
+                else:
+                    quantized_layer.reshape(-1)[start : start+block.size] = block_values
+            layers.append(quantized_layer)
 
+        quantized_data = HeterogeneousDenseArray(layers)
         quantized_data.setCompressionProperties({
             "type": CompressionType.QUANTIZE_PROBABILISTIC,
             "offset": offset,
             "scale": scale,
-            "source_dtype": data.getDType()
+            "source_dtype": data.getDType(),
+            "precision": precision,
+            "packed": packed_flag,
+            "shapes": [list(layer.shape) for layer in data.get()]
         })
 
         return quantized_data
 
-    # scale the data back to the original range
+    # unpack the quantized values and scale them back to the original range
     @classmethod
     def dequantizeProbabilistic(self_class, data, compression_properties):
-        data.setDType(compression_properties["source_dtype"])
-        data /= compression_properties["scale"]
-        data += compression_properties["offset"]
-        data.setCompressionProperties(None)
-        return data
+        precision = compression_properties["precision"]
+        source_dtype = np.dtype(compression_properties["source_dtype"])
+        inverse_scale = source_dtype.type(1 / compression_properties["scale"])
+        offset = source_dtype.type(compression_properties["offset"])
+        layers = list()
+        for quantized_layer, shape in zip(data.get(), compression_properties["shapes"]):
+            layer = np.empty(shape, dtype=source_dtype)
+            flat_layer = layer.reshape(-1)
+            for start in range(0, flat_layer.size, QUANTIZATION_BLOCK_SIZE):
+                block = flat_layer[start : start+QUANTIZATION_BLOCK_SIZE]
+                if(compression_properties["packed"]):
+                    packed_start = start * precision // 8
+                    values = unpackBits(quantized_layer[packed_start : packed_start
+                        + math.ceil(block.size * precision / 8)], precision, block.size)
+                else:
+                    values = quantized_layer.reshape(-1)[start : start+block.size]
+                np.multiply(values, inverse_scale, out=block)
+                np.add(block, offset, out=block)
+            layers.append(layer)
+        return HeterogeneousDenseArray(layers)
+
+class SparseIndexEncoding(Enum):
+    VARINT_DELTA = 0 # deltas of the sorted indices as variable-length integers (7 bits per byte)
+    BITMAP = 1 # one bit per element of the layer
 
 # returns the indices of the K elements with highest absolute value
 def getTopKIndices(arr, k):
     if(k > len(arr)):
         k = len(arr)
+    if(k <= 0):
+        return np.empty(0, dtype=np.int64)
     sorted_idx = np.argpartition(np.absolute(arr), len(arr)-k)[-k:]
     return sorted_idx
 
+# number of bytes of each delta as variable-length integer
+def getVarintLengths(deltas):
+    lengths = np.ones(deltas.size, dtype=np.int64)
+    max_delta = int(deltas.max(initial=0))
+    shift = 7
+    while((1 << shift) <= max_delta):
+        lengths += deltas >= (1 << shift)
+        shift += 7
+    return lengths
+
+# encode the deltas as variable-length integers (little-endian groups of 7 bits, continuation bit set)
+def encodeVarints(deltas, lengths):
+    offsets = np.cumsum(lengths) - lengths
+    encoded = np.empty(int(lengths.sum()), dtype=np.uint8)
+    for byte_idx in range(int(lengths.max(initial=0))):
+        selected = lengths > byte_idx
+        group = (deltas[selected] >> np.uint64(7*byte_idx)) & np.uint64(0x7f)
+        group |= (lengths[selected] > byte_idx + 1).astype(np.uint64) << np.uint64(7)
+        encoded[offsets[selected] + byte_idx] = group
+    return encoded
+
+# decode the variable-length integers
+def decodeVarints(encoded):
+    ends = np.flatnonzero((encoded & 0x80) == 0)
+    if(ends.size == 0):
+        return np.empty(0, dtype=np.uint64)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    positions = np.arange(encoded.size) - np.repeat(starts, ends - starts + 1)
+    groups = (encoded & 0x7f).astype(np.uint64) << (7 * positions).astype(np.uint64)
+    return np.bitwise_or.reduceat(groups, starts)
+
+# set the bits of the sorted indices in a bitmap of the specified size (msb first)
+def encodeBitmap(sorted_indices, size):
+    bitmap = np.zeros(math.ceil(size / 8), dtype=np.uint8)
+    if(sorted_indices.size > 0):
+        byte_indices = sorted_indices >> 3
+        bits = np.uint8(0x80) >> (sorted_indices & 7).astype(np.uint8)
+        starts = np.flatnonzero(np.diff(byte_indices, prepend=-1))
+        bitmap[byte_indices[starts]] = np.bitwise_or.reduceat(bits, starts)
+    return bitmap
+
+# encode the sorted indices of a layer with the smaller of both encodings
+def encodeIndices(sorted_indices, size):
+    deltas = np.diff(sorted_indices, prepend=0).astype(np.uint64)
+    lengths = getVarintLengths(deltas)
+    if(lengths.sum() <= math.ceil(size / 8)):
+        return encodeVarints(deltas, lengths), SparseIndexEncoding.VARINT_DELTA
+    return encodeBitmap(sorted_indices, size), SparseIndexEncoding.BITMAP
+
+# decode the sorted indices of a layer of the specified size
+def decodeIndices(encoded_indices, encoding, size):
+    match encoding:
+        case SparseIndexEncoding.VARINT_DELTA:
+            return np.cumsum(decodeVarints(encoded_indices)).astype(np.int64)
+        case SparseIndexEncoding.BITMAP:
+            return np.flatnonzero(np.unpackbits(encoded_indices, count=size))
+        case _:
+            raise NotImplementedError
+
 # static class for sparsification methods
+# NOTE: the selected values of each layer are stored along with their sorted and encoded indices
+#   (i.e., two dense layers per layer) instead of a mask or absolute indices
 class Sparsification(Compression):
     # keep only the K highest values per layer, set the others to zero
     @classmethod
     def sparsifyLayerwiseTopK(self_class, data, k):
-        layerwise_topk_indices = [getTopKIndices(layer.flatten(), k) for layer in data]
-
-        masks = [np.zeros(layer.size) for layer in data]
-        for idx, lti in enumerate(layerwise_topk_indices):
-            masks[idx][lti] = 1
-
-        sparse_data = data.sparsify(masks)
-        return sparse_data
+        layerwise_topk_indices = [getTopKIndices(layer.reshape(-1), k) for layer in data.get()]
+        return self_class.encodeSparse(data, layerwise_topk_indices, CompressionType.SPARSIFY_LAYERWISE_TOPK)
 
     # keep the specified percentage of highest values per layer, set the others to zero
     @classmethod
     def sparsifyLayerwisePercentage(self_class, data, percentage):
         layerwise_percentage_indices = [getTopKIndices(
-            layer.flatten(), math.ceil(layer.size*percentage)) for layer in data]
+            layer.reshape(-1), math.ceil(layer.size*percentage)) for layer in data.get()]
+        return self_class.encodeSparse(data, layerwise_percentage_indices,
+            CompressionType.SPARSIFY_LAYERWISE_PERCENTAGE)
 
-        masks = [np.zeros(layer.size) for layer in data]
-        for idx, lpi in enumerate(layerwise_percentage_indices):
-            masks[idx][lpi] = 1
+    # keep only the K highest values across all layers, set the others to zero
+    # NOTE: the K highest values of the model are among the K highest values of each layer, hence,
+    #   the global selection only considers these candidates
+    @classmethod
+    def sparsifyGlobalTopK(self_class, data, k):
+        layers = [layer.reshape(-1) for layer in data.get()]
+        candidate_indices = [getTopKIndices(layer, k) for layer in layers]
+        candidate_values = np.concatenate([layer[ci] for layer, ci in zip(layers, candidate_indices)])
+        selected = np.sort(getTopKIndices(candidate_values, k))
+        candidate_ends = np.cumsum([ci.size for ci in candidate_indices])
+        layerwise_selected = np.split(selected, np.searchsorted(selected, candidate_ends[:-1]))
+        layerwise_topk_indices = [ci[ls - (end - ci.size)] for ci, ls, end
+            in zip(candidate_indices, layerwise_selected, candidate_ends)]
+        return self_class.encodeSparse(data, layerwise_topk_indices, CompressionType.SPARSIFY_GLOBAL_TOPK)
+
+    # store the values at the specified indices of each layer with the encoded sorted indices
+    @classmethod
+    def encodeSparse(self_class, data, layerwise_indices, compression_type):
+        sparse_layers = list()
+        index_encodings = list()
+        for layer, indices in zip(data.get(), layerwise_indices):
+            sorted_indices = np.sort(indices)
+            encoded_indices, encoding = encodeIndices(sorted_indices, layer.size)
+            sparse_layers.extend([layer.reshape(-1)[sorted_indices], encoded_indices])
+            index_encodings.append(encoding.value)
 
-        sparse_data = data.sparsify(masks)
+        sparse_data = HeterogeneousDenseArray(sparse_layers)
+        sparse_data.setCompressionProperties({
+            "type": compression_type,
+            "shapes": [list(layer.shape) for layer in data.get()],
+            "index_encodings": index_encodings
+        })
         return sparse_data
+
+    # scatter the values of each layer to their decoded indices in the dense layer
+    @classmethod
+    def desparsify(self_class, data, compression_properties):
+        if("index_encodings" not in compression_properties):
+            return data # sparse array of a previous version
+        sparse_layers = data.get()
+        layers = list()
+        for values, encoded_indices, shape, encoding in zip(sparse_layers[0::2], sparse_layers[1::2],
+            compression_properties["shapes"], compression_properties["index_encodings"]):
+            layer = np.zeros(shape, dtype=values.dtype)
+            layer.reshape(-1)[decodeIndices(encoded_indices, SparseIndexEncoding(encoding), layer.size)] = values
+            layers.append(layer)
+        return HeterogeneousDenseArray(layers)
@@ -0,0 +1,68 @@
+from model.FlatParameterArray import FlatParameterArray
+from network.Compression import Compression, CompressionType
+
+from enum import Enum
+import numpy as np
+
+class ErrorFeedbackMode(Enum):
+    NoneMode = 0 # drop the compression error
+    PER_ACTOR = 1 # one residual per kind of parameters (shared by all neighbors)
+    PER_NEIGHBOR = 2 # one residual per kind of parameters and neighbor (compressed per neighbor)
+
+# residuals of the compression error which are added to the parameters before the next compression
+# NOTE: the parameters are added to the residual in place, the sum is compressed, and the residual
+#   is reduced by the decompressed parameters, such that it holds the dropped mass afterwards
+class ErrorFeedback:
+    def __init__(self, config):
+        self.config = config
+        self.residuals = dict()
+
+    # NOTE: with adaptive compression, the compression level may change between the rounds
+    def isEnabled(self):
+        return self.config["error_feedback_mode"] != ErrorFeedbackMode.NoneMode \
+            and (self.config["compression_type"] != CompressionType.NoneType
+                or self.config["adaptive_compression_flag"])
+
+    def isPerNeighbor(self):
+        return self.isEnabled() and self.config["error_feedback_mode"] == ErrorFeedbackMode.PER_NEIGHBOR
+
+    # compress the parameters of the specified kind (e.g., weights or gradient) with error feedback
+    # NOTE: the address of the neighbor selects the residual in the per-neighbor mode only
+    # NOTE: the compression options are taken from the specified configuration (e.g., of an adaptive
+    #   compression level) and from the actor configuration otherwise
+    def compress(self, data, kind, address=None, config=None):
+        if(not data):
+            return None
+        if(config is None):
+            config = self.config
+        key = (kind, address) if self.config["error_feedback_mode"] == ErrorFeedbackMode.PER_NEIGHBOR else kind
+        if(key not in self.residuals):
+            self.residuals[key] = FlatParameterArray.emptyLike(data)
+            self.residuals[key].getFlattened().fill(0)
+        residual = self.residuals[key]
+
+        for residual_layer, layer in zip(residual.get(), data.get()):
+            np.add(residual_layer, layer, out=residual_layer)
+        if(config["compression_type"] == CompressionType.NoneType):
+            # NOTE: the identity compression returns the residual itself, hence, the sum is copied and
+            #   the residual is flushed completely
+            compressed_data = residual.copy().toHeterogeneous()
+            residual.getFlattened().fill(0)
+            return compressed_data
+        compressed_data = Compression.compress(residual.toHeterogeneous(), config)
+        for residual_layer, layer in zip(residual.get(), Compression.decompress(compressed_data).get()):
+            np.subtract(residual_layer, layer, out=residual_layer)
+        return compressed_data
+
+    # add the residual of the source kind to the residual of the target kind and drop the former
+    #   (e.g., when the neighbors of a compression level changed to another level)
+    def mergeResidual(self, source_kind, target_kind):
+        source = self.residuals.pop(source_kind, None)
+        if(source is None):
+            return
+        target = self.residuals.get(target_kind)
+        if(target is None):
+            self.residuals[target_kind] = source
+            return
+        for target_layer, source_layer in zip(target.get(), source.get()):
+            np.add(target_layer, source_layer, out=target_layer)
@@ -0,0 +1,100 @@
+from network.GRPCChannelPool import SERVER_OPTIONS
+from network.IInitializationService import IInitializationService
+import network.protos.Initialization_pb2_grpc as Initialization_pb2_grpc
+import network.protos.ModelUpdate_pb2 as ModelUpdate_pb2
+
+import asyncio
+from concurrent import futures
+import grpc
+import logging
+
+# NOTE: all requests are handled on a single event loop thread, only the callbacks
+#   (e.g., loading the dataset) are pushed to a bounded executor
+class Servicer(Initialization_pb2_grpc.InitializeServicer):
+    def __init__(self, callbacks, executor):
+        self.callbacks = callbacks
+        self.executor = executor
+
+    # run the callback in the executor without blocking the event loop
+    async def runCallback(self, callback_name, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.callbacks[callback_name], *args)
+
+    # inform the actor about its public network address and its actor index in the system
+    async def InitIdentity(self, request, context):
+        await self.runCallback("InitIdentity", request.net_id.ip_and_port,
+            request.net_id.actor_idx, request.num_workers, request.seed)
+        return ModelUpdate_pb2.Ack()
+
+    # inform the actor which dataset to load/use
+    async def InitDataset(self, request, context):
+        await self.runCallback("InitDataset", request.dataset_id,
+            request.partition.partition_scheme_id, request.partition.partition_index,
+            request.partition.dataset_seed, request.partition.partition_dirichlet_alpha)
+        return ModelUpdate_pb2.Ack()
+
+    # obtain the serialized model configuration and initialize the ML model
+    async def InitModel(self, request, context):
+        await self.runCallback("InitModel", request.model_config, request.optimizer_config)
+        return ModelUpdate_pb2.Ack()
+
+    # initialize the weights of the model
+    async def InitModelParameters(self, request, context):
+        await self.runCallback("InitModelParameters", request)
+        return ModelUpdate_pb2.Ack()
+
+    # inform the actor which learning strategy to use
+    async def InitStrategy(self, request, context):
+        await self.runCallback("InitStrategy",
+            request.num_fed_epochs,
+            request.num_local_epochs,
+            request.learning_type_id,
+            request.learning_rate_local,
+            request.learning_rate_global,
+            request.sync_strat_spec.strategy_id,
+            request.sync_strat_spec.percentage,
+            request.sync_strat_spec.amount,
+            request.sync_strat_spec.timeout,
+            request.sync_strat_spec.allow_empty,
+            request.compr_strat_spec.strategy_id,
+            request.compr_strat_spec.k,
+            request.compr_strat_spec.percentage,
+            request.compr_strat_spec.precision,
+            request.pdp_strat_spec.strategy_id,
+            request.pdp_strat_spec.k)
+        return ModelUpdate_pb2.Ack()
+
+    # inform the actor about his neighboring actors and their network addresses
+    async def RegisterNeighbors(self, request, context):
+        await self.runCallback("RegisterNeighbors",
+            {nid.ip_and_port: nid.actor_idx for nid in request.net_id})
+        return ModelUpdate_pb2.Ack()
+
+    # stop the initialization phase and start the training phase
+    async def StartLearning(self, request, context):
+        self.callbacks["StartLearning"]() # runs on the event loop to stop the server
+        return ModelUpdate_pb2.Ack()
+
+class GRPCAsyncInitializationService(IInitializationService):
+    def __init__(self, config):
+        super().__init__(config)
+        self.logger = logging.getLogger("network/GRPCAsyncInitializationService")
+        self.logger.setLevel(config["log_level"])
+
+    def waitForInitialization(self, callbacks):
+        asyncio.run(self.serve(callbacks))
+
+    async def serve(self, callbacks):
+        port = self.config["port"]
+
+        self.server = grpc.aio.server(options=SERVER_OPTIONS)
+        callbacks["StartLearning"] = lambda: asyncio.ensure_future(self.server.stop(None))
+
+        with futures.ThreadPoolExecutor(max_workers=self.config["num_threads_callbacks"]) as executor:
+            Initialization_pb2_grpc.add_InitializeServicer_to_server(
+                Servicer(callbacks, executor), self.server)
+            self.server.add_insecure_port(f'[::]:{port}')
+            await self.server.start()
+            self.logger.info(f'Server started, listening on {port}.')
+            await self.server.wait_for_termination()
+        self.logger.info('Server terminated.')
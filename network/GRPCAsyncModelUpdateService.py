@@ -0,0 +1,105 @@
+from network.GRPCChannelPool import SERVER_OPTIONS
+from network.IModelUpdateService import IModelUpdateService
+from network.ModelUpdateStreaming import ModelUpdateAssembler
+from network.WireCodec import WireCodec
+import network.protos.ModelUpdate_pb2 as ModelUpdate_pb2
+import network.protos.ModelUpdate_pb2_grpc as ModelUpdate_pb2_grpc
+
+import asyncio
+from concurrent import futures
+import grpc
+import logging
+import threading
+import time
+
+# NOTE: all requests are handled on a single event loop thread, only the callbacks
+#   (i.e., deserialization, aggregation, and evaluation) are pushed to a bounded executor
+class Servicer(ModelUpdate_pb2_grpc.ModelUpdateServicer):
+    def __init__(self, callbacks, executor):
+        self.callbacks = callbacks
+        self.executor = executor
+
+    # run the callback in the executor without blocking the event loop
+    async def runCallback(self, callback_name, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.callbacks[callback_name], *args)
+
+    # retrieve a model update from a neighboring actor
+    async def TransferModelUpdate(self, request, context):
+        start_time = time.perf_counter()
+        await self.runCallback("TransferModelUpdate", request.update,
+            request.identity.ip_and_port)
+        return ModelUpdate_pb2.TransferAck(processing_time=time.perf_counter() - start_time)
+
+    # retrieve a model update from a neighboring actor in chunks
+    async def TransferModelUpdateStream(self, request_iterator, context):
+        assembler = ModelUpdateAssembler()
+        async for chunk in request_iterator:
+            assembler.add(chunk)
+        start_time = time.perf_counter()
+        update, address = assembler.get()
+        await self.runCallback("TransferModelUpdate", update, address)
+        return ModelUpdate_pb2.TransferAck(processing_time=time.perf_counter() - start_time)
+
+    # evalutate the model retrieved by a neighboring actor
+    async def EvaluateModel(self, request, context):
+        eval_metrics = await self.runCallback("EvaluateModel", request)
+        return ModelUpdate_pb2.EvaluationMetrics(
+            metrics=[ModelUpdate_pb2.Metric(key=key, value=val)
+                for key, val in eval_metrics.items()])
+
+    # evaluate the model version of a neighboring actor if it is held or derivable by this actor
+    async def EvaluateModelVersion(self, request, context):
+        eval_metrics = await self.runCallback("EvaluateModelVersion", request)
+        if(eval_metrics is None):
+            return ModelUpdate_pb2.EvaluationMetrics(miss=True)
+        return ModelUpdate_pb2.EvaluationMetrics(
+            metrics=[ModelUpdate_pb2.Metric(key=key, value=val)
+                for key, val in eval_metrics.items()])
+
+    # register that the communication from this particular neighboring actor is finished
+    async def AllowTermination(self, request, context):
+        await self.runCallback("AllowTermination", request.ip_and_port)
+        return ModelUpdate_pb2.Ack()
+
+    # accept the offered lossless codecs which are available on this actor
+    async def NegotiateWireCodec(self, request, context):
+        available = [codec.value for codec in WireCodec.getAvailableCodecs()]
+        return ModelUpdate_pb2.WireCodecOffer(
+            codecs=[codec for codec in request.codecs if codec in available])
+
+class GRPCAsyncModelUpdateService(IModelUpdateService):
+    def __init__(self, config):
+        super().__init__(config)
+        self.logger = logging.getLogger("network/GRPCAsyncModelUpdateService")
+        self.logger.setLevel(config["log_level"])
+
+    def startServer(self, callbacks):
+        self.executor = futures.ThreadPoolExecutor(max_workers=self.config["num_threads_callbacks"])
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever,
+            name="GRPCAsyncModelUpdateService", daemon=True)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self.serve(callbacks), self.loop).result()
+
+    async def serve(self, callbacks):
+        port = self.config["port"]
+
+        self.server = grpc.aio.server(options=SERVER_OPTIONS)
+        ModelUpdate_pb2_grpc.add_ModelUpdateServicer_to_server(
+            Servicer(callbacks, self.executor), self.server)
+        self.server.add_insecure_port(f'[::]:{port}')
+        await self.server.start()
+        self.logger.info(f'Server started, listening on {port}.')
+
+    # NOTE: does not wait for the server to stop because it may be called from within a callback
+    def stopServer(self):
+        asyncio.run_coroutine_threadsafe(self.server.stop(grace=1), self.loop)
+
+    def waitForTermination(self):
+        asyncio.run_coroutine_threadsafe(self.server.wait_for_termination(), self.loop).result()
+        self.executor.shutdown(wait=True)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        self.logger.info('Server terminated.')
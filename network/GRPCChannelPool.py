@@ -0,0 +1,94 @@
+import network.protos.ModelUpdate_pb2_grpc as ModelUpdate_pb2_grpc
+
+import asyncio
+import grpc
+import logging
+import threading
+
+# client-side channel options for long-lived connections to the neighboring actors
+CHANNEL_OPTIONS = [
+    ("grpc.keepalive_time_ms", 10000), # ping idle connections every 10 seconds
+    ("grpc.keepalive_timeout_ms", 5000), # consider the connection broken if a ping is not answered within 5 seconds
+    ("grpc.keepalive_permit_without_calls", 1), # keep the connection warm between federated epochs
+    ("grpc.http2.max_pings_without_data", 0), # do not limit the number of pings without data
+    ("grpc.initial_reconnect_backoff_ms", 100),
+    ("grpc.max_reconnect_backoff_ms", 2000),
+]
+
+# server-side channel options that accept the keepalive pings of the channel pool
+SERVER_OPTIONS = [
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.http2.min_ping_interval_without_data_ms", 5000),
+    ("grpc.http2.max_ping_strikes", 0),
+]
+
+# keep one long-lived channel and stub per neighboring actor and run all client calls on a
+#   single event loop thread, such that connections are reused across federated epochs
+class GRPCChannelPool:
+    def __init__(self, config):
+        self.config = config
+        self.logger = logging.getLogger("network/GRPCChannelPool")
+        self.logger.setLevel(config["log_level"])
+        self.channels = dict()
+        self.stubs = dict()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever,
+            name="GRPCChannelPool", daemon=True)
+        self.thread.start()
+
+    # run the coroutine on the event loop of the pool and block until it is completed
+    def run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result()
+
+    # obtain the stub for the specified address and open the channel on first use
+    # NOTE: must be called from within the event loop of the pool
+    def getStub(self, address):
+        if(address not in self.stubs):
+            channel = grpc.aio.insecure_channel(address, options=CHANNEL_OPTIONS)
+            self.channels[address] = channel
+            self.stubs[address] = ModelUpdate_pb2_grpc.ModelUpdateStub(channel)
+            self.logger.debug(f'Opened channel to {address}.')
+        return self.stubs[address]
+
+    # close the channel to the specified address such that the next call reconnects
+    async def resetChannel(self, address):
+        channel = self.channels.pop(address, None)
+        self.stubs.pop(address, None)
+        if(channel):
+            await channel.close()
+
+    # perform the specified rpc on the neighbor and reconnect once if the connection was lost
+    # NOTE: the rpc fails with DEADLINE_EXCEEDED if it is not completed within the timeout (seconds)
+    #   (rpc_timeout by default, 0 for no deadline), and the channel is reset, such that the next
+    #   call reconnects to the neighbor
+    async def call(self, address, method_name, request, timeout=None):
+        if(timeout is None):
+            timeout = self.config["rpc_timeout"]
+        timeout = timeout or None
+        try:
+            try:
+                return await getattr(self.getStub(address), method_name)(request,
+                    wait_for_ready=True, timeout=timeout)
+            except grpc.aio.AioRpcError as err:
+                if(err.code() != grpc.StatusCode.UNAVAILABLE):
+                    raise
+                self.logger.warning(f'Lost connection to {address}, reconnecting.')
+                await self.resetChannel(address)
+                return await getattr(self.getStub(address), method_name)(request,
+                    wait_for_ready=True, timeout=timeout)
+        except grpc.aio.AioRpcError as err:
+            if(err.code() == grpc.StatusCode.DEADLINE_EXCEEDED):
+                self.logger.warning(f'{method_name} on {address} exceeded the deadline of {timeout} seconds.')
+                await self.resetChannel(address)
+            raise
+
+    # close all channels and stop the event loop thread
+    def close(self):
+        async def closeChannels():
+            await asyncio.gather(*[channel.close() for channel in self.channels.values()])
+            self.channels.clear()
+            self.stubs.clear()
+        self.run(closeChannels())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
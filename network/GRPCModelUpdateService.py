@@ -1,11 +1,15 @@
 from model.SerializationUtils import SerializationUtils
+from network.GRPCChannelPool import SERVER_OPTIONS
 from network.IModelUpdateService import IModelUpdateService
+from network.ModelUpdateStreaming import ModelUpdateAssembler
+from network.WireCodec import WireCodec
 import network.protos.ModelUpdate_pb2 as ModelUpdate_pb2
 import network.protos.ModelUpdate_pb2_grpc as ModelUpdate_pb2_grpc
 
 from concurrent import futures
 import grpc
 import logging
+import time
 
 class Servicer(ModelUpdate_pb2_grpc.ModelUpdateServicer):
     def __init__(self, callbacks):
@@ -13,9 +17,20 @@ class Servicer(ModelUpdate_pb2_grpc.ModelUpdateServicer):
 
     # retrieve a model update from a neighboring actor
     def TransferModelUpdate(self, request, context):
+        start_time = time.perf_counter()
         self.callbacks["TransferModelUpdate"](request.update,
             request.identity.ip_and_port)
-        return ModelUpdate_pb2.Ack()
+        return ModelUpdate_pb2.TransferAck(processing_time=time.perf_counter() - start_time)
+
+    # retrieve a model update from a neighboring actor in chunks
+    def TransferModelUpdateStream(self, request_iterator, context):
+        assembler = ModelUpdateAssembler()
+        for chunk in request_iterator:
+            assembler.add(chunk)
+        start_time = time.perf_counter()
+        update, address = assembler.get()
+        self.callbacks["TransferModelUpdate"](update, address)
+        return ModelUpdate_pb2.TransferAck(processing_time=time.perf_counter() - start_time)
 
     # evalutate the model retrieved by a neighboring actor
     def EvaluateModel(self, request, context):
@@ -24,11 +39,26 @@ class Servicer(ModelUpdate_pb2_grpc.ModelUpdateServicer):
             metrics=[ModelUpdate_pb2.Metric(key=key, value=val)
                 for key, val in eval_metrics.items()])
 
+    # evaluate the model version of a neighboring actor if it is held or derivable by this actor
+    def EvaluateModelVersion(self, request, context):
+        eval_metrics = self.callbacks["EvaluateModelVersion"](request)
+        if(eval_metrics is None):
+            return ModelUpdate_pb2.EvaluationMetrics(miss=True)
+        return ModelUpdate_pb2.EvaluationMetrics(
+            metrics=[ModelUpdate_pb2.Metric(key=key, value=val)
+                for key, val in eval_metrics.items()])
+
     # register that the communication from this particular neighboring actor is finished
     def AllowTermination(self, request, context):
         self.callbacks["AllowTermination"](request.ip_and_port)
         return ModelUpdate_pb2.Ack()
 
+    # accept the offered lossless codecs which are available on this actor
+    def NegotiateWireCodec(self, request, context):
+        available = [codec.value for codec in WireCodec.getAvailableCodecs()]
+        return ModelUpdate_pb2.WireCodecOffer(
+            codecs=[codec for codec in request.codecs if codec in available])
+
 class GRPCModelUpdateService(IModelUpdateService):
     def __init__(self, config):
         super().__init__(config)
@@ -39,7 +69,8 @@ class GRPCModelUpdateService(IModelUpdateService):
         port = self.config["port"]
         num_threads = self.config["num_threads_server"]
 
-        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=num_threads))
+        self.server = grpc.server(futures.ThreadPoolExecutor(max_workers=num_threads),
+            options=SERVER_OPTIONS)
         ModelUpdate_pb2_grpc.add_ModelUpdateServicer_to_server(
             Servicer(callbacks), self.server)
         self.server.add_insecure_port(f'[::]:{port}')
@@ -15,3 +15,23 @@ class IModelUpdateService(ABC):
     @abstractmethod
     def waitForTermination(self):
         pass
+
+    # whether model updates to the specified actor can bypass gRPC (e.g., co-located actors)
+    def isDirectlyReachable(self, address):
+        return False
+
+    # transfer the model update message to the specified directly reachable actors
+    #   returns the addresses that could not be served and hence, have to be served via gRPC
+    # NOTE: the serialized parameters may be passed separately from the message (as for streaming)
+    def transferModelUpdate(self, addresses, message, weights_serialized=None, gradient_serialized=None):
+        return list(addresses)
+
+    # whether model updates are passed as references to the parameters instead of serialized messages
+    #   (i.e., all actors run in the same process)
+    def passesReferences(self):
+        return False
+
+    # perform the specified call directly on the servicer of the specified actor
+    # NOTE: only supported by services that pass references
+    def call(self, address, method_name, request):
+        raise NotImplementedError
@@ -0,0 +1,78 @@
+from network.GRPCModelUpdateService import Servicer
+from network.IModelUpdateService import IModelUpdateService
+
+import logging
+import threading
+
+# model update of an in-process actor which references the (decompressed) parameters instead of
+#   carrying their serialized representation
+# NOTE: the parameters are shared among all receiving actors and must not be modified in place
+class ModelUpdateReference:
+    def __init__(self, weights=None, gradient=None, aggregation_weight=0):
+        self.weights = weights
+        self.gradient = gradient
+        self.aggregation_weight = aggregation_weight
+
+    def isEmpty(self):
+        return self.weights is None and self.gradient is None
+
+    # obtain the market element of the model update (no deserialization required)
+    def decode(self):
+        return {"weights": self.weights, "gradient": self.gradient,
+            "aggregation_weight": self.aggregation_weight}
+
+# model update service for actors that run in the same process (i.e., in a simulation)
+# NOTE: the services of all actors are registered in a class-level registry and the calls of a
+#   neighbor are performed directly on its servicer in the thread of the caller
+class InMemoryModelUpdateService(IModelUpdateService):
+    services = dict()
+    services_condition = threading.Condition()
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.logger = logging.getLogger("network/InMemoryModelUpdateService")
+        self.logger.setLevel(config["log_level"])
+        self.terminated = threading.Event()
+
+    # remove the services of a previous simulation from the registry
+    @classmethod
+    def clearServices(self_class):
+        with self_class.services_condition:
+            self_class.services.clear()
+
+    # obtain the service of the specified actor and wait until the actor has started its service
+    @classmethod
+    def getService(self_class, address):
+        with self_class.services_condition:
+            self_class.services_condition.wait_for(lambda: address in self_class.services)
+            return self_class.services[address]
+
+    def startServer(self, callbacks):
+        self.servicer = Servicer(callbacks)
+        with self.services_condition:
+            self.services[self.config["address"]] = self
+            self.services_condition.notify_all()
+        self.logger.info(f'Server started for {self.config["address"]}.')
+
+    def stopServer(self):
+        self.terminated.set()
+
+    def waitForTermination(self):
+        self.terminated.wait()
+        self.logger.info('Server terminated.')
+
+    def passesReferences(self):
+        return True
+
+    # all neighbors run in the same process
+    def isDirectlyReachable(self, address):
+        return True
+
+    # hand the model update reference to the callbacks of the specified actors
+    def transferModelUpdate(self, addresses, message, weights_serialized=None, gradient_serialized=None):
+        for addr in addresses:
+            self.getService(addr).servicer.callbacks["TransferModelUpdate"](message, self.config["address"])
+        return list()
+
+    def call(self, address, method_name, request):
+        return getattr(self.getService(address).servicer, method_name)(request, None)
@@ -0,0 +1,77 @@
+import network.protos.ModelUpdate_pb2 as ModelUpdate_pb2
+
+# obtain the fields of a ModelParameters message without the serialized parameters
+def stripPayload(parameters_fields):
+    return {key: val for key, val in parameters_fields.items() if key != "parameters"}
+
+# iterable of chunks for transferring a model update via TransferModelUpdateStream
+# NOTE: the chunks are generated lazily from the serialized parameters, hence, the transmission
+#   starts with the first fragment and each iteration regenerates the stream (e.g., on reconnect)
+class ModelUpdateChunks:
+    def __init__(self, message, weights_serialized, gradient_serialized, chunk_size):
+        self.message = message
+        self.weights_serialized = weights_serialized or []
+        self.gradient_serialized = gradient_serialized or []
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        yield ModelUpdate_pb2.ModelUpdateChunk(header=ModelUpdate_pb2.ModelUpdateHeader(
+            message=self.message,
+            weights_sizes=[len(elem) for elem in self.weights_serialized],
+            gradient_sizes=[len(elem) for elem in self.gradient_serialized]))
+        for kind, serialized in ((ModelUpdate_pb2.WEIGHTS, self.weights_serialized),
+            (ModelUpdate_pb2.GRADIENT, self.gradient_serialized)):
+            for index, elem in enumerate(serialized):
+                elem_view = memoryview(elem)
+                for offset in range(0, len(elem_view), self.chunk_size):
+                    yield ModelUpdate_pb2.ModelUpdateChunk(fragment=ModelUpdate_pb2.ParameterFragment(
+                        kind=kind, index=index, offset=offset,
+                        data=elem_view[offset : offset+self.chunk_size].tobytes()))
+
+# model parameters of a streamed model update with the payload reassembled in receive buffers
+class ReassembledModelParameters:
+    def __init__(self, header, parameters):
+        self.header = header
+        self.parameters = parameters
+
+    # fall back to the header message for all fields except the payload
+    def __getattr__(self, name):
+        return getattr(self.header, name)
+
+# model update of a streamed model update message with the payload reassembled in receive buffers
+class ReassembledModelParameterUpdate:
+    def __init__(self, header, weights_buffers, gradient_buffers):
+        self.header = header
+        self.weights = ReassembledModelParameters(header.weights, weights_buffers)
+        self.gradient = ReassembledModelParameters(header.gradient, gradient_buffers)
+
+    # fall back to the header message for all fields except the parameters
+    def __getattr__(self, name):
+        return getattr(self.header, name)
+
+# reassemble the chunks of a streamed model update directly into preallocated receive buffers
+class ModelUpdateAssembler:
+    def __init__(self):
+        self.message = None
+        self.buffers = None
+
+    def add(self, chunk):
+        if(chunk.HasField("header")):
+            self.message = chunk.header.message
+            self.buffers = {
+                ModelUpdate_pb2.WEIGHTS: [bytearray(size) for size in chunk.header.weights_sizes],
+                ModelUpdate_pb2.GRADIENT: [bytearray(size) for size in chunk.header.gradient_sizes]}
+        else:
+            if(self.message is None):
+                raise RuntimeError('Received a parameter fragment before the model update header.')
+            fragment = chunk.fragment
+            buffer = self.buffers[fragment.kind][fragment.index]
+            buffer[fragment.offset : fragment.offset+len(fragment.data)] = fragment.data
+
+    # obtain the reassembled model update and the network address of the sender
+    def get(self):
+        if(self.message is None):
+            raise RuntimeError('Received an empty model update stream.')
+        update = ReassembledModelParameterUpdate(self.message.update,
+            self.buffers[ModelUpdate_pb2.WEIGHTS], self.buffers[ModelUpdate_pb2.GRADIENT])
+        return update, self.message.identity.ip_and_port
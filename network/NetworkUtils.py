@@ -1,11 +1,18 @@
+from network.GRPCAsyncInitializationService import GRPCAsyncInitializationService
+from network.GRPCAsyncModelUpdateService import GRPCAsyncModelUpdateService
 from network.GRPCInitializationService import GRPCInitializationService
 from network.GRPCModelUpdateService import GRPCModelUpdateService
+from network.InMemoryModelUpdateService import InMemoryModelUpdateService
+from network.SharedMemoryModelUpdateService import SharedMemoryModelUpdateService
 
 from enum import Enum
 import numpy as np
 
 class NetworkServiceType(Enum):
     GRPC = 1
+    GRPC_ASYNC = 2 # asyncio-based server with a bounded executor for the callbacks
+    SHARED_MEMORY = 3 # shared memory for co-located actors and gRPC for all other actors
+    IN_MEMORY = 4 # references to the parameters for actors in the same process (simulation only)
 
 class NetworkUtils:
     # obtain the neighbor addresses for a particular actor based on the adjacency matrix
@@ -24,6 +31,13 @@ class NetworkUtils:
         match config["networkservice_type"]:
             case NetworkServiceType.GRPC:
                 return GRPCInitializationService(config)
+            case NetworkServiceType.GRPC_ASYNC:
+                return GRPCAsyncInitializationService(config)
+            case NetworkServiceType.SHARED_MEMORY:
+                # NOTE: the initiator is not necessarily co-located with the actors
+                return GRPCInitializationService(config)
+            case NetworkServiceType.IN_MEMORY:
+                raise RuntimeError('In-process actors are initialized by the simulator.')
             case _:
                 raise NotImplementedError
 
@@ -32,5 +46,11 @@ class NetworkUtils:
         match config["networkservice_type"]:
             case NetworkServiceType.GRPC:
                 return GRPCModelUpdateService(config)
+            case NetworkServiceType.GRPC_ASYNC:
+                return GRPCAsyncModelUpdateService(config)
+            case NetworkServiceType.SHARED_MEMORY:
+                return SharedMemoryModelUpdateService(config)
+            case NetworkServiceType.IN_MEMORY:
+                return InMemoryModelUpdateService(config)
             case _:
                 raise NotImplementedError
@@ -0,0 +1,341 @@
+from model.SerializationUtils import SerializationUtils
+from network.GRPCModelUpdateService import GRPCModelUpdateService
+from network.IModelUpdateService import IModelUpdateService
+from network.InMemoryModelUpdateService import ModelUpdateReference
+from network.ModelUpdateStreaming import ReassembledModelParameterUpdate
+import network.protos.ModelUpdate_pb2 as ModelUpdate_pb2
+
+from collections import deque
+from concurrent import futures
+from multiprocessing import resource_tracker, shared_memory
+import logging
+import numpy as np
+import os
+import socket
+import struct
+import threading
+import time
+
+# notification datagram: kind (uint8), sequence number (uint64), offset (uint64), length (uint64),
+#   followed by the network address of the sender and, for model updates, the name of the segment
+#   of the sender (utf-8, separated by a newline)
+NOTIFICATION = struct.Struct("<BQQQ")
+NOTIFY_UPDATE = 1 # a model update is available in the segment of the sender
+NOTIFY_ACK = 2 # the receiver has decoded the model update from the segment of the sender
+NOTIFY_FAIL = 3 # the receiver could not decode the model update (the sender falls back to gRPC)
+# model update in the segment: length of the header (uint64), the ModelUpdateHeader (i.e., the
+#   message without the serialized parameters), and the serialized parameters one after the other
+HEADER_PREFIX = struct.Struct("<Q")
+
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1", "0.0.0.0", socket.gethostname()}
+SHM_PATH = "/dev/shm" # mount point of the shared memory segments (Linux)
+MIN_SEGMENT_SIZE = 16777216 # smallest segment (bytes) the ring buffer shrinks to if /dev/shm is short on space
+
+def getPort(address):
+    return address.rsplit(":", 1)[1]
+
+# NOTE: the segment name is unique per process, such that stale segments of a crashed run with the
+#   same port are never reused (the receivers learn the name from the notifications)
+def getSegmentName(address):
+    return f'modefl_{getPort(address)}_{os.getpid()}'
+
+def getSocketPath(config, address):
+    return os.path.join(config["shm_dir"], f'modefl_{getPort(address)}.sock')
+
+# remove the segments of terminated processes that used the port of the specified address
+def removeStaleSegments(address, logger):
+    if(not os.path.isdir(SHM_PATH)):
+        return
+    prefix = f'modefl_{getPort(address)}_'
+    for name in os.listdir(SHM_PATH):
+        if(not name.startswith(prefix) or not name[len(prefix):].isdigit()):
+            continue
+        try:
+            os.kill(int(name[len(prefix):]), 0)
+            continue # the owner is still running
+        except ProcessLookupError:
+            pass
+        except PermissionError:
+            continue # the owner is running as another user
+        try:
+            os.unlink(os.path.join(SHM_PATH, name))
+            logger.info(f'Removed the stale shared memory segment {name}.')
+        except OSError:
+            pass
+
+# ring buffer in a shared memory segment owned by the sending actor
+# NOTE: regions are allocated in FIFO order and released once all receivers have acknowledged them
+# NOTE: the pages of the segment are allocated at creation, such that a full /dev/shm is detected
+#   here instead of crashing the writer with SIGBUS, and the segment is halved until it fits
+class SharedMemoryRingBuffer:
+    def __init__(self, name, size, logger=None):
+        while(True):
+            self.segment = shared_memory.SharedMemory(name=name, create=True, size=size)
+            try:
+                if(hasattr(os, "posix_fallocate")):
+                    os.posix_fallocate(self.segment._fd, 0, size)
+                break
+            except OSError as err:
+                self.segment.close()
+                self.segment.unlink()
+                if(size // 2 < MIN_SEGMENT_SIZE):
+                    raise RuntimeError(f'Cannot allocate a shared memory segment of {size} bytes ({err}), '
+                        + 'increase the size of /dev/shm or use another network service type.') from err
+                if(logger):
+                    logger.warning(f'Cannot allocate a shared memory segment of {size} bytes ({err}), '
+                        + f'retrying with {size // 2} bytes.')
+                size //= 2
+        self.name = name
+        self.size = size
+        self.sequence = 0
+        self.regions = deque() # entries: [sequence number, start, end, pending receivers, failed receivers]
+        self.condition = threading.Condition()
+
+    # obtain the start of a free region of the specified length or None if the ring is full
+    def findFreeRegion(self, length):
+        # drop the regions that were acknowledged by all receivers
+        while(self.regions and not self.regions[0][3]):
+            self.regions.popleft()
+        if(not self.regions):
+            return 0
+        first_start = self.regions[0][1]
+        last_end = self.regions[-1][2]
+        if(last_end > first_start): # the occupied regions do not wrap around
+            if(self.size - last_end >= length):
+                return last_end
+            if(first_start >= length):
+                return 0
+            return None
+        if(first_start - last_end >= length):
+            return last_end
+        return None
+
+    # write the pieces of data consecutively into a free region and register the receivers which
+    #   have to acknowledge it; returns the region or None on timeout
+    def write(self, pieces, receivers, timeout):
+        length = sum([len(piece) for piece in pieces])
+        if(length == 0 or length > self.size):
+            return None
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            start = self.findFreeRegion(length)
+            while(start is None):
+                remaining = deadline - time.monotonic()
+                if(remaining <= 0):
+                    return None
+                self.condition.wait(remaining)
+                start = self.findFreeRegion(length)
+            self.sequence += 1
+            region = [self.sequence, start, start + length, set(receivers), set()]
+            self.regions.append(region)
+        # NOTE: the region is reserved, hence, the data can be copied without holding the lock
+        position = start
+        for piece in pieces:
+            self.segment.buf[position : position+len(piece)] = piece
+            position += len(piece)
+        return region
+
+    # register the acknowledgement (or the failure) of a receiver for the region with the specified
+    #   sequence number
+    def release(self, sequence, receiver, failed_flag=False):
+        with self.condition:
+            for region in self.regions:
+                if(region[0] == sequence):
+                    region[3].discard(receiver)
+                    if(failed_flag):
+                        region[4].add(receiver)
+                    break
+            self.condition.notify_all()
+
+    # abandon the regions of a receiver that will not acknowledge them (e.g., failed notification)
+    def abandon(self, sequence, receivers):
+        for receiver in receivers:
+            self.release(sequence, receiver)
+
+    # wait until all receivers of the region have acknowledged it or the timeout has expired
+    #   returns the receivers that failed and the receivers that are still pending
+    def waitForReceivers(self, region, timeout):
+        with self.condition:
+            self.condition.wait_for(lambda: not region[3], timeout)
+            return set(region[4]), set(region[3])
+
+    def close(self):
+        self.segment.close()
+        self.segment.unlink()
+
+# copy the layers of the decoded parameters that are still views into the segment
+def detachParameters(parameters, segment_array):
+    if(parameters is None):
+        return None
+    shared = [isinstance(layer, np.ndarray) and np.may_share_memory(layer, segment_array)
+        for layer in parameters.get()]
+    if(not any(shared)):
+        return parameters
+    return parameters.__class__([np.array(layer) if shared_flag else layer
+        for layer, shared_flag in zip(parameters.get(), shared)])
+
+# transfer model updates to co-located actors via shared memory and to all other actors via gRPC
+# NOTE: each actor writes its outgoing model updates into its own ring buffer segment and notifies
+#   the receivers via unix datagram sockets, the receivers decode the parameters from views into
+#   the segment of the sender (in the callback threads) and acknowledge them afterwards so that the
+#   region can be reused, or report the failure so that the sender falls back to gRPC
+class SharedMemoryModelUpdateService(IModelUpdateService):
+    def __init__(self, config):
+        super().__init__(config)
+        self.logger = logging.getLogger("network/SharedMemoryModelUpdateService")
+        self.logger.setLevel(config["log_level"])
+        # evaluation requests, termination permissions, and model updates from remote actors
+        self.grpc_service = GRPCModelUpdateService(config)
+        self.attached_segments = dict()
+        self.attached_lock = threading.Lock()
+
+    def startServer(self, callbacks):
+        self.callbacks = callbacks
+        self.grpc_service.startServer(callbacks)
+
+        removeStaleSegments(self.config["address"], self.logger)
+        self.ring_buffer = SharedMemoryRingBuffer(getSegmentName(self.config["address"]),
+            self.config["shm_segment_size"], self.logger)
+        self.socket_path = getSocketPath(self.config, self.config["address"])
+        if(os.path.exists(self.socket_path)):
+            os.unlink(self.socket_path)
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.socket.bind(self.socket_path)
+        self.socket.settimeout(0.5)
+
+        self.executor = futures.ThreadPoolExecutor(max_workers=self.config["num_threads_callbacks"])
+        self.running = True
+        self.listener = threading.Thread(target=self.listen,
+            name="SharedMemoryModelUpdateService", daemon=True)
+        self.listener.start()
+        self.logger.info(f'Shared memory segment {self.ring_buffer.name} of {self.ring_buffer.size} bytes '
+            + f'created, listening on {self.socket_path}.')
+
+    def stopServer(self):
+        self.running = False
+        self.grpc_service.stopServer()
+
+    def waitForTermination(self):
+        self.grpc_service.waitForTermination()
+        self.running = False
+        self.listener.join()
+        self.executor.shutdown(wait=True)
+        self.socket.close()
+        if(os.path.exists(self.socket_path)):
+            os.unlink(self.socket_path)
+        with self.attached_lock:
+            for segment in self.attached_segments.values():
+                segment.close()
+            self.attached_segments.clear()
+        self.ring_buffer.close()
+        self.logger.info('Shared memory segment released.')
+
+    # the neighbor runs on the same host and listens for shared memory notifications
+    def isDirectlyReachable(self, address):
+        host = address.rsplit(":", 1)[0].strip("[]")
+        own_host = self.config["address"].rsplit(":", 1)[0].strip("[]")
+        return (host in LOCAL_HOSTS or host == own_host) \
+            and os.path.exists(getSocketPath(self.config, address))
+
+    # write the model update once into the ring buffer, notify all specified receivers, and wait
+    #   until they have decoded it
+    #   returns the addresses that could not be served (i.e., have to be served via gRPC)
+    # NOTE: receivers that do not respond within the timeout keep the region and are not served via
+    #   gRPC, since they may still decode the model update
+    def transferModelUpdate(self, addresses, message, weights_serialized=None, gradient_serialized=None):
+        weights_serialized = weights_serialized or []
+        gradient_serialized = gradient_serialized or []
+        header = ModelUpdate_pb2.ModelUpdateHeader(message=message,
+            weights_sizes=[len(elem) for elem in weights_serialized],
+            gradient_sizes=[len(elem) for elem in gradient_serialized]).SerializeToString()
+        pieces = [HEADER_PREFIX.pack(len(header)), header, *weights_serialized, *gradient_serialized]
+        region = self.ring_buffer.write(pieces, addresses, self.config["shm_timeout"])
+        if(region is None):
+            self.logger.debug('Shared memory ring buffer is full, falling back to gRPC.')
+            return list(addresses)
+        sequence, offset, end = region[0], region[1], region[2]
+        notification = NOTIFICATION.pack(NOTIFY_UPDATE, sequence, offset, end - offset) \
+            + f'{self.config["address"]}\n{self.ring_buffer.name}'.encode()
+        failed = list()
+        for addr in addresses:
+            try:
+                self.socket.sendto(notification, getSocketPath(self.config, addr))
+            except OSError as err:
+                self.logger.debug(f'Notifying {addr} via shared memory failed ({err}).')
+                failed.append(addr)
+        self.ring_buffer.abandon(sequence, failed)
+        decode_failed, pending = self.ring_buffer.waitForReceivers(region, self.config["shm_timeout"])
+        if(decode_failed):
+            self.logger.warning(f'{", ".join(sorted(decode_failed))} could not decode the model update '
+                + 'from shared memory, falling back to gRPC.')
+        if(pending):
+            self.logger.warning(f'{", ".join(sorted(pending))} did not acknowledge the model update '
+                + f'within {self.config["shm_timeout"]} seconds.')
+        return failed + [addr for addr in addresses if addr in decode_failed]
+
+    # attach to the segment with the specified name (cached for the lifetime of the service)
+    def getSegment(self, name):
+        with self.attached_lock:
+            if(name not in self.attached_segments):
+                segment = shared_memory.SharedMemory(name=name)
+                # NOTE: the segment is owned by the sender, hence, the resource tracker of this
+                #   process must not unlink it when this process terminates
+                resource_tracker.unregister(segment._name, "shared_memory")
+                self.attached_segments[name] = segment
+            return self.attached_segments[name]
+
+    def listen(self):
+        while(self.running):
+            try:
+                datagram = self.socket.recv(NOTIFICATION.size + 1024)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            kind, sequence, offset, length = NOTIFICATION.unpack_from(datagram)
+            address, _, segment_name = datagram[NOTIFICATION.size:].decode().partition("\n")
+            if(kind == NOTIFY_ACK or kind == NOTIFY_FAIL):
+                self.ring_buffer.release(sequence, address, kind == NOTIFY_FAIL)
+            elif(kind == NOTIFY_UPDATE):
+                # NOTE: the model update is decoded in a callback thread, such that the listener
+                #   keeps serving the notifications and acknowledgements of the other actors
+                self.executor.submit(self.receive, address, segment_name, sequence, offset, length)
+
+    # decode the model update from views into the segment of the sender, acknowledge it (or report
+    #   the failure), and pass the decoded model update to the callback
+    def receive(self, address, segment_name, sequence, offset, length):
+        update = None
+        try:
+            segment_array = np.frombuffer(self.getSegment(segment_name).buf, dtype=np.uint8)
+            header_length, = HEADER_PREFIX.unpack_from(segment_array, offset)
+            position = offset + HEADER_PREFIX.size
+            header = ModelUpdate_pb2.ModelUpdateHeader.FromString(
+                segment_array[position : position+header_length].tobytes())
+            position += header_length
+            views = list()
+            for size in [*header.weights_sizes, *header.gradient_sizes]:
+                views.append(segment_array[position : position+size])
+                position += size
+            if(position > offset + length):
+                raise RuntimeError('The model update exceeds its region.')
+            encoded_update = ReassembledModelParameterUpdate(header.message.update,
+                views[:len(header.weights_sizes)], views[len(header.weights_sizes):])
+            # NOTE: the decoded parameters must not reference the segment, since the region is
+            #   reused after the acknowledgement
+            update = ModelUpdateReference(
+                weights=detachParameters(SerializationUtils.deserializeParametersMessage(
+                    encoded_update.weights), segment_array),
+                gradient=detachParameters(SerializationUtils.deserializeParametersMessage(
+                    encoded_update.gradient), segment_array),
+                aggregation_weight=encoded_update.aggregation_weight)
+            sender = header.message.identity.ip_and_port
+        except Exception as err:
+            self.logger.error(f'Decoding the model update of {address} from shared memory failed ({err}).')
+        notification = NOTIFICATION.pack(NOTIFY_ACK if update is not None else NOTIFY_FAIL,
+            sequence, offset, length) + self.config["address"].encode()
+        try:
+            self.socket.sendto(notification, getSocketPath(self.config, address))
+        except OSError as err:
+            self.logger.debug(f'Acknowledging the model update of {address} failed ({err}).')
+        if(update is not None):
+            self.callbacks["TransferModelUpdate"](update, sender)
@@ -0,0 +1,83 @@
+from enum import Enum
+import bz2
+import time
+import zlib
+
+try:
+    import lzma
+except ImportError: # python may be built without liblzma
+    lzma = None
+
+# lossless codecs applied to the serialized parameters on the wire
+# NOTE: the values correspond to the WireCodec enum of the protocol buffers
+class WireCodecType(Enum):
+    NoneType = 0 # send the serialized parameters as they are
+    ZLIB = 1
+    LZMA = 2
+    BZ2 = 3
+
+# static class with methods for losslessly encoding and decoding the serialized parameters
+class WireCodec:
+    # obtain the codecs which can be decoded by this actor
+    @classmethod
+    def getAvailableCodecs(self_class):
+        return [codec for codec in WireCodecType
+            if codec != WireCodecType.LZMA or lzma is not None]
+
+    @classmethod
+    def compressBytes(self_class, data, codec, level):
+        match codec:
+            case WireCodecType.NoneType:
+                return data
+            case WireCodecType.ZLIB:
+                return zlib.compress(data, level)
+            case WireCodecType.LZMA:
+                return lzma.compress(data, preset=level)
+            case WireCodecType.BZ2:
+                return bz2.compress(data, compresslevel=max(level, 1))
+            case _:
+                raise NotImplementedError
+
+    @classmethod
+    def decompressBytes(self_class, data, codec):
+        match codec:
+            case WireCodecType.NoneType:
+                return data
+            case WireCodecType.ZLIB:
+                return zlib.decompress(data)
+            case WireCodecType.LZMA:
+                return lzma.decompress(data)
+            case WireCodecType.BZ2:
+                return bz2.decompress(data)
+            case _:
+                raise NotImplementedError
+
+    # encode the serialized parameters of the ModelParameters fields with the specified codec
+    #   returns the encoded fields and the statistics of the encoding (sizes and cpu time)
+    # NOTE: payloads which do not shrink are passed through unencoded
+    @classmethod
+    def encodeFields(self_class, parameters_fields, codec, level):
+        raw_size = sum([len(elem) for elem in parameters_fields["parameters"]])
+        stats = {"wire_codec": codec.name, "raw_size": raw_size, "encoded_size": raw_size,
+            "ratio": 1.0, "cpu_time": 0.0}
+        if(codec == WireCodecType.NoneType or raw_size == 0):
+            return parameters_fields, stats
+        start = time.thread_time()
+        encoded = [self_class.compressBytes(elem, codec, level)
+            for elem in parameters_fields["parameters"]]
+        stats["cpu_time"] = time.thread_time() - start
+        encoded_size = sum([len(elem) for elem in encoded])
+        if(encoded_size >= raw_size): # pass through incompressible payloads
+            stats["wire_codec"] = WireCodecType.NoneType.name
+            return parameters_fields, stats
+        stats["encoded_size"] = encoded_size
+        stats["ratio"] = raw_size / encoded_size
+        return {**parameters_fields, "parameters": encoded, "wire_codec": codec.value}, stats
+
+    # decode the serialized parameters of a ModelParameters message
+    @classmethod
+    def decodeParameters(self_class, parameters, codec):
+        codec = WireCodecType(codec)
+        if(codec == WireCodecType.NoneType):
+            return parameters
+        return [self_class.decompressBytes(elem, codec) for elem in parameters]
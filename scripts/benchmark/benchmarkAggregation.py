@@ -0,0 +1,57 @@
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from model.FlatParameterArray import FlatParameterArray
+from tffmodel.types.HeterogeneousDenseArray import HeterogeneousDenseArray
+
+import numpy as np
+import time
+import tracemalloc
+
+# compare the weighted averaging of k model updates with np.average over a list of
+#   HeterogeneousDenseArray objects and with a single product over stacked contiguous buffers
+#   regarding the runtime, the peak of newly allocated memory, and the dtype of the result
+# usage: python scripts/benchmark/benchmarkAggregation.py [<num_parameters> ...]
+
+def createParameters(num_parameters, num_layers=8):
+    layer_size = num_parameters // num_layers
+    return HeterogeneousDenseArray([np.random.rand(layer_size).astype(np.float32)
+        for _ in range(num_layers)])
+
+def measure(function, repetitions):
+    tracemalloc.start()
+    result = function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(repetitions):
+        function()
+    duration = (time.perf_counter() - start) / repetitions
+    return result, peak, duration
+
+def benchmark(num_parameters, num_updates=8, repetitions=3):
+    updates = [createParameters(num_parameters) for _ in range(num_updates)]
+    flat_updates = [FlatParameterArray.fromHeterogeneous(update) for update in updates]
+    # NOTE: the aggregation weights are numpy integers like the cardinalities of the datasets
+    weights = [np.int64(np.random.randint(100, 1000)) for _ in range(num_updates)]
+    model_bytes = sum([layer.nbytes for layer in updates[0].get()])
+    print(f'===== {num_parameters} parameters ({model_bytes / 2**20:.1f} MiB), {num_updates} updates =====')
+    variants = (
+        ("np.average", lambda: np.average(updates, weights=weights)),
+        ("flat (layers)", lambda: FlatParameterArray.weightedAverage(updates, weights)),
+        ("flat (buffers)", lambda: FlatParameterArray.weightedAverage(flat_updates, weights)))
+    reference = None
+    for name, function in variants:
+        result, peak, duration = measure(function, repetitions)
+        result_flat = np.concatenate([layer.reshape(-1) for layer in result.get()])
+        if(reference is None):
+            reference = result_flat
+        max_error = np.max(np.abs(result_flat - reference))
+        print(f'{name:>15}: {duration * 1000:.1f} ms, peak {peak / model_bytes:.2f} model sizes '
+            + f'({peak / 2**20:.1f} MiB), result dtype {result.get()[0].dtype}, max deviation {max_error:.2e}')
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000, 10_000_000, 50_000_000]
+    for size in sizes:
+        benchmark(size)
@@ -0,0 +1,67 @@
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from model.ModelUpdateMarket import ModelUpdateMarket, SynchronizationStrategy
+
+import queue
+import threading
+import time
+
+# compare the cpu time consumed by an actor waiting for model updates with the previous polling
+#   market and the event-driven market, while the model updates arrive after a delay
+# usage: python scripts/benchmark/benchmarkMarketWaiting.py [<delay_seconds>] [<num_neighbors>]
+
+# replica of the previous market that polls the queues of the neighbors in a loop (MIN_K)
+class PollingMarket:
+    def __init__(self, neighbors, amount):
+        self.model_updates = {addr: queue.SimpleQueue() for addr in neighbors}
+        self.amount = amount
+
+    def put(self, elem, address):
+        self.model_updates[address].put(elem)
+
+    def get(self):
+        amount = self.amount
+        result = dict()
+        while(amount > 0):
+            for addr, update_queue in self.model_updates.items():
+                try:
+                    update = update_queue.get(block=False)
+                    if(update):
+                        result.setdefault(addr, list()).append(update)
+                        amount -= 1
+                except queue.Empty:
+                    pass
+        return result
+
+def createEventMarket(neighbors, amount):
+    return ModelUpdateMarket({"neighbors": neighbors, "sync_strategy": SynchronizationStrategy.MIN_K,
+        "sync_strat_amount": amount, "sync_strat_allowempty": False})
+
+# deliver one model update per neighbor after the delay and measure the waiting consumer
+def measure(market, neighbors, delay):
+    def produce():
+        time.sleep(delay)
+        for addr in neighbors:
+            market.put({"weights": None, "gradient": None, "aggregation_weight": 1}, addr)
+    producer = threading.Thread(target=produce)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    producer.start()
+    result = market.get()
+    cpu_time = time.process_time() - cpu_start
+    wall_time = time.perf_counter() - wall_start
+    producer.join()
+    assert(sum([len(updates) for updates in result.values()]) == len(neighbors))
+    return cpu_time, wall_time
+
+if __name__ == '__main__':
+    delay = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    num_neighbors = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    neighbors = [f'localhost:{50051 + idx}' for idx in range(num_neighbors)]
+    for name, market in (("polling", PollingMarket(neighbors, num_neighbors)),
+        ("event-driven", createEventMarket(neighbors, num_neighbors))):
+        cpu_time, wall_time = measure(market, neighbors, delay)
+        print(f'{name:>12}: waited {wall_time:.2f} s, consumed {cpu_time:.3f} s cpu time '
+            + f'({cpu_time / wall_time * 100:.1f}% of a core)')
@@ -0,0 +1,78 @@
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from model.SerializationUtils import SerializationUtils
+import network.protos.ModelUpdate_pb2 as ModelUpdate_pb2
+from tffmodel.types.HeterogeneousDenseArray import HeterogeneousDenseArray
+
+import numpy as np
+import time
+import tracemalloc
+
+# compare the layer-wise and the contiguous wire format regarding the bytes copied per model update
+#   (i.e., the bytes newly allocated by each step of the send and receive path) and the runtime
+# usage: python scripts/benchmark/benchmarkSerialization.py [<num_parameters> ...]
+
+def createParameters(num_parameters, num_layers=8):
+    layer_size = num_parameters // num_layers
+    return HeterogeneousDenseArray([np.random.rand(layer_size).astype(np.float32)
+        for _ in range(num_layers)])
+
+# run the steps of the pipeline one after another and record the bytes allocated by each step
+#   whose result is still referenced (i.e., the bytes copied into the result of the step)
+def measureSteps(steps, initial):
+    results = [initial]
+    copied = dict()
+    tracemalloc.start()
+    for name, step in steps:
+        before, _ = tracemalloc.get_traced_memory()
+        results.append(step(results[-1]))
+        after, _ = tracemalloc.get_traced_memory()
+        copied[name] = max(after - before, 0)
+    tracemalloc.stop()
+    return copied
+
+def layerwiseSteps():
+    return [
+        ("serialize", lambda params: params.serialize()),
+        ("message", lambda serialized: ModelUpdate_pb2.ModelParameters(sparse=False,
+            wire_format=ModelUpdate_pb2.LAYERWISE, parameters=serialized)),
+        ("encode", lambda msg: msg.SerializeToString()),
+        ("decode", lambda wire: ModelUpdate_pb2.ModelParameters.FromString(wire)),
+        ("access", lambda msg: (list(msg.parameters), msg.sparse)),
+        ("deserialize", lambda payload: SerializationUtils.deserializeParameters(
+            payload[0], sparse=payload[1]))]
+
+def contiguousSteps():
+    return [
+        ("serialize", lambda params: SerializationUtils.serializeParametersFields(params)),
+        ("message", lambda fields: ModelUpdate_pb2.ModelParameters(**fields)),
+        ("encode", lambda msg: msg.SerializeToString()),
+        ("decode", lambda wire: ModelUpdate_pb2.ModelParameters.FromString(wire)),
+        ("access", lambda msg: msg.parameters[0]),
+        ("deserialize", lambda payload: SerializationUtils.deserializeParametersContiguous(payload))]
+
+def benchmark(num_parameters, repetitions=5):
+    params = createParameters(num_parameters)
+    model_bytes = sum([layer.nbytes for layer in params.get()])
+    print(f'===== {num_parameters} parameters ({model_bytes / 2**20:.1f} MiB) =====')
+    for name, steps in (("layerwise", layerwiseSteps()), ("contiguous", contiguousSteps())):
+        copied = measureSteps(steps, params)
+        start = time.perf_counter()
+        for _ in range(repetitions):
+            result = params
+            for _, step in steps:
+                result = step(result)
+        duration = (time.perf_counter() - start) / repetitions
+        total_copied = sum(copied.values())
+        print(f'{name:>10}: {total_copied / model_bytes:.2f} model copies '
+            + f'({total_copied / 2**20:.1f} MiB), {duration * 1000:.1f} ms per update, '
+            + 'per step: ' + ", ".join([f'{step}={val / 2**20:.1f} MiB' for step, val in copied.items()]))
+    # NOTE: allocations within the protobuf runtime (i.e., the upb arena of the message steps)
+    #   are not traced by tracemalloc and hence, not included
+
+if __name__ == '__main__':
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000, 10_000_000]
+    for size in sizes:
+        benchmark(size)
@@ -2,20 +2,28 @@ import json
 import os
 
 # class for incrementally storing information about the communicated messages and saving them as file
+# NOTE: the entries are kept per category (e.g., the message properties and the wire codec statistics),
+#   such that each log file holds entries of a single schema
 class CommunicationLogger:
-    logdict = dict()
+    logdicts = dict()
 
     @classmethod
-    def logMultiple(self_class, from_addr, to_addresses, msg_properties):
+    def logMultiple(self_class, from_addr, to_addresses, msg_properties, category="messages"):
         for to_addr in to_addresses:
-            self_class.log(from_addr, to_addr, msg_properties)
+            self_class.log(from_addr, to_addr, msg_properties, category)
 
     @classmethod
-    def log(self_class, from_addr, to_addr, msg_properties):
-        self_class.logdict.setdefault(from_addr, {}).setdefault(to_addr, []).append(msg_properties)
+    def log(self_class, from_addr, to_addr, msg_properties, category="messages"):
+        self_class.logdicts.setdefault(category, {}).setdefault(from_addr, {}) \
+            .setdefault(to_addr, []).append(msg_properties)
 
+    # save the log file of the category to disk
+    #   (only the messages of the specified sender if multiple actors share the process)
     @classmethod
-    def write(self_class, log_path):
+    def write(self_class, log_path, from_addr=None, category="messages"):
         os.makedirs(os.path.dirname(log_path), exist_ok=True)
+        logdict = self_class.logdicts.get(category, {})
+        if(from_addr is not None):
+            logdict = {from_addr: logdict.get(from_addr, {})}
         with open(f'{log_path}.json', 'w') as outfile:
-            json.dump(self_class.logdict, outfile)
+            json.dump(logdict, outfile)
@@ -1,10 +1,12 @@
 from model.LearningStrategy import LearningType
-from model.ModelUpdateMarket import SynchronizationStrategy
+from model.ModelUpdateMarket import MarketOverflowPolicy, SynchronizationStrategy
 from network.PartialDeviceParticipation import PartialDeviceParticipationStrategy
 from tffdataset.DatasetUtils import DatasetID
 from tffdataset.FedDataset import PartitioningScheme
 from network.Compression import CompressionType
+from network.ErrorFeedback import ErrorFeedbackMode
 from network.NetworkUtils import NetworkServiceType
+from network.WireCodec import WireCodecType
 from utils.PartitioningUtils import ModelPartitioningStrategy
 
 import json
@@ -20,6 +22,11 @@ class ConfigurationUtils:
 
         "partitioning_scheme": PartitioningScheme.ROUND_ROBIN,
         "partitioning_alpha": 2.5, # argument for Dirichlet partitioning
+        "partition_direct_flag": False, # compute and load only the own partition instead of the federated dataset
+        "partition_cache_flag": False, # load the own partition from the on-disk cache (and populate it on a miss)
+        "partition_cache_dir": "./cache/partitions",
+        "shared_dataset_flag": False, # read the own partition from a memory-mapped dataset shared by co-located actors
+        "shared_dataset_dir": "/dev/shm/modefl_datasets",
         "model_partitioning_strategy": ModelPartitioningStrategy.LAYERWISE,
 
         # the number of workers is initialized by the initiator based on the address file
@@ -31,21 +38,49 @@ class ConfigurationUtils:
         "adj_file": "./adj.txt",
 
         "num_threads_server": os.cpu_count(),
+        "num_threads_callbacks": 2, # bounded executor for the callbacks of the asynchronous server
 
         "learning_type": LearningType.DFLv1,
+        "simulation_mixing_flag": False, # aggregate all simulated actors as one mixing-matrix product (DFLv1, DFLv2, and DFLv8)
 
         "networkservice_type": NetworkServiceType.GRPC,
+        "stream_threshold": 2097152, # payload size (bytes) above which model updates are streamed in chunks
+        "stream_chunk_size": 1048576, # size (bytes) of the chunks of streamed model updates
+        "rpc_timeout": 60, # deadline (seconds) of the calls to the neighbors (0 for no deadline)
+        "rpc_stream_timeout": 600, # deadline (seconds) of the streamed model update transfers (0 for no deadline)
+        "shm_segment_size": 268435456, # size (bytes) of the shared memory ring buffer of each actor (halved while /dev/shm is short on space)
+        "shm_timeout": 10, # time (seconds) to wait for free space in the ring buffer before falling back to gRPC
+        "shm_dir": "/tmp", # directory of the notification sockets of the co-located actors
+        "wire_codec": WireCodecType.NoneType, # lossless codec for the serialized model updates (negotiated per neighbor)
+        "wire_codec_level": 6, # compression level of the lossless codec
 
         "sync_strategy": SynchronizationStrategy.ONE_FROM_EACH,
         "sync_strat_percentage": 0.5,
         "sync_strat_amount": 2,
         "sync_strat_timeout": 3,
         "sync_strat_allowempty": False,
+        "sync_strat_deadline": 0, # maximum time (seconds) to wait for model updates (0 for no deadline)
+
+        "market_capacity": 0, # maximum number of queued model updates per neighbor (0 for unbounded)
+        "market_overflow_policy": MarketOverflowPolicy.DROP_OLDEST,
+        "market_block_timeout": 10, # time (seconds) a sender is blocked by a full queue with the BLOCK policy
+        "market_accumulate_flag": False, # fold model updates into a running sum on arrival (DFLv1 and DFLv6)
+        "num_threads_decode": 4, # workers for decoding the retrieved model updates in parallel
 
         "compression_type": CompressionType.NoneType,
         "compression_k": 100,
         "compression_percentage": 0.2,
         "compression_precision": 8,
+        "error_feedback_mode": ErrorFeedbackMode.NoneMode, # add the compression error of the last round to the next update
+        "adaptive_compression_flag": False, # select the compression level per link based on the measured throughput
+        "adaptive_compression_target": 1.0, # target transfer time (seconds) of a model update per link
+
+        "eval_pool_size": 2, # maximum number of models for evaluating the weights of the neighbors
+        "eval_pool_size_training": 1, # maximum number of neighbor evaluations during the local training
+        "eval_version_flag": True, # reference the own model by its version and send the weights only on a miss
+        "eval_interval": 1, # evaluate the models every eval_interval rounds (at least 1)
+        "eval_num_batches": 0, # size of the fixed random subset of validation batches (0 for all batches)
+        "eval_background": False, # evaluate a snapshot of the weights in the background during the next round
 
         "pdp_strategy": PartialDeviceParticipationStrategy.NoneStrategy,
         "pdp_k": 2,
@@ -96,8 +131,11 @@ class ConfigurationUtils:
         config["model_partitioning_strategy"] = convertEnum(config["model_partitioning_strategy"], ModelPartitioningStrategy)
         config["learning_type"] = convertEnum(config["learning_type"], LearningType)
         config["networkservice_type"] = convertEnum(config["networkservice_type"], NetworkServiceType)
+        config["wire_codec"] = convertEnum(config["wire_codec"], WireCodecType)
         config["sync_strategy"] = convertEnum(config["sync_strategy"], SynchronizationStrategy)
+        config["market_overflow_policy"] = convertEnum(config["market_overflow_policy"], MarketOverflowPolicy)
         config["compression_type"] = convertEnum(config["compression_type"], CompressionType)
+        config["error_feedback_mode"] = convertEnum(config["error_feedback_mode"], ErrorFeedbackMode)
         config["pdp_strategy"] = convertEnum(config["pdp_strategy"],
             PartialDeviceParticipationStrategy)
 
@@ -113,7 +151,9 @@ class ConfigurationUtils:
                 raise RuntimeError(f'Cannot convert type {type(value)} to bool.')
             return value
         bool_type_configs = ["sync_strat_allowempty", "log_tensorboard_flag",
-            "log_performance_flag", "log_communication_flag"]
+            "log_performance_flag", "log_communication_flag", "market_accumulate_flag",
+            "partition_direct_flag", "partition_cache_flag", "shared_dataset_flag", "simulation_mixing_flag",
+            "eval_version_flag", "eval_background", "adaptive_compression_flag"]
         for btc in bool_type_configs:
             if(btc in config.keys()):
                 config[btc] = convertBool(config[btc])
@@ -127,9 +167,10 @@ class ConfigurationUtils:
             else:
                 raise RuntimeError(f'Cannot convert type {type(value)} to int.')
             return value
-        int_type_configs = ["seed", "num_threads_server",
-            "num_fed_epochs", "num_local_epochs", "sync_strat_amount",
-            "compression_k", "compression_precision", "pdp_k", "log_level"]
+        int_type_configs = ["seed", "num_threads_server", "num_threads_callbacks", "stream_threshold", "stream_chunk_size",
+            "shm_segment_size", "wire_codec_level",
+            "num_fed_epochs", "num_local_epochs", "sync_strat_amount", "market_capacity", "num_threads_decode",
+            "compression_k", "compression_precision", "eval_pool_size", "eval_pool_size_training", "eval_interval", "eval_num_batches", "pdp_k", "log_level"]
         for itc in int_type_configs:
             if(itc in config.keys()):
                 config[itc] = convertInt(config[itc])
@@ -144,10 +185,14 @@ class ConfigurationUtils:
                 raise RuntimeError(f'Cannot convert type {type(value)} to float.')
             return value
         float_type_configs = ["partitioning_alpha",
-            "sync_strat_percentage", "sync_strat_timeout",
-            "compression_percentage", "lr", "lr_global"]
+            "rpc_timeout", "rpc_stream_timeout", "sync_strat_percentage", "sync_strat_timeout", "sync_strat_deadline", "market_block_timeout", "shm_timeout",
+            "compression_percentage", "adaptive_compression_target", "lr", "lr_global"]
         for ftc in float_type_configs:
             if(ftc in config.keys()):
                 config[ftc] = convertFloat(config[ftc])
 
+        # validate the options
+        if("eval_interval" in config.keys() and config["eval_interval"] < 1):
+            raise RuntimeError(f'The evaluation interval must be at least 1 (eval_interval={config["eval_interval"]}).')
+
         return config
@@ -0,0 +1,136 @@
+from tffdataset.DatasetUtils import getDataset, getDatasetElementSpec
+from tffdataset.DirectDataset import DirectDataset
+
+import json
+import logging
+import numpy as np
+import os
+import shutil
+import tempfile
+import tensorflow as tf
+
+SPLIT_NAMES = ("train", "val", "test")
+
+# persistent cache of the data partition of an actor as memory-mappable .npy shards (one per split
+#   and component of the elements) with a manifest describing the partitioning
+class PartitionCache:
+    # obtain the properties that determine the content of the partition
+    # NOTE: the direct and the shared loading compute the sample assignment themselves, which differs
+    #   from the assignment of the federated dataset, hence, both flags are part of the key
+    @classmethod
+    def getCacheKey(self_class, config, seed):
+        return {"dataset_id": config["dataset_id"].name,
+            "partitioning_scheme": config["partitioning_scheme"].name,
+            "partitioning_alpha": f'{config["partitioning_alpha"]:g}',
+            "seed": int(seed),
+            "num_workers": int(config["num_workers"]),
+            "partition_direct_flag": bool(config["partition_direct_flag"]),
+            "shared_dataset_flag": bool(config["shared_dataset_flag"])}
+
+    @classmethod
+    def getDirectory(self_class, config, seed):
+        key = self_class.getCacheKey(config, seed)
+        key_name = "_".join([str(val) for val in key.values()])
+        return os.path.join(config["partition_cache_dir"], key_name, f'partition_{config["partition_index"]}')
+
+    # obtain the batch size of the configured dataset
+    # NOTE: the shards hold the samples unbatched, hence, the batches are formed with the current
+    #   batch size instead of the batch size at the time of writing
+    @classmethod
+    def getBatchSize(self_class, config):
+        return getDataset(config).batch_size
+
+    # construct a dataset that reads batches from the memory-mapped arrays, either contiguous
+    #   batches or the samples at the specified indices (i.e., an index view into the arrays)
+    # NOTE: with a seed, the order of the batches is shuffled in each iteration (e.g., for training)
+    @classmethod
+    def createDataset(self_class, arrays, element_spec, batch_size, indices=None, seed=None):
+        num_samples = arrays[0].shape[0] if indices is None else len(indices)
+        def readBatch(start):
+            if(indices is None):
+                return [np.asarray(array[start : start+batch_size]) for array in arrays]
+            batch_indices = indices[start : start+batch_size]
+            return [np.take(array, batch_indices, axis=0) for array in arrays]
+        def readBatchTensors(start):
+            tensors = tf.numpy_function(readBatch, [start], [tf.as_dtype(array.dtype) for array in arrays])
+            tensors = [tf.ensure_shape(tensor, (None, *array.shape[1:]))
+                for tensor, array in zip(tensors, arrays)]
+            return tf.nest.pack_sequence_as(element_spec, tensors)
+        batch_starts = tf.data.Dataset.range(0, num_samples, batch_size)
+        if(seed is not None):
+            batch_starts = batch_starts.shuffle(-(-num_samples // batch_size), seed=seed,
+                reshuffle_each_iteration=True)
+        return batch_starts.map(readBatchTensors, num_parallel_calls=tf.data.AUTOTUNE)
+
+    # load the partition from the cache or return None if it is not cached
+    @classmethod
+    def load(self_class, config, seed):
+        directory = self_class.getDirectory(config, seed)
+        manifest_path = os.path.join(directory, "manifest.json")
+        if(not os.path.exists(manifest_path)):
+            return None
+        with open(manifest_path) as manifest_file:
+            manifest = json.load(manifest_file)
+        if(manifest["key"] != self_class.getCacheKey(config, seed)):
+            return None
+        element_spec = getDatasetElementSpec(config)
+        batch_size = self_class.getBatchSize(config)
+        splits = dict()
+        for split_name in SPLIT_NAMES:
+            arrays = self_class.mapSplit(directory, split_name, manifest["num_components"])
+            splits[split_name] = self_class.createDataset(arrays, element_spec, batch_size,
+                seed=int(seed) if split_name == "train" else None)
+        logger = logging.getLogger("utils/PartitionCache")
+        logger.setLevel(config["log_level"])
+        logger.debug(f'Loaded partition {config["partition_index"]} from the cache {directory}.')
+        return DirectDataset(batch_size, element_spec,
+            splits["train"], splits["val"], splits["test"], config)
+
+    # write each (batched) split as one .npy shard per component of the elements
+    #   returns the number of components
+    @classmethod
+    def writeSplits(self_class, splits, directory):
+        num_components = None
+        for split_name, tf_dataset in splits.items():
+            component_batches = None
+            for batch in tf_dataset.as_numpy_iterator():
+                components = tf.nest.flatten(batch)
+                if(component_batches is None):
+                    component_batches = [list() for _ in components]
+                for component_list, component in zip(component_batches, components):
+                    component_list.append(component)
+            if(component_batches is None): # empty split
+                component_batches = [[np.empty((0, *spec.shape[1:]), dtype=spec.dtype.as_numpy_dtype)]
+                    for spec in tf.nest.flatten(tf_dataset.element_spec)]
+            num_components = len(component_batches)
+            for component_idx, component_list in enumerate(component_batches):
+                np.save(os.path.join(directory, f'{split_name}_{component_idx}.npy'),
+                    np.concatenate(component_list))
+        return num_components
+
+    # memory-map the shards of the specified split
+    @classmethod
+    def mapSplit(self_class, directory, split_name, num_components):
+        return [np.load(os.path.join(directory, f'{split_name}_{component_idx}.npy'), mmap_mode="r")
+            for component_idx in range(num_components)]
+
+    # write the (batched) splits of the dataset to the cache
+    # NOTE: the shards are written to a temporary directory that is moved into place atomically
+    @classmethod
+    def store(self_class, dataset, config, seed):
+        directory = self_class.getDirectory(config, seed)
+        if(os.path.exists(directory)):
+            return
+        os.makedirs(os.path.dirname(directory), exist_ok=True)
+        temp_directory = tempfile.mkdtemp(dir=os.path.dirname(directory))
+        num_components = self_class.writeSplits({split_name: getattr(dataset, split_name)
+            for split_name in SPLIT_NAMES}, temp_directory)
+        with open(os.path.join(temp_directory, "manifest.json"), "w") as manifest_file:
+            json.dump({"key": self_class.getCacheKey(config, seed),
+                "partition_index": config["partition_index"],
+                "batch_size": dataset.batch_size,
+                "num_components": num_components}, manifest_file)
+        try:
+            os.rename(temp_directory, directory)
+        except OSError: # another process has cached the partition in the meantime
+            shutil.rmtree(temp_directory, ignore_errors=True)
@@ -0,0 +1,70 @@
+from tffdataset.DirectDataset import DirectDataset
+from utils.PartitioningUtils import PartitioningUtils
+
+import logging
+import numpy as np
+import tensorflow as tf
+
+# load only the partition of the actor instead of constructing the federated dataset of all actors
+class PartitionLoader:
+    # obtain the number of samples of a dataset (iterates the dataset if the cardinality is unknown)
+    @classmethod
+    def getNumSamples(self_class, tf_dataset):
+        num_samples = int(tf_dataset.cardinality().numpy())
+        if(num_samples < 0):
+            num_samples = int(tf_dataset.reduce(np.int64(0), lambda count, _: count + 1).numpy())
+        return num_samples
+
+    # obtain the class labels of all samples without materializing the features
+    @classmethod
+    def getLabels(self_class, tf_dataset):
+        label_batches = [batch for batch in tf_dataset.map(lambda *elem: elem[-1])
+            .batch(4096).as_numpy_iterator()]
+        labels = np.concatenate(label_batches) if label_batches else np.empty(0)
+        if(labels.ndim > 1): # one-hot encoded labels
+            labels = np.argmax(labels, axis=-1)
+        return labels
+
+    # select the samples with the specified (sorted) indices from the dataset
+    # NOTE: the samples of other partitions are skipped while iterating and never cached
+    @classmethod
+    def selectSamples(self_class, tf_dataset, num_samples, indices):
+        mask = np.zeros(num_samples, dtype=bool)
+        mask[indices] = True
+        mask = tf.constant(mask)
+        return tf_dataset.enumerate() \
+            .filter(lambda idx, elem: tf.gather(mask, idx)) \
+            .map(lambda idx, elem: elem) \
+            .cache() \
+            .apply(tf.data.experimental.assert_cardinality(len(indices)))
+
+    # obtain the sample indices of the partition of the actor for a single split of the dataset
+    @classmethod
+    def getPartitionIndices(self_class, tf_dataset, config, seed):
+        num_samples = self_class.getNumSamples(tf_dataset)
+        labels = self_class.getLabels(tf_dataset) \
+            if "DIRICHLET" in config["partitioning_scheme"].name else None
+        indices = PartitioningUtils.getDataPartitionIndices(num_samples, labels,
+            config["partition_index"], config, seed)
+        return num_samples, indices
+
+    # construct the dataset of the actor from its own partition of the loaded (unbatched) dataset
+    #   returns None if the partitioning scheme does not support direct loading
+    @classmethod
+    def loadPartition(self_class, dataset, config, seed):
+        logger = logging.getLogger("utils/PartitionLoader")
+        logger.setLevel(config["log_level"])
+        splits = dict()
+        for split_name in ("train", "val", "test"):
+            tf_dataset = getattr(dataset, split_name)
+            num_samples, indices = self_class.getPartitionIndices(tf_dataset, config, seed)
+            if(indices is None):
+                logger.warning(f'Direct loading is not supported for partitioning scheme '
+                    + f'{config["partitioning_scheme"].name}.')
+                return None
+            splits[split_name] = self_class.selectSamples(tf_dataset, num_samples, indices) \
+                .batch(dataset.batch_size)
+            logger.debug(f'Selected {len(indices)}/{num_samples} {split_name} samples for '
+                + f'partition {config["partition_index"]}.')
+        return DirectDataset(dataset.batch_size, dataset.element_spec,
+            splits["train"], splits["val"], splits["test"], config)
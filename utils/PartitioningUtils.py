@@ -9,6 +9,45 @@ class ModelPartitioningStrategy(Enum):
 
 # utility methods for partitioning data (and model parameters) and joining partitions
 class PartitioningUtils:
+    # check whether the partition indices can be computed for the configured partitioning scheme
+    @classmethod
+    def isDataPartitionIndexingSupported(self_class, config):
+        partitioning_scheme = config["partitioning_scheme"]
+        return partitioning_scheme.name == "ROUND_ROBIN" or "DIRICHLET" in partitioning_scheme.name
+
+    # obtain the sample indices of a single data partition (sorted ascending)
+    # NOTE: the indices are deterministic given the seed, hence, each actor computes only its own
+    #   partition but all actors obtain disjoint partitions; returns None for unsupported schemes
+    @classmethod
+    def getDataPartitionIndices(self_class, num_samples, labels, partition_index, config, seed):
+        partitioning_scheme = config["partitioning_scheme"]
+        if(partitioning_scheme.name == "ROUND_ROBIN"):
+            return self_class.getDataPartitionIndicesRoundRobin(
+                num_samples, partition_index, config["num_workers"], seed)
+        elif("DIRICHLET" in partitioning_scheme.name):
+            return self_class.getDataPartitionIndicesDirichlet(
+                labels, partition_index, config["num_workers"], config["partitioning_alpha"], seed)
+        return None
+
+    # assign the samples of a seeded permutation to the partitions in round-robin fashion
+    @classmethod
+    def getDataPartitionIndicesRoundRobin(self_class, num_samples, partition_index, num_partitions, seed):
+        permutation = np.random.default_rng(seed).permutation(num_samples)
+        return np.sort(permutation[partition_index::num_partitions])
+
+    # split the samples of each class among the partitions according to proportions drawn from a
+    #   symmetric Dirichlet distribution with the specified concentration parameter alpha
+    @classmethod
+    def getDataPartitionIndicesDirichlet(self_class, labels, partition_index, num_partitions, alpha, seed):
+        rng = np.random.default_rng(seed)
+        partition_indices = list()
+        for label in np.unique(labels):
+            label_indices = rng.permutation(np.flatnonzero(labels == label))
+            proportions = rng.dirichlet(np.full(num_partitions, alpha))
+            split_points = (np.cumsum(proportions)[:-1] * label_indices.size).astype(int)
+            partition_indices.append(np.split(label_indices, split_points)[partition_index])
+        return np.sort(np.concatenate(partition_indices))
+
     # partition the model parameters to one partition per actor
     @classmethod
     def partitionModelParameters(self_class, model_params, config):
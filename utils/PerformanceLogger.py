@@ -11,9 +11,12 @@ class PerformanceLogger:
         self_class.logdict.setdefault(logpath, []).append(valuedict)
 
     # save the eventual log file to disk
+    #   (only the log files in the specified directory if multiple actors share the process)
     @classmethod
-    def write(self_class):
-        for logpath, valuearr in self_class.logdict.items():
+    def write(self_class, logdir=None):
+        for logpath, valuearr in list(self_class.logdict.items()):
+            if(logdir and not logpath.startswith(f'{logdir}/')):
+                continue
             os.makedirs(os.path.dirname(logpath), exist_ok=True)
             with open(f'{logpath}.csv', 'w') as outfile:
                 writer = csv.DictWriter(outfile, valuearr[0].keys())
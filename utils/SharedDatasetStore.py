@@ -0,0 +1,72 @@
+from tffdataset.DatasetUtils import getDataset, getDatasetElementSpec
+from tffdataset.DirectDataset import DirectDataset
+from utils.PartitionCache import PartitionCache, SPLIT_NAMES
+from utils.PartitioningUtils import PartitioningUtils
+
+import fcntl
+import json
+import logging
+import numpy as np
+import os
+
+# host-wide memory-mapped copy of the loaded dataset shared by all co-located actors
+# NOTE: the first actor loads the dataset and writes the arrays while holding an exclusive file lock,
+#   all actors map the arrays read-only and read their partition through index views, such that
+#   the pages of the dataset are shared among the processes instead of copied into each of them
+# NOTE: the store outlives the actors (later runs attach to it) and is never removed automatically;
+#   remove the shared dataset directory (e.g., `make clean-shared-datasets`) to free the memory
+class SharedDatasetStore:
+    @classmethod
+    def getDirectory(self_class, config, seed):
+        return os.path.join(config["shared_dataset_dir"], f'{config["dataset_id"].name}_{int(seed)}')
+
+    # load the dataset and write its splits into the store unless another actor has done so already
+    @classmethod
+    def ensureStored(self_class, config, seed, logger):
+        directory = self_class.getDirectory(config, seed)
+        os.makedirs(directory, exist_ok=True)
+        manifest_path = os.path.join(directory, "manifest.json")
+        with open(os.path.join(directory, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if(not os.path.exists(manifest_path)):
+                    logger.debug(f'Writing dataset {config["dataset_id"].name} to the shared store {directory}.')
+                    dataset = getDataset(config)
+                    dataset.load(seed=seed)
+                    num_components = PartitionCache.writeSplits({split_name:
+                        getattr(dataset, split_name).batch(4096) for split_name in SPLIT_NAMES}, directory)
+                    with open(manifest_path, "w") as manifest_file:
+                        json.dump({"batch_size": dataset.batch_size,
+                            "num_components": num_components}, manifest_file)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        with open(manifest_path) as manifest_file:
+            return json.load(manifest_file)
+
+    # construct the dataset of the actor from index views into the shared arrays
+    #   returns None if the partitioning scheme does not support computing the partition indices
+    @classmethod
+    def loadPartition(self_class, config, seed):
+        logger = logging.getLogger("utils/SharedDatasetStore")
+        logger.setLevel(config["log_level"])
+        if(not PartitioningUtils.isDataPartitionIndexingSupported(config)):
+            logger.warning(f'The shared dataset store is not supported for partitioning scheme '
+                + f'{config["partitioning_scheme"].name}.')
+            return None
+        manifest = self_class.ensureStored(config, seed, logger)
+        directory = self_class.getDirectory(config, seed)
+        element_spec = getDatasetElementSpec(config)
+        batch_size = PartitionCache.getBatchSize(config)
+        splits = dict()
+        for split_name in SPLIT_NAMES:
+            arrays = PartitionCache.mapSplit(directory, split_name, manifest["num_components"])
+            labels = arrays[-1] if "DIRICHLET" in config["partitioning_scheme"].name else None
+            if(labels is not None and labels.ndim > 1): # one-hot encoded labels
+                labels = np.argmax(labels, axis=-1)
+            indices = PartitioningUtils.getDataPartitionIndices(arrays[0].shape[0], labels,
+                config["partition_index"], config, seed)
+            splits[split_name] = PartitionCache.createDataset(arrays, element_spec, batch_size, indices,
+                seed=int(seed) if split_name == "train" else None)
+        logger.debug(f'Attached to the shared dataset {directory} with partition {config["partition_index"]}.')
+        return DirectDataset(batch_size, element_spec,
+            splits["train"], splits["val"], splits["test"], config)